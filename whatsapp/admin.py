@@ -1,5 +1,43 @@
 from django.contrib import admin
-from .models import Lead, ConversationState
+from .models import LEAD_DATA_FIELDS, Lead, DriveFolder, InboundMessage, OutboundMessage, PropertyAlert
 # Register your models here.
-admin.site.register(Lead)
-admin.site.register(ConversationState)
\ No newline at end of file
+
+
+@admin.register(Lead)
+class LeadAdmin(admin.ModelAdmin):
+    # Typed columns only, so the changelist skips loading and decoding `data`
+    list_display = ("phone", "name", "lead_type", "current_step", "status", "segment", "score", "scored_by", "locality", "budget", "bhk", "updated_at")
+    list_filter = ("lead_type", "status", "segment", "property_kind", "bhk_count")
+    search_fields = ("phone", "name", "locality")
+    readonly_fields = tuple(sorted(LEAD_DATA_FIELDS))  # rewritten from `data` on save
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer("data")
+
+
+@admin.register(InboundMessage)
+class InboundMessageAdmin(admin.ModelAdmin):
+    list_display = ("id", "phone", "status", "attempts", "received_at", "available_at", "started_at", "heartbeat_at", "finished_at")
+    list_filter = ("status",)
+    search_fields = ("phone",)
+
+
+@admin.register(OutboundMessage)
+class OutboundMessageAdmin(admin.ModelAdmin):
+    list_display = ("id", "phone", "status", "attempts", "created_at", "sent_at", "delivered_at", "read_at")
+    list_filter = ("status",)
+    search_fields = ("phone", "wa_message_id")
+
+
+@admin.register(PropertyAlert)
+class PropertyAlertAdmin(admin.ModelAdmin):
+    list_display = ("id", "buyer", "property", "status", "attempts", "created_at", "sent_at")
+    list_filter = ("status",)
+    search_fields = ("buyer__phone",)
+
+
+@admin.register(DriveFolder)
+class DriveFolderAdmin(admin.ModelAdmin):
+    list_display = ("folder_id", "status", "lead", "name", "pooled", "claim_ms", "claimed_at", "assigned_at")
+    list_filter = ("status", "pooled")
+    search_fields = ("lead__phone", "folder_id")
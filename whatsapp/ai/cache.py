@@ -0,0 +1,167 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import F
+from django.utils import timezone
+
+from whatsapp.models import LLMCacheEntry
+
+EVICT_EVERY = 100  # writes between size checks
+
+
+def prompt_version(*parts):
+    """Short fingerprint of a prompt template; editing the prompt changes every key."""
+    return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()[:12]
+
+
+def normalize_input(text):
+    return " ".join(str(text or "").lower().split())
+
+
+class LLMCache:
+    """
+    Content-addressed memo cache for LLM calls.
+
+    A small in-memory LRU sits in front of the LLMCacheEntry table, so entries
+    survive restarts and are shared by every worker. Entries expire after a
+    TTL and the table is trimmed to `max_entries` by least-recent use.
+    """
+
+    def __init__(self, ttl_seconds, max_entries, local_size):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.local_size = local_size
+        self._local = OrderedDict()  # key -> (value, tokens, monotonic expiry)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+
+    @staticmethod
+    def make_key(function, question, normalized_input, version):
+        raw = "\x1f".join([function, question, normalized_input, version])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    # ---- lookups ----
+    def _get_local(self, key):
+        with self._lock:
+            item = self._local.get(key)
+            if item is None:
+                return None
+            if item[2] < time.monotonic():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            return item
+
+    def _put_local(self, key, value, tokens, ttl_remaining):
+        with self._lock:
+            self._local[key] = (value, tokens, time.monotonic() + ttl_remaining)
+            self._local.move_to_end(key)
+            while len(self._local) > self.local_size:
+                self._local.popitem(last=False)
+
+    def get(self, key):
+        """Return (found, value)."""
+        item = self._get_local(key)
+        if item is not None:
+            self._record(memory_hit=True, tokens=item[1])
+            return True, item[0]
+
+        now = timezone.now()
+        entry = LLMCacheEntry.objects.filter(key=key, expires_at__gt=now).only("value", "tokens", "expires_at").first()
+        if entry is None:
+            self._record(miss=True)
+            return False, None
+
+        LLMCacheEntry.objects.filter(key=key).update(hits=F("hits") + 1, last_used_at=now)
+        self._put_local(key, entry.value, entry.tokens, (entry.expires_at - now).total_seconds())
+        self._record(db_hit=True, tokens=entry.tokens)
+        return True, entry.value
+
+    # ---- writes ----
+    def set(self, key, function, version, value, tokens=0):
+        now = timezone.now()
+        defaults = {
+            "function": function,
+            "prompt_version": version,
+            "value": value,
+            "tokens": tokens or 0,
+            "last_used_at": now,
+            "expires_at": now + timedelta(seconds=self.ttl_seconds),
+        }
+        try:
+            LLMCacheEntry.objects.update_or_create(key=key, defaults=defaults)
+        except IntegrityError:
+            pass  # another worker stored the same key first
+        self._put_local(key, value, tokens or 0, self.ttl_seconds)
+
+        with self._lock:
+            self._writes += 1
+            should_evict = self._writes % EVICT_EVERY == 0
+        if should_evict:
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then the least recently used ones above max_entries."""
+        LLMCacheEntry.objects.filter(expires_at__lte=timezone.now()).delete()
+        overflow = LLMCacheEntry.objects.count() - self.max_entries
+        if overflow > 0:
+            stale_ids = list(
+                LLMCacheEntry.objects.order_by("last_used_at").values_list("id", flat=True)[:overflow]
+            )
+            LLMCacheEntry.objects.filter(id__in=stale_ids).delete()
+
+    def cached(self, function, question, raw_input, version, compute):
+        """
+        Memoize `compute()` which must return (value, tokens_used).
+
+        Exceptions from `compute` propagate and nothing is stored, so
+        transient LLM failures are retried on the next call.
+        """
+        key = self.make_key(function, question, normalize_input(raw_input), version)
+        found, value = self.get(key)
+        if found:
+            return value
+
+        value, tokens = compute()
+        self.set(key, function, version, value, tokens)
+        return value
+
+    # ---- stats ----
+    def _record(self, memory_hit=False, db_hit=False, miss=False, tokens=0):
+        with self._lock:
+            if memory_hit:
+                self.memory_hits += 1
+            if db_hit:
+                self.db_hits += 1
+            if miss:
+                self.misses += 1
+            self.tokens_saved += tokens or 0
+
+    def stats(self):
+        with self._lock:
+            hits = self.memory_hits + self.db_hits
+            total = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "hit_rate": hits / total if total else 0.0,
+                "tokens_saved": self.tokens_saved,
+                "local_entries": len(self._local),
+            }
+
+
+llm_cache = LLMCache(
+    ttl_seconds=getattr(settings, "LLM_CACHE_TTL_SECONDS", 30 * 24 * 3600),
+    max_entries=getattr(settings, "LLM_CACHE_MAX_ENTRIES", 50000),
+    local_size=getattr(settings, "LLM_CACHE_LOCAL_SIZE", 2000),
+)
@@ -0,0 +1,81 @@
+import threading
+
+from whatsapp.gazetteer import gazetteer
+from whatsapp.parsing import (
+    format_amenities,
+    format_area,
+    format_bhk,
+    format_price,
+    parse_amenities,
+    parse_area_range,
+    parse_bhk,
+    parse_price_range,
+    parse_property_type,
+)
+
+
+def _property_type(answer):
+    return parse_property_type(answer)
+
+
+def _area(answer):
+    parsed = parse_area_range(answer)
+    return format_area(parsed) if parsed else None
+
+
+def _bedrooms(answer):
+    parsed = parse_bhk(answer)
+    return format_bhk(parsed) if parsed else None
+
+
+def _price(answer):
+    parsed = parse_price_range(answer)
+    return format_price(parsed) if parsed else None
+
+
+def _location(answer):
+    found = gazetteer.resolve(answer)
+    return found.name if found else None
+
+
+def _amenities(answer):
+    parsed = parse_amenities(answer)
+    return format_amenities(parsed) if parsed else None
+
+
+# Question label (as passed to normalize_answer) -> local parser
+RULES = {
+    "Property Type": _property_type,
+    "Area": _area,
+    "Bedrooms": _bedrooms,
+    "Price": _price,
+    "Budget": _price,
+    "Amenities": _amenities,
+    "Location": _location,
+}
+
+_lock = threading.Lock()
+_stats = {}  # question -> {"hits": n, "misses": n}
+
+
+def fast_normalize(question, answer):
+    """Normalize locally when the answer is in a known shape; None means 'ask the LLM'."""
+    rule = RULES.get(question)
+    result = rule(answer) if rule else None
+
+    with _lock:
+        counts = _stats.setdefault(question, {"hits": 0, "misses": 0})
+        counts["hits" if result is not None else "misses"] += 1
+    return result
+
+
+def fast_path_stats():
+    with _lock:
+        hits = sum(c["hits"] for c in _stats.values())
+        misses = sum(c["misses"] for c in _stats.values())
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "by_question": {q: dict(c) for q, c in _stats.items()},
+        }
@@ -0,0 +1,128 @@
+"""
+Local lead scorer.
+
+Implements the same rubric as the GPT prompt in whatsapp.ai.scorer
+(completeness, budget/location present, realistic values) as a weighted sum
+over features extracted from lead.data. Pure Python, no I/O.
+"""
+from whatsapp.parsing import (
+    CRORE,
+    parse_amenities,
+    parse_area_range,
+    parse_bhk,
+    parse_price_range,
+    parse_property_type,
+)
+
+# Feature -> weight; weights sum to 100 so a perfect lead scores 100
+WEIGHTS = {
+    "completeness": 35,
+    "has_price": 15,
+    "has_location": 15,
+    "structured": 15,
+    "realistic_price": 10,
+    "consistent_size": 10,
+}
+# Subtracted when a big budget comes with no location (the rubric's "unrealistic" example)
+VAGUE_BIG_BUDGET_PENALTY = 25
+BIG_BUDGET = 2 * CRORE
+
+# Plausible ₹/sq.ft for built property, and sq.ft per bedroom
+PRICE_PER_SQFT_RANGE = (1500, 40000)
+SQFT_PER_BHK_RANGE = (250, 1500)
+
+SEGMENT_THRESHOLDS = (
+    (80, "PREMIUM"),
+    (50, "ACTIVE"),
+    (20, "PROSPECT"),
+    (0, "INACTIVE"),
+)
+
+
+def segment_for(score):
+    for threshold, segment in SEGMENT_THRESHOLDS:
+        if score >= threshold:
+            return segment
+    return "INACTIVE"
+
+
+def _lead_values(lead):
+    d = lead.data or {}
+    return {
+        "name": d.get("name"),
+        "location": d.get("location") or d.get("location_preference"),
+        "bhk": d.get("bhk"),
+        "area": d.get("area_sqft") or d.get("area_preference"),
+        "property_type": d.get("property_type") or d.get("property_type_preference"),
+        "price": d.get("price_range") or d.get("budget"),
+        "amenities": d.get("amenities"),
+    }
+
+
+def extract_features(lead):
+    values = _lead_values(lead)
+    present = {k: bool(str(v or "").strip()) for k, v in values.items()}
+
+    property_type = parse_property_type(values["property_type"]) if present["property_type"] else None
+    price = parse_price_range(values["price"]) if present["price"] else None
+    area = parse_area_range(values["area"]) if present["area"] else None
+    bhk = parse_bhk(values["bhk"]) if present["bhk"] else None
+    amenities = parse_amenities(values["amenities"]) if present["amenities"] else None
+
+    parsed = [property_type, price, area, bhk, amenities]
+
+    realistic_price = 0.5  # unknown -> neutral
+    if price and area and property_type != "Plot":
+        per_sqft = ((price[0] + price[1]) / 2) / ((area[0] + area[1]) / 2)
+        low, high = PRICE_PER_SQFT_RANGE
+        realistic_price = 1.0 if low <= per_sqft <= high else 0.0
+
+    consistent_size = 0.5
+    if area and bhk and property_type != "Plot":
+        per_bhk = ((area[0] + area[1]) / 2) / bhk
+        low, high = SQFT_PER_BHK_RANGE
+        consistent_size = 1.0 if low <= per_bhk <= high else 0.0
+
+    return {
+        "completeness": sum(present.values()) / len(present),
+        "has_price": 1.0 if present["price"] else 0.0,
+        "has_location": 1.0 if present["location"] else 0.0,
+        "structured": sum(1 for p in parsed if p) / len(parsed),
+        "realistic_price": realistic_price,
+        "consistent_size": consistent_size,
+        "vague_big_budget": 1.0 if price and price[1] >= BIG_BUDGET and not present["location"] else 0.0,
+    }
+
+
+def _reason(features):
+    problems = []
+    if not features["has_price"]:
+        problems.append("budget/price missing")
+    if not features["has_location"]:
+        problems.append("location missing")
+    if features["completeness"] < 1:
+        problems.append(f"{features['completeness']:.0%} of details answered")
+    if features["realistic_price"] == 0:
+        problems.append("price looks unrealistic for the area")
+    if features["consistent_size"] == 0:
+        problems.append("area does not fit the BHK count")
+    if features["vague_big_budget"]:
+        problems.append("large budget without a location")
+    if not problems:
+        return "Complete, realistic details."
+    text = "; ".join(problems)
+    return text[0].upper() + text[1:]
+
+
+def score_lead_locally(lead):
+    """(score:int, segment:str, reason:str), same contract as ai_score_lead."""
+    features = extract_features(lead)
+    raw = sum(WEIGHTS[name] * features[name] for name in WEIGHTS)
+    raw -= VAGUE_BIG_BUDGET_PENALTY * features["vague_big_budget"]
+    score = int(round(max(0, min(100, raw))))
+    return score, segment_for(score), _reason(features)
+
+
+def is_borderline(score, margin):
+    """True when the score sits within `margin` points of a segment boundary."""
+    return any(abs(score - threshold) <= margin for threshold, _ in SEGMENT_THRESHOLDS if threshold)
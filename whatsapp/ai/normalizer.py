@@ -1,36 +1,28 @@
-from crewai import Agent, Task, Crew
-from textwrap import dedent
-import os
-from dotenv import load_dotenv
+from whatsapp.ai import runtime
+from whatsapp.ai.cache import llm_cache, prompt_version
+from whatsapp.ai.fastpath import fast_normalize, fast_path_stats
 
-# Load environment variables
-load_dotenv()
+NORMALIZE_PROMPT_VERSION = prompt_version(runtime.NORMALIZE_TEMPLATE, runtime.NORMALIZE_EXPECTED_OUTPUT)
 
-# Ensure OPENAI_API_KEY is set
-if not os.getenv("OPENAI_API_KEY"):
-    raise ValueError("OPENAI_API_KEY environment variable is not set. Please set it in your .env file.")
 
-normalize_agent = Agent(
-    role="Real Estate Data Normalizer",
-    goal="Clean and standardize real estate user answers",
-    backstory="Fixes human input mistakes, returns normalized terms.",
-    verbose=False,
-)
+def _llm_normalize(question, answer):
+    # The crew is built once per worker thread and reused for every call
+    result = runtime.kickoff("normalize", question=question, answer=answer)
 
-def normalize_answer(question, answer):
-    task = Task(
-        description=dedent(f"""
-            Normalize the answer for a structured database.
-            Question: "{question}"
-            Answer: "{answer}"
-            
-            Return only a clean answer (no sentences).
-        """),
-        agent=normalize_agent,
-        expected_output="Clean short value like 1200, 2 BHK, 50-75L, Sector 7"
-    )
+    usage = getattr(result, "token_usage", None)
+    return str(result).strip(), getattr(usage, "total_tokens", 0) or 0
 
-    crew = Crew(agents=[normalize_agent], tasks=[task])
-    result = crew.kickoff()
 
-    return str(result).strip()  
+def normalize_answer(question, answer):
+    # Button replies and common typed formats never need the LLM
+    fast = fast_normalize(question, answer)
+    if fast is not None:
+        return fast
+
+    # Same question + same (case/space-insensitive) answer -> reuse the earlier LLM result
+    value = llm_cache.cached(
+        "normalize_answer", question, answer, NORMALIZE_PROMPT_VERSION,
+        lambda: _llm_normalize(question, answer),
+    )
+    print(f"🤖 Normalized {question}: '{answer}' -> '{value}' | fast path {fast_path_stats()['hit_rate']:.0%} | cache {llm_cache.stats()}")
+    return value
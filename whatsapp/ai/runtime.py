@@ -0,0 +1,116 @@
+"""
+Process-wide AI runtime.
+
+Heavy imports (crewai, openai) and client/agent construction happen on first
+use instead of at import time, and are then reused for every call. The
+OpenAI client is shared; CrewAI agents and crews keep per-run state, so each
+thread builds its own set once and reuses it.
+"""
+import os
+import threading
+import time
+
+_lock = threading.Lock()
+_thread_state = threading.local()
+_openai_client = None
+
+_stats = {"openai_client_build_seconds": None, "crews_built": 0, "crew_build_seconds": 0.0}
+
+NORMALIZE_TEMPLATE = """
+Normalize the answer for a structured database.
+Question: "{question}"
+Answer: "{answer}"
+
+Return only a clean answer (no sentences).
+"""
+NORMALIZE_EXPECTED_OUTPUT = "Clean short value like 1200, 2 BHK, 50-75L, Sector 7"
+
+CLASSIFY_TEMPLATE = """
+Classify the following text into either BUYER or SELLER.
+Only answer either: BUYER or SELLER.
+
+Text: "{text}"
+"""
+CLASSIFY_EXPECTED_OUTPUT = "BUYER or SELLER"
+
+
+def require_api_key():
+    if not os.getenv("OPENAI_API_KEY"):
+        raise ValueError("OPENAI_API_KEY environment variable is not set. Please set it in your .env file.")
+
+
+# ======== OPENAI ========
+def get_openai_client():
+    global _openai_client
+    if _openai_client is None:
+        with _lock:
+            if _openai_client is None:
+                require_api_key()
+                start = time.perf_counter()
+                from openai import OpenAI
+
+                _openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+                _stats["openai_client_build_seconds"] = time.perf_counter() - start
+    return _openai_client
+
+
+# ======== CREWAI ========
+def _build_crew(name):
+    require_api_key()
+    start = time.perf_counter()
+    from crewai import Agent, Crew, Task
+
+    if name == "normalize":
+        agent = Agent(
+            role="Real Estate Data Normalizer",
+            goal="Clean and standardize real estate user answers",
+            backstory="Fixes human input mistakes, returns normalized terms.",
+            verbose=False,
+        )
+        task = Task(description=NORMALIZE_TEMPLATE, agent=agent, expected_output=NORMALIZE_EXPECTED_OUTPUT)
+    elif name == "classify":
+        agent = Agent(
+            role="Lead Type Classifier",
+            goal="Determine if the user is BUYER or SELLER based on their message",
+            backstory="You analyze conversations and label if they want to BUY or SELL property.",
+            verbose=False,
+        )
+        task = Task(description=CLASSIFY_TEMPLATE, agent=agent, expected_output=CLASSIFY_EXPECTED_OUTPUT)
+    else:
+        raise KeyError(f"Unknown crew: {name}")
+
+    # Task descriptions are templates; kickoff(inputs=...) fills them per call
+    crew = Crew(agents=[agent], tasks=[task])
+    with _lock:
+        _stats["crews_built"] += 1
+        _stats["crew_build_seconds"] += time.perf_counter() - start
+    return crew
+
+
+def get_crew(name):
+    crews = getattr(_thread_state, "crews", None)
+    if crews is None:
+        crews = _thread_state.crews = {}
+    if name not in crews:
+        crews[name] = _build_crew(name)
+    return crews[name]
+
+
+def kickoff(name, **inputs):
+    return get_crew(name).kickoff(inputs=inputs)
+
+
+# ======== LIFECYCLE ========
+def warm_up():
+    """Build the OpenAI client and this thread's crews ahead of the first message."""
+    start = time.perf_counter()
+    get_openai_client()
+    get_crew("normalize")
+    elapsed = time.perf_counter() - start
+    print(f"🔥 AI runtime warmed up in {elapsed * 1000:.0f} ms")
+    return elapsed
+
+
+def runtime_stats():
+    with _lock:
+        return dict(_stats, openai_client_ready=_openai_client is not None)
@@ -1,32 +1,16 @@
-import os
-from openai import OpenAI
+import json
 from textwrap import dedent
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from django.conf import settings
 
+from whatsapp.ai.cache import llm_cache, normalize_input, prompt_version
+from whatsapp.ai.local_scorer import is_borderline, score_lead_locally
+from whatsapp.ai.runtime import get_openai_client
 
-def ai_score_lead(lead):
-    """
-    Uses GPT-4.1-mini to return (score:int, segment:str, reason:str)
-    """
-
-    d = lead.data or {}
-
-    prompt = dedent(f"""
-    You are an expert real estate sales agent in India.
-    Your job is to QUALIFY a lead based on how serious and complete their information is.
-
-    Lead Type: {lead.lead_type}
-
-    Details:
-    - Name: {d.get("name")}
-    - Location: {d.get("location") or d.get("location_preference")}
-    - BHK: {d.get("bhk")}
-    - Area: {d.get("area_sqft") or d.get("area_preference")}
-    - Property Type: {d.get("property_type") or d.get("property_type_preference")}
-    - Budget / Price: {d.get("price_range") or d.get("budget")}
-    - Amenities: {d.get("amenities")}
-
+SCORE_MODEL = "gpt-4o-mini"
+SCORE_TEMPERATURE = 0.4
+SCORE_SYSTEM_PROMPT = "You are a real estate lead scoring expert. Always respond with valid JSON only."
+SCORE_RUBRIC = dedent("""
     Rules for scoring (0–100):
     - More structured & complete answers = higher score.
     - If budget/price/location are missing → heavy penalty.
@@ -38,51 +22,224 @@ def ai_score_lead(lead):
     - 50–79   = ACTIVE (engaged lead, needs follow-up)
     - 20–49   = PROSPECT (early stage, needs nurturing)
     - Below 20 = INACTIVE (not qualified or rejected)
+""")
+SCORE_PROMPT = dedent("""
+    You are an expert real estate sales agent in India.
+    Your job is to QUALIFY a lead based on how serious and complete their information is.
+
+    Lead Type: {lead_type}
 
+    Details:
+    - Name: {name}
+    - Location: {location}
+    - BHK: {bhk}
+    - Area: {area}
+    - Property Type: {property_type}
+    - Budget / Price: {price}
+    - Amenities: {amenities}
+""") + SCORE_RUBRIC + dedent("""
     Return strictly in JSON with keys: score, segment, reason.
-    """)
+""")
+BATCH_SCORE_PROMPT = dedent("""
+    You are an expert real estate sales agent in India.
+    Your job is to QUALIFY each of the leads below based on how serious and complete their information is.
+    Score every lead independently.
+
+    Leads (one JSON object per line):
+    {leads}
+""") + SCORE_RUBRIC + dedent("""
+    Return strictly in JSON: {{"results": [{{"id": <lead id>, "score": <int>, "segment": "<segment>", "reason": "<reason>"}}, ...]}}
+    with exactly one result per lead.
+""")
+SCORE_PROMPT_VERSION = prompt_version(SCORE_PROMPT, SCORE_SYSTEM_PROMPT, SCORE_MODEL, str(SCORE_TEMPERATURE))
+BATCH_SCORE_PROMPT_VERSION = prompt_version(BATCH_SCORE_PROMPT, SCORE_SYSTEM_PROMPT, SCORE_MODEL, str(SCORE_TEMPERATURE))
+
+
+def _score_fields(lead):
+    """The lead details the prompt is built from (and therefore the cache key)."""
+    d = lead.data or {}
+    return {
+        "lead_type": lead.lead_type,
+        "name": d.get("name"),
+        "location": d.get("location") or d.get("location_preference"),
+        "bhk": d.get("bhk"),
+        "area": d.get("area_sqft") or d.get("area_preference"),
+        "property_type": d.get("property_type") or d.get("property_type_preference"),
+        "price": d.get("price_range") or d.get("budget"),
+        "amenities": d.get("amenities"),
+    }
+
+
+def _parse_score_json(text):
+    if not text:
+        raise ValueError("Empty response from GPT")
 
+    # Clean the response - remove markdown code blocks if present
+    text = text.strip()
+    if text.startswith("```json"):
+        text = text[7:]
+    if text.startswith("```"):
+        text = text[3:]
+    if text.endswith("```"):
+        text = text[:-3]
+    return json.loads(text.strip())
+
+
+def _gpt_score(fields):
+    response = get_openai_client().chat.completions.create(
+        model=SCORE_MODEL,
+        messages=[
+            {"role": "system", "content": SCORE_SYSTEM_PROMPT},
+            {"role": "user", "content": SCORE_PROMPT.format(**fields)}
+        ],
+        temperature=SCORE_TEMPERATURE,
+        response_format={"type": "json_object"}  # Force JSON response
+    )
+    text = response.choices[0].message.content
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",  # Fixed model name
-            messages=[
-                {"role": "system", "content": "You are a real estate lead scoring expert. Always respond with valid JSON only."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.4,
-            response_format={"type": "json_object"}  # Force JSON response
-        )
-        text = response.choices[0].message.content
-        
-        if not text:
-            raise ValueError("Empty response from GPT")
-
-        # Clean the response - remove markdown code blocks if present
-        text = text.strip()
-        if text.startswith("```json"):
-            text = text[7:]
-        if text.startswith("```"):
-            text = text[3:]
-        if text.endswith("```"):
-            text = text[:-3]
-        text = text.strip()
-
-        # Expect JSON response
-        import json
-        result = json.loads(text)
-
-        return (
-            int(result.get("score", 0)),
-            result.get("segment", "INACTIVE"),
-            result.get("reason", "No reason provided.")
-        )
+        result = _parse_score_json(text)
+    except json.JSONDecodeError:
+        print(f"   Response was: {text[:200] if text else 'No response'}")
+        raise
 
+    value = [
+        int(result.get("score", 0)),
+        result.get("segment", "INACTIVE"),
+        result.get("reason", "No reason provided.")
+    ]
+    usage = getattr(response, "usage", None)
+    return value, getattr(usage, "total_tokens", 0) or 0
+
+
+def ai_score_lead(lead):
+    """
+    Uses GPT-4o-mini to return (score:int, segment:str, reason:str)
+
+    Identical lead details are answered from the LLM cache. Errors
+    propagate, so a failed request never becomes a stored score.
+    """
+    fields = _score_fields(lead)
+    try:
+        score, segment, reason = llm_cache.cached(
+            "ai_score_lead", lead.lead_type, json.dumps(fields, sort_keys=True), SCORE_PROMPT_VERSION,
+            lambda: _gpt_score(fields),
+        )
     except json.JSONDecodeError as e:
         print(f"❌ GPT Scoring JSON Error: {e}")
-        print(f"   Response was: {text[:200] if 'text' in locals() else 'No response'}")
-        # fallback if JSON parsing fails
-        return (0, "INACTIVE", "AI scoring failed - invalid JSON response.")
+        raise
     except Exception as e:
         print(f"❌ GPT Scoring Error: {e}")
-        # fallback if something fails
-        return (0, "INACTIVE", "AI scoring failed.")
+        raise
+    return score, segment, reason
+
+
+def _gpt_score_batch(fields_by_id):
+    """One chat completion for several leads -> {lead_id: [score, segment, reason]}."""
+    lines = "\n".join(json.dumps(dict(fields, id=lead_id), ensure_ascii=False) for lead_id, fields in fields_by_id.items())
+    response = get_openai_client().chat.completions.create(
+        model=SCORE_MODEL,
+        messages=[
+            {"role": "system", "content": SCORE_SYSTEM_PROMPT},
+            {"role": "user", "content": BATCH_SCORE_PROMPT.format(leads=lines)}
+        ],
+        temperature=SCORE_TEMPERATURE,
+        response_format={"type": "json_object"}
+    )
+    results = {}
+    for item in _parse_score_json(response.choices[0].message.content).get("results", []):
+        try:
+            lead_id = int(item.get("id"))
+        except (TypeError, ValueError):
+            continue
+        if lead_id in fields_by_id:
+            results[lead_id] = [
+                int(item.get("score", 0)),
+                item.get("segment", "INACTIVE"),
+                item.get("reason", "No reason provided."),
+            ]
+
+    usage = getattr(response, "usage", None)
+    return results, getattr(usage, "total_tokens", 0) or 0
+
+
+def ai_score_leads(leads):
+    """
+    Score several leads with a single GPT request.
+
+    Returns {lead.id: (score, segment, reason)}. Cached leads are answered
+    without being sent; leads the model skipped are missing from the result.
+    Request errors propagate so the caller can keep the batch pending.
+    """
+    results = {}
+    pending = {}
+    keys = {}
+    for lead in leads:
+        fields = _score_fields(lead)
+        key = llm_cache.make_key("ai_score_leads", lead.lead_type, normalize_input(json.dumps(fields, sort_keys=True)), BATCH_SCORE_PROMPT_VERSION)
+        found, value = llm_cache.get(key)
+        if found:
+            results[lead.id] = tuple(value)
+        else:
+            pending[lead.id] = fields
+            keys[lead.id] = key
+
+    if not pending:
+        return results
+
+    scored, tokens = _gpt_score_batch(pending)
+    per_lead_tokens = tokens // max(len(scored), 1)
+    for lead_id, value in scored.items():
+        llm_cache.set(keys[lead_id], "ai_score_leads", BATCH_SCORE_PROMPT_VERSION, value, per_lead_tokens)
+        results[lead_id] = tuple(value)
+    return results
+
+
+# ======== BACKENDS ========
+def scorer_backend():
+    return getattr(settings, "LEAD_SCORER_BACKEND", "gpt")
+
+
+def _borderline_margin():
+    return getattr(settings, "LEAD_SCORER_BORDERLINE_MARGIN", 5)
+
+
+def score_lead(lead):
+    """
+    Score one lead with the configured backend -> (score, segment, reason, scored_by).
+
+    "gpt"    - ai_score_lead (default)
+    "local"  - score_lead_locally, no network
+    "hybrid" - local, with GPT as a second opinion near segment boundaries
+
+    scored_by is "GPT" or "LOCAL", whichever produced the result. A GPT
+    failure raises, except in hybrid mode where the local score stands.
+    """
+    backend = scorer_backend()
+    if backend == "gpt":
+        return (*ai_score_lead(lead), "GPT")
+
+    result = score_lead_locally(lead)
+    if backend == "hybrid" and is_borderline(result[0], _borderline_margin()):
+        try:
+            return (*ai_score_lead(lead), "GPT")
+        except Exception:
+            pass  # the local score stands without a second opinion
+    return (*result, "LOCAL")
+
+
+def score_leads(leads):
+    """Batch version of score_lead -> {lead.id: (score, segment, reason, scored_by)}; GPT leads share one request."""
+    backend = scorer_backend()
+    if backend == "gpt":
+        return {lead_id: (*result, "GPT") for lead_id, result in ai_score_leads(leads).items()}
+
+    results = {lead.id: (*score_lead_locally(lead), "LOCAL") for lead in leads}
+    if backend == "hybrid":
+        margin = _borderline_margin()
+        borderline = [lead for lead in leads if is_borderline(results[lead.id][0], margin)]
+        if borderline:
+            try:
+                results.update({lead_id: (*result, "GPT") for lead_id, result in ai_score_leads(borderline).items()})
+            except Exception as e:
+                print(f"❌ GPT second opinion failed, keeping local scores: {e}")
+    return results
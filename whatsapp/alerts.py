@@ -0,0 +1,240 @@
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .flows import SELECTION_STEP
+from .gazetteer import gazetteer
+from .locks import conversation_lock
+from .matching import BUDGET_STRETCH, format_listing, listing_details
+from .models import BuyerQuery, Lead, Property, PropertyAlert
+from .outbox import TokenBucket
+from .state_cache import conversation_state_cache
+
+# A pending alert that fails this many times is marked FAILED
+MAX_ATTEMPTS = 5
+# Re-reads of the buyer's lead when it changes under _notify
+NOTIFY_RETRIES = 3
+
+
+def alerts_enabled():
+    return getattr(settings, "BUYER_ALERTS_ENABLED", False)
+
+
+# ======== STANDING QUERIES ========
+def save_buyer_query(lead, prefs):
+    """Keep the buyer's search open so listings added later are matched against it."""
+    if not alerts_enabled():
+        return
+    price = prefs.get("price_range")
+    BuyerQuery.objects.update_or_create(
+        lead=lead,
+        defaults={
+            "property_kind": prefs.get("property_kind") or "",
+            "locality": prefs.get("locality") or "",
+            "bhk_count": prefs.get("bhk_count"),
+            "price_cap": int(price[1] * BUDGET_STRETCH) if price else None,
+            "is_open": True,
+        },
+    )
+
+
+def close_buyer_query(lead):
+    if alerts_enabled():
+        BuyerQuery.objects.filter(lead=lead, is_open=True).update(is_open=False, updated_at=timezone.now())
+
+
+# ======== BATCHED REVERSE MATCH ========
+def _nearby_localities(locality):
+    radius = getattr(settings, "PROPERTY_MATCH_RADIUS_KM", 5)
+    return {key for key, _ in gazetteer.neighbours(locality, radius)} if locality and radius else set()
+
+
+def _has_search_fields(prop):
+    return bool(prop.property_kind or prop.locality or prop.bhk_count is not None or prop.min_price is not None)
+
+
+def _listing_filter(prop, nearby):
+    """Open buyer queries a listing satisfies; every equality goes through the (is_open, kind, locality) index."""
+    q = Q()
+    if prop.property_kind:
+        q &= Q(property_kind__in=[prop.property_kind, ""])
+    if prop.locality:
+        q &= Q(locality__in=[prop.locality, *nearby, ""])
+    if prop.bhk_count is not None:
+        q &= Q(bhk_count__isnull=True) | Q(bhk_count__gte=prop.bhk_count - 1, bhk_count__lte=prop.bhk_count + 1)
+    if prop.min_price is not None:
+        q &= Q(price_cap__isnull=True) | Q(price_cap__gte=prop.min_price)
+    return q
+
+
+def _accepts(query, prop, nearby):
+    """Python version of _listing_filter, to split one batched result set per listing."""
+    if prop.property_kind and query.property_kind not in (prop.property_kind, ""):
+        return False
+    if prop.locality and query.locality and query.locality != prop.locality and query.locality not in nearby:
+        return False
+    if prop.bhk_count is not None and query.bhk_count is not None and abs(query.bhk_count - prop.bhk_count) > 1:
+        return False
+    if prop.min_price is not None and query.price_cap is not None and query.price_cap < prop.min_price:
+        return False
+    return True
+
+
+def match_new_listings(properties):
+    """
+    Match a batch of new listings against every open buyer query in one SELECT.
+
+    Returns [(buyer_id, property_id)], leaving out each listing's own seller.
+    A listing none of whose answers parsed would match every open query (its
+    filter is an empty Q, which also drops out of the OR), so it is skipped.
+    """
+    unparsed = [prop.id for prop in properties if not _has_search_fields(prop)]
+    if unparsed:
+        print(f"⚠️ Listing(s) {unparsed} have no parsed search fields, no alerts sent")
+    properties = [prop for prop in properties if _has_search_fields(prop)]
+    if not properties:
+        return []
+    nearby = {prop.id: _nearby_localities(prop.locality) for prop in properties}
+    condition = Q()
+    for prop in properties:
+        condition |= _listing_filter(prop, nearby[prop.id])
+
+    pairs = []
+    for query in BuyerQuery.objects.filter(condition, is_open=True).only(
+        "lead_id", "property_kind", "locality", "bhk_count", "price_cap"
+    ).iterator(chunk_size=2000):
+        for prop in properties:
+            if query.lead_id != prop.SELLER_id and _accepts(query, prop, nearby[prop.id]):
+                pairs.append((query.lead_id, prop.id))
+    return pairs
+
+
+def match_pending_listings(batch_size=50):
+    """Turn one batch of listings flagged alerts_pending into PropertyAlert rows. Returns alerts created."""
+    properties = list(Property.objects.filter(alerts_pending=True, is_active=True).order_by("id")[:batch_size])
+    if not properties:
+        return 0
+
+    pairs = match_new_listings(properties)
+    created = PropertyAlert.objects.bulk_create(
+        [PropertyAlert(buyer_id=buyer_id, property_id=property_id) for buyer_id, property_id in pairs],
+        ignore_conflicts=True,
+        batch_size=1000,
+    )
+    Property.objects.filter(id__in=[p.id for p in properties]).update(alerts_pending=False)
+    print(f"🔔 Matched {len(properties)} new listing(s) to {len(pairs)} waiting buyer(s)")
+    return len(created)
+
+
+# ======== FAN-OUT ========
+def _notify(alert):
+    """Offer the listing to the buyer as the next selection number. False if the buyer has moved on."""
+    from .utils import send_whatsapp_message
+
+    phone = alert.buyer.phone
+    prop = alert.property
+    with conversation_lock(phone):
+        # The lock spans processes only on Postgres; on SQLite the webhook
+        # worker can save this lead between our read and write, so the write
+        # only lands on the row as read, and is redone from a fresh read if not
+        for _ in range(NOTIFY_RETRIES):
+            lead = Lead.objects.get(pk=alert.buyer_id)
+            if lead.current_step != SELECTION_STEP or lead.lead_type != "BUYER":
+                return False
+
+            data = lead.data
+            ids = list(data.get("matching_property_ids", []))
+            if prop.id not in ids:
+                ids.append(prop.id)
+            data["matching_property_ids"] = ids
+            data.setdefault("matching_properties", {})[str(prop.id)] = listing_details(prop)
+            # Only keys outside LEAD_DATA_FIELDS change, so the lead's columns stay as they are
+            if Lead.objects.filter(pk=lead.pk, updated_at=lead.updated_at).update(
+                data=data, updated_at=timezone.now(), version=F("version") + 1
+            ):
+                if conversation_state_cache.enabled:
+                    conversation_state_cache.invalidate(phone)
+                break
+        else:
+            raise RuntimeError(f"lead {alert.buyer_id} kept changing")
+
+    number = ids.index(prop.id) + 1
+    send_whatsapp_message(
+        phone,
+        "🏡 A new property matching your search was just listed:\n\n"
+        + format_listing(number, prop)
+        + f"\n👉 Reply with {number} if interested."
+    )
+    return True
+
+
+def send_pending_alerts(bucket, limit=200):
+    """
+    Send one pass of pending alerts under the rate limit.
+
+    Buyers get at most BUYER_ALERTS_PER_DAY alerts per 24 hours; alerts over
+    the cap wait for the next window. Returns the number sent.
+    """
+    per_day = getattr(settings, "BUYER_ALERTS_PER_DAY", 3)
+    since = timezone.now() - timedelta(days=1)
+    recent = PropertyAlert.objects.filter(status="SENT", sent_at__gte=since).values("buyer_id").annotate(n=Count("id"))
+    capped = recent.filter(n__gte=per_day).values("buyer_id")
+
+    alerts = list(
+        PropertyAlert.objects.filter(status="PENDING")
+        .exclude(buyer_id__in=capped)
+        .select_related("buyer", "property")
+        .order_by("id")[:limit]
+    )
+    if not alerts:
+        return 0
+
+    sent_today = Counter({row["buyer_id"]: row["n"] for row in recent.filter(buyer_id__in={a.buyer_id for a in alerts})})
+
+    sent = 0
+    for alert in alerts:
+        if sent_today[alert.buyer_id] >= per_day:
+            continue
+        bucket.acquire()
+        try:
+            delivered = _notify(alert)
+        except Exception as e:
+            alert.attempts += 1
+            alert.last_error = str(e)
+            if alert.attempts >= MAX_ATTEMPTS:
+                alert.status = "FAILED"
+            alert.save(update_fields=["status", "attempts", "last_error"])
+            print(f"❌ Buyer alert {alert.id} failed (attempt {alert.attempts}/{MAX_ATTEMPTS}): {e}")
+            continue
+        alert.status = "SENT" if delivered else "SKIPPED"
+        alert.sent_at = timezone.now() if delivered else None
+        alert.save(update_fields=["status", "sent_at"])
+        if delivered:
+            sent_today[alert.buyer_id] += 1
+            sent += 1
+    return sent
+
+
+def run_alerts(batch_size=50, poll_interval=5.0, stop_event=None):
+    stop_event = stop_event or threading.Event()
+    bucket = TokenBucket(
+        getattr(settings, "BUYER_ALERTS_RATE_PER_SECOND", 5),
+        getattr(settings, "BUYER_ALERTS_BURST", 10),
+    )
+    print("🚀 Buyer alerts started")
+    while not stop_event.is_set():
+        start = time.monotonic()
+        matched = match_pending_listings(batch_size)
+        sent = send_pending_alerts(bucket)
+        close_old_connections()
+        if not matched and not sent:
+            stop_event.wait(poll_interval)
+        elif sent:
+            print(f"📣 Sent {sent} buyer alert(s) in {time.monotonic() - start:.1f}s")
+    print("🛑 Buyer alerts stopped")
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class WhatsappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'whatsapp'
+
+    def ready(self):
+        # Connects the Property/Lead signals that keep the match index current
+        from . import match_index  # noqa: F401
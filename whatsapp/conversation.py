@@ -0,0 +1,230 @@
+"""
+Conversation engine for the flows in whatsapp.flows.
+
+Every step name maps to its handler in one dict, so a message costs a
+single lookup whatever the number of steps. The conversation step is a
+column on the lead, so a message reads one row and changes to it are
+collected on a Turn and written once at the end of the message, as a
+single UPDATE with update_fields limited to what changed. Time spent per
+step is kept for `stats()`.
+
+With CONVERSATION_STATE_CACHE_ENABLED the lead row is served from
+whatsapp.state_cache and the write at the end of a turn goes through it,
+conditional on the version that was read. A process-local cache checks
+that version before any handler runs, a shared one needs no query; a
+stale entry is treated as a miss.
+"""
+import threading
+import time
+
+from django.db import router
+
+from .flows import CHOOSE_STEP, COMPLETED_STEP, GREETINGS, INITIAL_STEP
+from .models import Lead
+from .state_cache import conversation_state_cache
+
+
+class Turn:
+    """One inbound message: the lead it acts on, and what it changed."""
+
+    def __init__(self, phone, text, lead):
+        self.phone = phone
+        self.text = text.strip()
+        self.txt = self.text.lower()
+        self.lead = lead
+        self._lead_fields = set()
+
+    def set_data(self, key, value):
+        self.lead.data[key] = value
+        self._lead_fields.add("data")
+
+    def set_lead(self, **fields):
+        for name, value in fields.items():
+            setattr(self.lead, name, value)
+        self._lead_fields.update(fields)
+
+    def goto(self, step):
+        if self.lead.current_step != step:
+            self.lead.current_step = step
+            self._lead_fields.add("current_step")
+
+    def save(self):
+        """Write whatever changed since the last save (nothing if nothing did), as one UPDATE."""
+        if not self._lead_fields:
+            return
+        lead = self.lead
+        if not conversation_state_cache.enabled:
+            lead.save(update_fields=[*self._lead_fields, "updated_at"])
+        elif lead.save_if_current(self._lead_fields):
+            conversation_state_cache.put(lead)
+        else:
+            # Only two processes handling the phone at once get here; this
+            # turn's replies are already out, so keep its changes, as writes
+            # did before versioning, and let the next message re-read the row
+            print(f"⚠️ Lead {self.phone} changed during the turn (was version {lead.version}), overwriting")
+            lead.save(update_fields=[*self._lead_fields, "updated_at"])
+            conversation_state_cache.invalidate(self.phone, conflict=True)
+        self._lead_fields.clear()
+
+
+def _cached_lead(phone, cached):
+    """The lead rebuilt from a cache entry, or None if the entry is stale."""
+    cache = conversation_state_cache
+    if not cache.shared:
+        version = Lead.objects.filter(phone=phone).values_list("version", flat=True).first()
+        if version != cached["version"]:
+            cache.invalidate(phone, conflict=version is not None)
+            return None
+    names = list(cached)
+    return Lead.from_db(router.db_for_read(Lead), names, [cached[name] for name in names])
+
+
+def load_conversation(phone):
+    """
+    The lead for `phone`, with its conversation step; created on the first
+    message. With the state cache on, a hit costs no query (shared backend)
+    or a version check (local memory) instead of reading the row.
+    """
+    cache = conversation_state_cache
+    if cache.enabled:
+        start = time.perf_counter()
+        cached = cache.get(phone)
+        lead = _cached_lead(phone, cached) if cached is not None else None
+        if lead is not None:
+            cache.record_lookup(True, time.perf_counter() - start)
+            return lead
+
+    lead = Lead.objects.filter(phone=phone).first()
+    if lead is None:
+        lead, _ = Lead.objects.get_or_create(phone=phone)
+    if cache.enabled:
+        cache.put(lead)
+        cache.record_lookup(False, time.perf_counter() - start)
+    return lead
+
+
+class ConversationEngine:
+    def __init__(self, flows, actions, send_message, send_buttons, normalize):
+        self.flows = flows
+        self.actions = actions
+        self.send_message = send_message
+        self.send_buttons = send_buttons
+        self.normalize = normalize
+
+        # step name -> (handler, flow it belongs to or None)
+        self.dispatch = {
+            CHOOSE_STEP: (self._choose_flow, None),
+            INITIAL_STEP: (self._choose_flow, None),
+            COMPLETED_STEP: (self._completed, None),
+        }
+        for flow in flows:
+            for index, step in enumerate(flow.steps):
+                self.dispatch[step.name] = (self._answer_handler(flow, index, other=False), flow)
+                if step.other_prompt:
+                    self.dispatch[f"{step.name}_OTHER"] = (self._answer_handler(flow, index, other=True), flow)
+            for name, action in flow.handlers.items():
+                self.dispatch[name] = (self.actions[action], flow)
+        # Fail at startup, not mid-conversation, if a flow names a missing action
+        for flow in flows:
+            missing = [a for a in [flow.start, flow.finish, *(s.enrich for s in flow.steps)] if a and a not in self.actions]
+            if missing:
+                raise ValueError(f"{flow.lead_type} flow uses unknown action(s) {missing}")
+
+        self._lock = threading.Lock()
+        self._timings = {}  # step -> [count, total_ms, max_ms]
+
+    # ---- prompts ----
+    def ask(self, turn, step):
+        if step.buttons:
+            self.send_buttons(turn.phone, step.prompt, step.buttons)
+        else:
+            self.send_message(turn.phone, step.prompt)
+        turn.goto(step.name)
+
+    def welcome(self, turn):
+        turn.set_lead(lead_type="", data={}, status="NEW")
+        self.send_buttons(
+            turn.phone,
+            "👋 Welcome to *Dheeraj Properties!*\nHow can we help you today?",
+            ["BUY", "SELL"]
+        )
+        turn.goto(CHOOSE_STEP)
+
+    # ---- handlers ----
+    def _choose_flow(self, turn):
+        for flow in self.flows:
+            if flow.keyword in turn.txt:
+                print(f"✅ {flow.keyword.upper()} selected, setting lead type to {flow.lead_type}")
+                turn.set_lead(lead_type=flow.lead_type, data={})
+                if flow.start:
+                    self.actions[flow.start](turn)
+                return self.ask(turn, flow.steps[0])
+
+        print(f"❌ Invalid input in {CHOOSE_STEP}: '{turn.txt}' (step: {turn.lead.current_step})")
+        self.send_buttons(turn.phone, "❓ Please select one:", [flow.keyword.upper() for flow in self.flows])
+        turn.goto(CHOOSE_STEP)
+
+    def _completed(self, turn):
+        self.send_message(turn.phone, "🙏 Thank you! Type *Hi* to start a new inquiry.")
+
+    def _answer_handler(self, flow, index, other):
+        step = flow.steps[index]
+
+        def handle(turn):
+            if step.other_prompt and not other and turn.txt == "other":
+                self.send_message(turn.phone, step.other_prompt)
+                return turn.goto(f"{step.name}_OTHER")
+
+            answer = self.normalize(step.question, turn.txt) if step.question else turn.text
+            turn.set_data(step.store, answer)
+            if step.enrich:
+                self.actions[step.enrich](turn)
+
+            if index + 1 < len(flow.steps):
+                return self.ask(turn, flow.steps[index + 1])
+
+            # A finished questionnaire is a new lead; the finish action's side
+            # effects (Sheets, scoring queue) read it back, so persist it first
+            turn.set_lead(status="NEW")
+            turn.save()
+            turn.goto(self.actions[flow.finish](turn))
+
+        return handle
+
+    def _fallback(self, turn):
+        self.send_message(turn.phone, "❓ I didn't understand that. Type *Hi* to start over.")
+
+    # ---- entry point ----
+    def handle(self, phone, text):
+        start = time.perf_counter()
+        lead = load_conversation(phone)
+        turn = Turn(phone, text, lead)
+        step = lead.current_step
+        print(f"📥 Processing message: '{text}' -> '{turn.txt}' | Current step: {step} | Lead type: {lead.lead_type}")
+
+        if turn.txt in GREETINGS:
+            self.welcome(turn)
+        else:
+            handler, flow = self.dispatch.get(step, (self._fallback, None))
+            if flow is not None and lead.lead_type != flow.lead_type:
+                handler = self._fallback
+            handler(turn)
+        turn.save()
+        self._record(step, (time.perf_counter() - start) * 1000)
+        return turn
+
+    # ---- stats ----
+    def _record(self, step, ms):
+        with self._lock:
+            entry = self._timings.setdefault(step, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += ms
+            entry[2] = max(entry[2], ms)
+
+    def stats(self):
+        """{step: {count, avg_ms, max_ms}} for messages handled by this process."""
+        with self._lock:
+            return {
+                step: {"count": count, "avg_ms": round(total / count, 1), "max_ms": round(worst, 1)}
+                for step, (count, total, worst) in self._timings.items()
+            }
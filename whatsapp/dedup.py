@@ -0,0 +1,162 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+
+from .models import ProcessedMessage
+
+
+class MessageDedup:
+    """
+    Processed-message-id store with a TTL.
+
+    A small in-process LRU answers most retries without a query; the
+    ProcessedMessage table is the source of truth shared by every worker.
+    A claim made inside a transaction only reaches the LRU once it commits,
+    so a rolled-back claim never hides Meta's retry.
+    """
+
+    def __init__(self, ttl_seconds, local_size):
+        self.ttl_seconds = ttl_seconds
+        self.local_size = local_size
+        self._local = OrderedDict()  # message_id -> monotonic expiry
+        self._lock = threading.Lock()
+        self._purging = threading.Lock()
+        self.last_purge = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+
+    # ---- in-process LRU ----
+    def _local_seen(self, message_id):
+        now = time.monotonic()
+        with self._lock:
+            expires = self._local.get(message_id)
+            if expires is None:
+                return False
+            if expires < now:
+                del self._local[message_id]
+                return False
+            self._local.move_to_end(message_id)
+            return True
+
+    def _remember(self, message_id):
+        with self._lock:
+            self._local[message_id] = time.monotonic() + self.ttl_seconds
+            self._local.move_to_end(message_id)
+            while len(self._local) > self.local_size:
+                self._local.popitem(last=False)
+
+    def _forget(self, message_id):
+        with self._lock:
+            self._local.pop(message_id, None)
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    # ---- DB-backed claim ----
+    def _claim_in_db(self, message_id, phone):
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                ProcessedMessage.objects.create(message_id=message_id, phone=phone, processed_at=now)
+            return True
+        except IntegrityError:
+            # Row exists: only an expired one may be taken over
+            cutoff = now - timedelta(seconds=self.ttl_seconds)
+            return bool(
+                ProcessedMessage.objects.filter(message_id=message_id, processed_at__lt=cutoff)
+                .update(processed_at=now, phone=phone)
+            )
+
+    def claim(self, message_id, phone=""):
+        """Return True the first time a message id is seen within the TTL, False for duplicates."""
+        if not message_id:
+            return True
+
+        if self._local_seen(message_id):
+            self._count(hit=True)
+            return False
+
+        is_new = self._claim_in_db(message_id, phone)
+        transaction.on_commit(lambda: self._remember(message_id))
+        self._count(hit=not is_new)
+        return is_new
+
+    def release(self, message_id):
+        """Undo a claim whose message was not handled, so Meta's retry is processed."""
+        if not message_id:
+            return
+        self._forget(message_id)
+        ProcessedMessage.objects.filter(message_id=message_id).delete()
+
+    def filter_new(self, messages):
+        """
+        Drop already-processed messages from a parsed webhook batch.
+
+        A fully redelivered batch is rejected with a single SELECT; the
+        remaining ids are claimed one by one so concurrent deliveries of the
+        same id can only ever have one winner.
+        """
+        ids = [m["id"] for m in messages if m.get("id") and not self._local_seen(m["id"])]
+        cutoff = timezone.now() - timedelta(seconds=self.ttl_seconds)
+        known = set(
+            ProcessedMessage.objects.filter(message_id__in=ids, processed_at__gte=cutoff)
+            .values_list("message_id", flat=True)
+        ) if ids else set()
+
+        fresh = []
+        for message in messages:
+            message_id = message.get("id")
+            if message_id in known:
+                self._remember(message_id)
+                self._count(hit=True)
+            elif self.claim(message_id, message.get("phone", "")):
+                fresh.append(message)
+        return fresh
+
+    def purge_expired(self):
+        cutoff = timezone.now() - timedelta(seconds=self.ttl_seconds)
+        deleted, _ = ProcessedMessage.objects.filter(processed_at__lt=cutoff).delete()
+        self.last_purge = time.monotonic()
+        return deleted
+
+    def _purge_in_background(self):
+        try:
+            deleted = self.purge_expired()
+            if deleted:
+                print(f"🧹 Purged {deleted} expired processed message id(s)")
+        except Exception as e:
+            print(f"❌ Processed message purge failed: {e}")
+        finally:
+            close_old_connections()
+            self._purging.release()
+
+    def maybe_purge(self):
+        """Purge expired ids on a background thread if WHATSAPP_DEDUP_PURGE_SECONDS have passed."""
+        interval = getattr(settings, "WHATSAPP_DEDUP_PURGE_SECONDS", 3600)
+        if time.monotonic() - self.last_purge >= interval and self._purging.acquire(blocking=False):
+            threading.Thread(target=self._purge_in_background, name="dedup-purge", daemon=True).start()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+                "local_entries": len(self._local),
+            }
+
+
+message_dedup = MessageDedup(
+    ttl_seconds=getattr(settings, "WHATSAPP_DEDUP_TTL_SECONDS", 7 * 24 * 3600),
+    local_size=getattr(settings, "WHATSAPP_DEDUP_LOCAL_SIZE", 10000),
+)
@@ -1,26 +1,45 @@
 import os
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from dotenv import load_dotenv
+import threading
+import time
 
-# Load environment variables
-load_dotenv()
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Count, F
+from django.utils import timezone
 
-# Path to same Google credentials used for Sheets - use environment variable or default
-GOOGLE_CREDENTIALS_FILE = os.getenv('GOOGLE_CREDENTIALS_FILE', 'google_credentials.json')
-GOOGLE_AUTH_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), GOOGLE_CREDENTIALS_FILE)
+# Same Google credentials used for Sheets, loaded once per process
+from .google_clients import GOOGLE_AUTH_FILE, google_clients
+from .models import DriveFolder
+from .outbox import TokenBucket
 
-SCOPES = ["https://www.googleapis.com/auth/drive"]
+# Name pool folders carry until a seller claims them
+POOL_FOLDER_NAME = "Seller upload (unassigned)"
+MAX_RENAME_ATTEMPTS = 5
 
-def create_drive_folder(folder_name):
+
+def folder_link(folder_id):
+    return f"https://drive.google.com/drive/folders/{folder_id}?usp=drive_link"
+
+
+def _report_drive_error(e):
+    error_msg = str(e)
+    if "accessNotConfigured" in error_msg or "403" in error_msg:
+        print("❌ Drive Error: Google Drive API is not enabled in your Google Cloud project.")
+        print("   Please enable it at: https://console.cloud.google.com/apis/library/drive.googleapis.com")
+        print("   Or visit the link provided in the error message above.")
+    else:
+        print(f"❌ Drive Error: {e}")
+
+
+def create_shared_folder(folder_name):
+    """Create a folder anyone with the link can upload to. Returns its id, or None."""
     try:
         # Check if credentials file exists
         if not os.path.exists(GOOGLE_AUTH_FILE):
             print(f"❌ Drive Error: Credentials file not found at {GOOGLE_AUTH_FILE}")
             return None
 
-        creds = service_account.Credentials.from_service_account_file(GOOGLE_AUTH_FILE, scopes=SCOPES)
-        service = build("drive", "v3", credentials=creds)
+        service = google_clients.drive_service()
 
         # Create folder metadata
         file_metadata = {
@@ -38,17 +57,146 @@ def create_drive_folder(folder_name):
             "allowFileDiscovery": False
         }
         service.permissions().create(fileId=folder_id, body=permission).execute()
-
-        # Generate upload link
-        upload_link = f"https://drive.google.com/drive/folders/{folder_id}?usp=drive_link"
-        return upload_link
+        return folder_id
 
     except Exception as e:
-        error_msg = str(e)
-        if "accessNotConfigured" in error_msg or "403" in error_msg:
-            print("❌ Drive Error: Google Drive API is not enabled in your Google Cloud project.")
-            print("   Please enable it at: https://console.cloud.google.com/apis/library/drive.googleapis.com")
-            print("   Or visit the link provided in the error message above.")
-        else:
-            print(f"❌ Drive Error: {e}")
+        _report_drive_error(e)
         return None
+
+
+def create_drive_folder(folder_name):
+    folder_id = create_shared_folder(folder_name)
+    # Generate upload link
+    return folder_link(folder_id) if folder_id else None
+
+
+# ======== FOLDER POOL ========
+# With DRIVE_FOLDER_POOL_SIZE > 0, `manage.py run_drive_pool` keeps that many
+# shared folders ready. A seller's completion claims one with a single UPDATE
+# and gets the link at once; the runner renames it after the seller later.
+def pool_enabled():
+    return getattr(settings, "DRIVE_FOLDER_POOL_SIZE", 0) > 0
+
+
+def claim_drive_folder(lead, folder_name):
+    """Hand the oldest ready folder to `lead`. Returns its link, or None if the pool is empty."""
+    start = time.perf_counter()
+    while True:
+        candidates = list(DriveFolder.objects.filter(status="READY").order_by("id").values_list("id", "link")[:5])
+        if not candidates:
+            return None
+        for folder_pk, link in candidates:
+            # Conditional update is the claim: only one worker can flip READY -> CLAIMED
+            claimed = DriveFolder.objects.filter(pk=folder_pk, status="READY").update(
+                status="CLAIMED", lead=lead, name=folder_name, claimed_at=timezone.now()
+            )
+            if claimed:
+                DriveFolder.objects.filter(pk=folder_pk).update(claim_ms=(time.perf_counter() - start) * 1000)
+                return link
+        # Other workers took all of them; look again
+
+
+def get_upload_link(lead, folder_name):
+    """Seller upload link: from the pool when enabled, otherwise (or when it runs dry) a new folder."""
+    if pool_enabled():
+        link = claim_drive_folder(lead, folder_name)
+        if link:
+            return link
+        print(f"⚠️ Drive folder pool is empty, creating a folder for {lead.phone}")
+
+    start = time.perf_counter()
+    folder_id = create_shared_folder(folder_name)
+    if not folder_id:
+        return None
+    if pool_enabled():
+        # Recorded so pool misses and their latency show up in `run_drive_pool --stats`
+        now = timezone.now()
+        DriveFolder.objects.create(
+            folder_id=folder_id, link=folder_link(folder_id), status="ASSIGNED", lead=lead, name=folder_name,
+            pooled=False, claim_ms=(time.perf_counter() - start) * 1000, claimed_at=now, assigned_at=now,
+        )
+    return folder_link(folder_id)
+
+
+def refill_pool(bucket, limit=None):
+    """Create folders until the pool is back at DRIVE_FOLDER_POOL_SIZE (at most `limit`). Returns folders created."""
+    missing = getattr(settings, "DRIVE_FOLDER_POOL_SIZE", 0) - DriveFolder.objects.filter(status="READY").count()
+    if limit is not None:
+        missing = min(missing, limit)
+    created = 0
+    for _ in range(max(missing, 0)):
+        bucket.acquire()
+        folder_id = create_shared_folder(POOL_FOLDER_NAME)
+        if not folder_id:
+            break
+        DriveFolder.objects.create(folder_id=folder_id, link=folder_link(folder_id))
+        created += 1
+    return created
+
+
+def rename_claimed_folders(batch_size=20):
+    """Give claimed folders their seller's name. Returns folders renamed."""
+    folders = list(
+        DriveFolder.objects.filter(status="CLAIMED", rename_attempts__lt=MAX_RENAME_ATTEMPTS).order_by("id")[:batch_size]
+    )
+    renamed = 0
+    for folder in folders:
+        try:
+            google_clients.drive_service().files().update(
+                fileId=folder.folder_id, body={"name": folder.name}, fields="id"
+            ).execute()
+        except Exception as e:
+            DriveFolder.objects.filter(pk=folder.pk).update(rename_attempts=F("rename_attempts") + 1)
+            _report_drive_error(e)
+            continue
+        folder.status = "ASSIGNED"
+        folder.assigned_at = timezone.now()
+        folder.save(update_fields=["status", "assigned_at"])
+        renamed += 1
+    return renamed
+
+
+def pool_stats(sample_size=500):
+    """Pool depth, hit rate and claim / rename latency over the most recent claims."""
+    counts = {status: 0 for status, _ in DriveFolder.STATUS_CHOICES}
+    for row in DriveFolder.objects.values("status").annotate(n=Count("id")):
+        counts[row["status"]] = row["n"]
+
+    recent = DriveFolder.objects.filter(claimed_at__isnull=False).order_by("-claimed_at")[:sample_size]
+    claims = list(recent.values_list("pooled", "claim_ms", "claimed_at", "assigned_at"))
+    hits = [ms for pooled, ms, _, _ in claims if pooled and ms is not None]
+    misses = [ms for pooled, ms, _, _ in claims if not pooled and ms is not None]
+    rename_lags = [(a - c).total_seconds() for pooled, _, c, a in claims if pooled and a]
+    stuck = DriveFolder.objects.filter(status="CLAIMED", rename_attempts__gte=MAX_RENAME_ATTEMPTS).count()
+
+    return {
+        "target_size": getattr(settings, "DRIVE_FOLDER_POOL_SIZE", 0),
+        "ready": counts["READY"],
+        "awaiting_rename": counts["CLAIMED"],
+        "rename_failed": stuck,
+        "assigned": counts["ASSIGNED"],
+        "hit_rate": len(hits) / len(claims) if claims else None,
+        "avg_claim_ms": sum(hits) / len(hits) if hits else 0.0,
+        "max_claim_ms": max(hits) if hits else 0.0,
+        "avg_miss_ms": sum(misses) / len(misses) if misses else 0.0,
+        "avg_rename_lag_seconds": sum(rename_lags) / len(rename_lags) if rename_lags else 0.0,
+    }
+
+
+def run_drive_pool(interval=None, stop_event=None):
+    stop_event = stop_event or threading.Event()
+    interval = interval or getattr(settings, "DRIVE_FOLDER_POOL_INTERVAL_SECONDS", 5)
+    per_minute = getattr(settings, "DRIVE_FOLDER_POOL_REFILL_PER_MINUTE", 30)
+    bucket = TokenBucket(per_minute / 60, max(1, per_minute // 6))
+    print(f"🚀 Drive folder pool started (size={getattr(settings, 'DRIVE_FOLDER_POOL_SIZE', 0)})")
+    while not stop_event.is_set():
+        # Renames first: they are what sellers see in Drive
+        renamed = rename_claimed_folders()
+        # One bucket burst per pass keeps renames from waiting behind a long refill
+        created = refill_pool(bucket, limit=bucket.capacity)
+        close_old_connections()
+        if not renamed and not created:
+            stop_event.wait(interval)
+        else:
+            print(f"📁 Drive pool: {created} folder(s) added, {renamed} renamed")
+    print("🛑 Drive folder pool stopped")
@@ -0,0 +1,68 @@
+"""
+Buyer and seller questionnaires as data.
+
+A Flow is picked by a keyword at ASK_BUY_OR_SELL, then walks its steps in
+order: each step's prompt is sent on entering it, and the answer is
+normalized with `question` (None keeps the raw text) and stored under
+lead.data[store]. A step with `other_prompt` sends that prompt when the
+answer is "other" and takes the typed answer at "<name>_OTHER". Names in
+`enrich`, `start`, `finish` and `handlers` are actions supplied by the
+views; `finish` returns the step to move to.
+"""
+from collections import namedtuple
+
+Step = namedtuple(
+    "Step", ["name", "prompt", "question", "store", "buttons", "other_prompt", "enrich"], defaults=(None, None, None)
+)
+
+Flow = namedtuple("Flow", ["lead_type", "keyword", "steps", "start", "finish", "handlers"])
+
+PROPERTY_TYPES = ["Apartment", "House", "Plot"]
+BEDROOMS = ["1BHK", "2BHK", "3BHK"]
+AMENITIES = ["Pool", "Gym", "Other"]
+
+# Steps answered outside the questionnaires
+GREETINGS = {"hi", "hii", "hello", "hey", "start", "yo", "hola"}
+CHOOSE_STEP = "ASK_BUY_OR_SELL"
+INITIAL_STEP = "INIT"
+COMPLETED_STEP = "COMPLETED"
+SELECTION_STEP = "BUY_PROPERTY_SELECTION"
+
+BUYER_FLOW = Flow(
+    lead_type="BUYER",
+    keyword="buy",
+    steps=[
+        Step("BUY_Q1", "Great! 🏡 What type of property are you looking for?", "Property Type", "property_type_preference", PROPERTY_TYPES),
+        Step("BUY_Q2", "📏 Preferred area? (e.g., 1000–1500 sq.ft)", "Area", "area_preference"),
+        Step("BUY_Q3", "🛏 Bedrooms needed?", "Bedrooms", "bhk", BEDROOMS),
+        Step("BUY_Q4", "🧾 Your name?", None, "name"),
+        Step("BUY_Q5", "📍 Preferred location?", "Location", "location_preference", enrich="store_location_key"),
+        Step("BUY_Q6", "💰 Budget?", "Budget", "budget"),
+        Step("BUY_Q7", "🏷 Amenities needed?", "Amenities", "amenities", AMENITIES,
+             other_prompt="Type preferred amenities (e.g., Lift, Garden, Backup):"),
+    ],
+    start="close_buyer_query",
+    finish="complete_buyer_search",
+    handlers={SELECTION_STEP: "select_property"},
+)
+
+SELLER_FLOW = Flow(
+    lead_type="SELLER",
+    keyword="sell",
+    steps=[
+        Step("SELL_Q1", "Awesome! 🏠 What type of property are you selling?", "Property Type", "property_type", PROPERTY_TYPES),
+        Step("SELL_Q2", "📐 Enter the area in sq.ft:", "Area", "area_sqft"),
+        Step("SELL_Q3", "🛏 Bedrooms?", "Bedrooms", "bhk", BEDROOMS),
+        Step("SELL_Q4", "🧾 May I have your name?", None, "name"),
+        Step("SELL_Q5", "📍 Property location?", "Location", "location"),
+        Step("SELL_Q6", "💰 Expected price range?", "Price", "price_range"),
+        Step("SELL_Q7", "🏷 Amenities?", "Amenities", "amenities", AMENITIES,
+             other_prompt="Type amenities (e.g., Power Backup, Garden, Lift):"),
+    ],
+    start="close_buyer_query",
+    finish="complete_seller_listing",
+    handlers={},
+)
+
+# Checked in order at ASK_BUY_OR_SELL
+FLOWS = [BUYER_FLOW, SELLER_FLOW]
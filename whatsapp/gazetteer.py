@@ -0,0 +1,240 @@
+"""
+Hyderabad locality gazetteer.
+
+Canonical locality names with aliases and approximate centroids, a fuzzy
+matcher for spelling variants ("Gachi bowli", "Kukatpalli") and a
+neighbour table for radius search. Plain Python with no I/O, like
+whatsapp.parsing, so it is safe to use from models.
+"""
+import math
+import re
+import threading
+from collections import Counter, namedtuple
+from functools import lru_cache
+
+Locality = namedtuple("Locality", ["key", "name", "lat", "lng"])
+
+# (canonical name, lat, lng, aliases)
+LOCALITIES = [
+    ("Gachibowli", 17.4401, 78.3489, ["gachibouli"]),
+    ("Hitech City", 17.4474, 78.3762, ["hi tech city", "hitec city", "hi-tec city", "cyberabad"]),
+    ("Madhapur", 17.4483, 78.3915, []),
+    ("Kondapur", 17.4690, 78.3640, []),
+    ("Financial District", 17.4140, 78.3370, ["financial dist", "fin district"]),
+    ("Nanakramguda", 17.4170, 78.3440, ["nanakram guda"]),
+    ("Kokapet", 17.3960, 78.3300, []),
+    ("Narsingi", 17.3850, 78.3560, []),
+    ("Puppalaguda", 17.3900, 78.3700, []),
+    ("Manikonda", 17.4050, 78.3860, []),
+    ("Gandipet", 17.3900, 78.3000, []),
+    ("Tellapur", 17.4600, 78.2900, []),
+    ("Kollur", 17.4600, 78.2500, []),
+    ("Lingampally", 17.4930, 78.3170, ["lingampalli"]),
+    ("Serilingampally", 17.4870, 78.3300, ["serilingampalli"]),
+    ("Chandanagar", 17.4930, 78.3270, ["chanda nagar"]),
+    ("Miyapur", 17.4968, 78.3614, []),
+    ("Bachupally", 17.5400, 78.3770, ["bachupalli"]),
+    ("Nizampet", 17.5150, 78.3860, []),
+    ("Pragathi Nagar", 17.5210, 78.3970, []),
+    ("Kukatpally", 17.4849, 78.4138, ["kukatpalli", "kphb", "kphb colony"]),
+    ("Moosapet", 17.4700, 78.4260, []),
+    ("Patancheru", 17.5300, 78.2650, []),
+    ("Shankarpally", 17.4560, 78.1310, ["shankarpalli"]),
+    ("Jubilee Hills", 17.4325, 78.4071, []),
+    ("Banjara Hills", 17.4156, 78.4347, []),
+    ("Tolichowki", 17.4000, 78.4130, ["toli chowki"]),
+    ("Mehdipatnam", 17.3950, 78.4400, []),
+    ("Attapur", 17.3700, 78.4300, []),
+    ("Rajendranagar", 17.3200, 78.4000, []),
+    ("Shamshabad", 17.2510, 78.4370, []),
+    ("Somajiguda", 17.4260, 78.4580, []),
+    ("Ameerpet", 17.4375, 78.4482, []),
+    ("Begumpet", 17.4440, 78.4630, []),
+    ("Himayatnagar", 17.4020, 78.4870, []),
+    ("Abids", 17.3920, 78.4760, []),
+    ("Secunderabad", 17.4399, 78.4983, ["secbad"]),
+    ("Bowenpally", 17.4700, 78.4800, ["bowenpalli"]),
+    ("Kompally", 17.5400, 78.4850, ["kompalli"]),
+    ("Medchal", 17.6300, 78.4800, []),
+    ("Alwal", 17.5030, 78.5130, []),
+    ("Sainikpuri", 17.4900, 78.5500, []),
+    ("Malkajgiri", 17.4530, 78.5270, []),
+    ("ECIL", 17.4700, 78.5700, ["ecil x roads", "a s rao nagar", "as rao nagar"]),
+    ("Habsiguda", 17.4040, 78.5400, []),
+    ("Uppal", 17.4010, 78.5590, []),
+    ("Nagole", 17.3700, 78.5650, []),
+    ("Dilsukhnagar", 17.3688, 78.5247, ["dilsukh nagar", "dsnr"]),
+    ("LB Nagar", 17.3457, 78.5522, ["l b nagar", "lal bahadur nagar"]),
+    ("Adibatla", 17.2300, 78.5700, []),
+    ("Amberpet", 17.3900, 78.5150, []),
+    ("Malakpet", 17.3730, 78.5000, []),
+    ("Kothapet", 17.3680, 78.5430, []),
+    ("Vanasthalipuram", 17.3300, 78.5600, []),
+    ("Balanagar", 17.4700, 78.4450, []),
+    ("Shaikpet", 17.4050, 78.3950, []),
+    ("Nallagandla", 17.4700, 78.3100, []),
+    ("Bandlaguda Jagir", 17.3550, 78.3800, ["bandlaguda"]),
+]
+
+CITY_SUFFIX_RE = re.compile(r"[,\s]+(?:hyderabad|hyd|secunderabad|telangana|india)$")
+FILLER_RE = re.compile(r"\b(?:near|opp|opposite|beside|behind|area|road|rd|colony|main|x roads|cross roads)\b")
+EARTH_RADIUS_KM = 6371.0
+# Fuzzy matches need this share of trigrams in common, and at most one edit per this many characters
+MIN_TRIGRAM_SIMILARITY = 0.4
+CHARS_PER_EDIT = 4
+# Property.locality, BuyerQuery.locality and Lead.locality are CharField(max_length=100)
+LOCALITY_KEY_MAX_LENGTH = 100
+
+
+def normalize_locality(text):
+    """'Gachibowli, Hyderabad' -> 'gachibowli'"""
+    cleaned = re.sub(r"[^a-z0-9, ]+", " ", str(text or "").strip().lower())
+    cleaned = re.sub(r"\s+", " ", cleaned).strip(" ,")
+    while True:
+        stripped = CITY_SUFFIX_RE.sub("", cleaned).strip(" ,")
+        if stripped == cleaned or not stripped:
+            return cleaned
+        cleaned = stripped
+
+
+def _compact(text):
+    """Spacing-insensitive form used for lookups: 'gachi bowli' -> 'gachibowli'."""
+    return text.replace(" ", "").replace(",", "")
+
+
+def _trigrams(compact):
+    padded = f"  {compact} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _edit_distance(a, b, limit):
+    """Levenshtein distance, giving up (returning limit + 1) once it exceeds `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        current = [i]
+        for j, cb in enumerate(b, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    dlat = math.radians(lat2 - lat1)
+    dlng = math.radians(lng2 - lng1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+class Gazetteer:
+    """
+    Locality lookup: exact alias map first, then a trigram index narrows
+    the fuzzy candidates that get an edit-distance check. Pairwise
+    distances are precomputed, so neighbour lookups are a list scan.
+    """
+
+    def __init__(self, localities):
+        self.localities = {}
+        self._aliases = {}  # compact alias -> key
+        self._trigram_index = {}  # trigram -> set of compact aliases
+        for name, lat, lng, aliases in localities:
+            key = normalize_locality(name)
+            self.localities[key] = Locality(key, name, lat, lng)
+            for alias in [name, *aliases]:
+                compact = _compact(normalize_locality(alias))
+                self._aliases[compact] = key
+                for gram in _trigrams(compact):
+                    self._trigram_index.setdefault(gram, set()).add(compact)
+
+        self._neighbours = {
+            key: sorted(
+                (haversine_km(loc.lat, loc.lng, other.lat, other.lng), other_key)
+                for other_key, other in self.localities.items() if other_key != key
+            )
+            for key, loc in self.localities.items()
+        }
+        self._lock = threading.Lock()
+        self._stats = Counter()
+
+    def _fuzzy(self, compact):
+        grams = _trigrams(compact)
+        shared = Counter()
+        for gram in grams:
+            for alias in self._trigram_index.get(gram, ()):
+                shared[alias] += 1
+
+        best = None
+        for alias, common in shared.most_common(5):
+            similarity = common / len(grams | _trigrams(alias))
+            if similarity < MIN_TRIGRAM_SIMILARITY:
+                continue
+            limit = max(1, len(alias) // CHARS_PER_EDIT)
+            distance = _edit_distance(compact, alias, limit)
+            if distance <= limit and (best is None or distance < best[0]):
+                best = (distance, alias)
+        return self._aliases[best[1]] if best else None
+
+    def _lookup(self, cleaned):
+        compact = _compact(cleaned)
+        key = self._aliases.get(compact)
+        if key:
+            return key, "exact"
+        key = self._fuzzy(compact) if len(compact) >= 4 else None
+        if key:
+            return key, "fuzzy"
+
+        # "flat near gachibowli flyover": try the longest word runs inside the answer
+        words = FILLER_RE.sub(" ", cleaned.replace(",", " ")).split()
+        for size in range(min(3, len(words)), 0, -1):
+            for start in range(len(words) - size + 1):
+                run = "".join(words[start:start + size])
+                if len(run) < 4:
+                    continue
+                key = self._aliases.get(run) or self._fuzzy(run)
+                if key:
+                    return key, "partial"
+        return None, "miss"
+
+    @lru_cache(maxsize=4096)
+    def _resolve_key(self, cleaned):
+        return self._lookup(cleaned)
+
+    def resolve(self, text):
+        """The Locality a free-text answer refers to, or None."""
+        cleaned = normalize_locality(text)
+        if not cleaned:
+            return None
+        key, how = self._resolve_key(cleaned)
+        with self._lock:
+            self._stats[how] += 1
+        return self.localities[key] if key else None
+
+    def neighbours(self, key, radius_km):
+        """[(key, km)] of other localities within `radius_km`, nearest first."""
+        result = []
+        for km, other in self._neighbours.get(key, ()):
+            if km > radius_km:
+                break
+            result.append((other, round(km, 1)))
+        return result
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+
+gazetteer = Gazetteer(LOCALITIES)
+
+
+def locality_key(text):
+    """
+    Canonical key for a location answer; unknown places fall back to the
+    normalized text, cut to fit the `locality` columns (LOCALITY_KEY_MAX_LENGTH).
+    """
+    found = gazetteer.resolve(text)
+    if found:
+        return found.key
+    return normalize_locality(text)[:LOCALITY_KEY_MAX_LENGTH].rstrip(" ,")
@@ -0,0 +1,185 @@
+"""
+Process-wide Google API clients for Drive and Sheets.
+
+The service-account key is read from disk once and its credentials are
+shared by every thread. Access tokens are refreshed by a background
+thread shortly before they expire, so requests never stop to mint one.
+Discovery documents are parsed once and kept in GOOGLE_DISCOVERY_CACHE_DIR,
+so a restart needs no network to build a client. googleapiclient services
+sit on httplib2, which is not thread-safe, so each thread builds its own
+service from the shared document and credentials.
+"""
+import json
+import os
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import google.auth.transport.requests
+import google_auth_httplib2
+import gspread
+import httplib2
+import requests
+from django.conf import settings
+from dotenv import load_dotenv
+from google.oauth2 import service_account
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import V1_DISCOVERY_URI, build_from_document
+
+# Load environment variables
+load_dotenv()
+
+# Path to google JSON - use environment variable or default
+GOOGLE_CREDENTIALS_FILE = os.getenv('GOOGLE_CREDENTIALS_FILE', 'google_credentials.json')
+GOOGLE_AUTH_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), GOOGLE_CREDENTIALS_FILE)
+
+DRIVE_SCOPES = ("https://www.googleapis.com/auth/drive",)
+SHEETS_SCOPES = ("https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive")
+HTTP_TIMEOUT_SECONDS = 30
+
+
+def _utcnow():
+    # google-auth keeps expiry as a naive UTC datetime
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class GoogleClients:
+    def __init__(self, auth_file=None, cache_dir=None):
+        self.auth_file = auth_file or GOOGLE_AUTH_FILE
+        self.cache_dir = Path(cache_dir or getattr(settings, "GOOGLE_DISCOVERY_CACHE_DIR", ".google_discovery"))
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._info = None
+        self._credentials = {}  # scopes -> Credentials
+        self._documents = {}  # (api, version) -> parsed discovery document
+        self._gspread = None
+        self._local = threading.local()
+        self._refresher = None
+        self._stop = threading.Event()
+        self._stats = Counter()
+
+    # ---- credentials ----
+    def _refresh_margin(self):
+        return timedelta(seconds=getattr(settings, "GOOGLE_TOKEN_REFRESH_MARGIN_SECONDS", 300))
+
+    def _due(self, creds):
+        return not creds.token or creds.expiry is None or creds.expiry - _utcnow() < self._refresh_margin()
+
+    def _refresh(self, creds):
+        with self._refresh_lock:
+            if self._due(creds):
+                creds.refresh(google.auth.transport.requests.Request())
+                self._stats["token_refreshes"] += 1
+
+    def credentials(self, scopes):
+        """Shared credentials for `scopes`, with a token that is good for at least the refresh margin."""
+        scopes = tuple(scopes)
+        with self._lock:
+            creds = self._credentials.get(scopes)
+            if creds is None:
+                if self._info is None:
+                    with open(self.auth_file) as f:
+                        self._info = json.load(f)
+                    self._stats["credential_loads"] += 1
+                creds = service_account.Credentials.from_service_account_info(self._info, scopes=list(scopes))
+                self._credentials[scopes] = creds
+            if self._refresher is None or not self._refresher.is_alive():
+                # Threads do not survive a fork, so this also restarts it in worker processes
+                self._refresher = threading.Thread(target=self._refresh_loop, name="google-token-refresher", daemon=True)
+                self._refresher.start()
+        if self._due(creds):
+            self._refresh(creds)
+        return creds
+
+    def _refresh_loop(self):
+        interval = max(30.0, self._refresh_margin().total_seconds() / 5)
+        while not self._stop.wait(interval):
+            with self._lock:
+                pending = [creds for creds in self._credentials.values() if self._due(creds)]
+            for creds in pending:
+                try:
+                    self._refresh(creds)
+                except Exception as e:
+                    # The next credentials() call retries in the request path
+                    print(f"⚠️ Google token refresh failed: {e}")
+
+    # ---- discovery documents ----
+    def discovery_document(self, api, version):
+        key = (api, version)
+        with self._lock:
+            document = self._documents.get(key)
+        if document is None:
+            document = self._load_document(api, version)
+            with self._lock:
+                document = self._documents.setdefault(key, document)
+        return document
+
+    def _load_document(self, api, version):
+        """Local cache first, then the copy bundled with googleapiclient, then the network."""
+        path = self.cache_dir / f"{api}.{version}.json"
+        if path.exists():
+            self._stats["discovery_from_cache"] += 1
+            return json.loads(path.read_text())
+
+        text = discovery_cache.get_static_doc(api, version)
+        if text is not None:
+            self._stats["discovery_from_bundle"] += 1
+        else:
+            response = requests.get(V1_DISCOVERY_URI.format(api=api, apiVersion=version), timeout=HTTP_TIMEOUT_SECONDS)
+            response.raise_for_status()
+            text = response.text
+            self._stats["discovery_from_network"] += 1
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(text)
+        except OSError as e:
+            print(f"⚠️ Could not cache {api} {version} discovery document: {e}")
+        return json.loads(text)
+
+    # ---- clients ----
+    def service(self, api, version, scopes):
+        """This thread's googleapiclient service for `api`."""
+        creds = self.credentials(scopes)
+        services = self._local.__dict__.setdefault("services", {})
+        key = (api, version, tuple(scopes))
+        service = services.get(key)
+        if service is None:
+            http = google_auth_httplib2.AuthorizedHttp(creds, http=httplib2.Http(timeout=HTTP_TIMEOUT_SECONDS))
+            service = build_from_document(self.discovery_document(api, version), http=http)
+            services[key] = service
+            self._stats["service_builds"] += 1
+        return service
+
+    def drive_service(self):
+        return self.service("drive", "v3", DRIVE_SCOPES)
+
+    def gspread_client(self):
+        """One gspread client per process; its session refreshes through the shared credentials."""
+        creds = self.credentials(SHEETS_SCOPES)
+        with self._lock:
+            if self._gspread is None:
+                self._gspread = gspread.authorize(creds)
+                self._stats["gspread_clients"] += 1
+            return self._gspread
+
+    def warm(self):
+        """Load credentials, mint tokens and parse discovery documents before the first request needs them."""
+        self.discovery_document("drive", "v3")
+        self.credentials(DRIVE_SCOPES)
+        self.credentials(SHEETS_SCOPES)
+
+    def stats(self):
+        with self._lock:
+            expiries = [c.expiry for c in self._credentials.values() if c.expiry]
+            return {
+                **self._stats,
+                "credentials": len(self._credentials),
+                "token_seconds_left": int((min(expiries) - _utcnow()).total_seconds()) if expiries else None,
+            }
+
+    def close(self):
+        self._stop.set()
+
+
+google_clients = GoogleClients()
@@ -0,0 +1,244 @@
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Count, Exists, OuterRef, Q
+from django.utils import timezone
+
+from .dedup import message_dedup
+from .google_clients import google_clients
+from .locks import ADVISORY_LOCK_CLASS_ID, conversation_locks
+from .match_index import property_index
+from .matching import match_backend
+from .models import InboundMessage
+from .state_cache import conversation_state_cache
+
+MAX_ATTEMPTS = 3
+RETRY_BASE_SECONDS = 2
+# A PROCESSING job whose heartbeat is this old belongs to a dead worker
+STALE_AFTER_SECONDS = 300
+HEARTBEAT_SECONDS = 30
+# Claims for one phone are serialized on Postgres under this advisory lock class
+CLAIM_LOCK_CLASS_ID = ADVISORY_LOCK_CLASS_ID + 1
+
+
+# ======== ENQUEUE ========
+def enqueue_message(phone, text):
+    """Persist an inbound message so the webhook can return immediately."""
+    return InboundMessage.objects.create(phone=phone, text=text)
+
+
+def enqueue_messages(items):
+    """Persist many (phone, text) pairs in one INSERT, preserving their order."""
+    return InboundMessage.objects.bulk_create(
+        [InboundMessage(phone=phone, text=text) for phone, text in items]
+    )
+
+
+# ======== CLAIM ========
+def _its_turn(jobs):
+    """PENDING jobs that are their phone's next message: nothing of the phone PROCESSING or older and PENDING."""
+    siblings = InboundMessage.objects.filter(phone=OuterRef("phone"))
+    return (
+        jobs.filter(status="PENDING")
+        .exclude(Exists(siblings.filter(status="PROCESSING")))
+        .exclude(Exists(siblings.filter(status="PENDING", id__lt=OuterRef("id"))))
+    )
+
+
+def _claim(job_id, phone, now):
+    """
+    Flip one job PENDING -> PROCESSING, only if it is its phone's turn.
+
+    The UPDATE itself checks that no job of the phone is PROCESSING and no
+    older one is still PENDING, so the check holds across worker processes.
+    On Postgres two workers could each miss the other's uncommitted claim,
+    so claims for the same phone take a transaction-level advisory lock;
+    SQLite runs one write at a time anyway.
+    """
+    claim = _its_turn(InboundMessage.objects.filter(id=job_id))
+    postgres = connection.vendor == "postgresql"
+    with transaction.atomic() if postgres else nullcontext():
+        if postgres:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_xact_lock(%s, hashtext(%s))", [CLAIM_LOCK_CLASS_ID, phone])
+        return claim.update(status="PROCESSING", started_at=now, heartbeat_at=now)
+
+
+def claim_jobs(limit):
+    """
+    Claim up to `limit` pending jobs, at most one per phone.
+
+    Only the oldest pending job of a phone is eligible, once its retry
+    backoff has passed, and only while no other job for that phone is
+    PROCESSING. The claim UPDATE enforces that (see _claim), which keeps
+    every conversation strictly ordered even when several worker processes
+    drain the same table. The candidates are filtered the same way in SQL,
+    so one phone with a long or backed-off queue can't crowd out the rest.
+    """
+    now = timezone.now()
+    candidates = (
+        _its_turn(InboundMessage.objects.filter(Q(available_at__isnull=True) | Q(available_at__lte=now)))
+        .order_by("id")
+        .values_list("id", "phone")[:limit]
+    )
+
+    claimed = []
+    for job_id, phone in candidates:
+        if _claim(job_id, phone, now):
+            claimed.append(job_id)
+
+    return list(InboundMessage.objects.filter(id__in=claimed).order_by("id"))
+
+
+def heartbeat(job_ids):
+    """Mark jobs this worker is still running as alive."""
+    if not job_ids:
+        return 0
+    return InboundMessage.objects.filter(id__in=job_ids, status="PROCESSING").update(heartbeat_at=timezone.now())
+
+
+def requeue_stale_jobs(stale_after=STALE_AFTER_SECONDS):
+    """Return jobs left PROCESSING by a crashed worker (no heartbeat for `stale_after` seconds) to the queue."""
+    cutoff = timezone.now() - timedelta(seconds=stale_after)
+    return (
+        InboundMessage.objects.filter(status="PROCESSING")
+        .filter(Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff))
+        .update(status="PENDING", started_at=None, heartbeat_at=None)
+    )
+
+
+# ======== PROCESS ========
+def process_job(job):
+    from .views import handle_message
+
+    try:
+        handle_message(job.phone, job.text)
+        job.status = "DONE"
+        job.error = None
+    except Exception as e:
+        job.attempts += 1
+        job.error = traceback.format_exc()
+        if job.attempts >= MAX_ATTEMPTS:
+            job.status = "FAILED"
+        else:
+            # Later messages of this phone wait behind it (see claim_jobs)
+            job.status = "PENDING"
+            job.available_at = timezone.now() + timedelta(seconds=RETRY_BASE_SECONDS * 2 ** job.attempts)
+        print(f"❌ Job {job.id} for {job.phone} failed (attempt {job.attempts}): {e}")
+    finally:
+        job.finished_at = timezone.now()
+        job.save(update_fields=["status", "attempts", "error", "available_at", "finished_at"])
+        close_old_connections()
+
+
+# ======== STATS ========
+def queue_stats(sample_size=500):
+    """Queue depth plus wait / end-to-end latency over the most recent finished jobs."""
+    now = timezone.now()
+    counts = {status: 0 for status, _ in InboundMessage.STATUS_CHOICES}
+    for row in InboundMessage.objects.values("status").annotate(n=Count("id")):
+        counts[row["status"]] = row["n"]
+
+    oldest = (
+        InboundMessage.objects.filter(status="PENDING")
+        .order_by("id")
+        .values_list("received_at", flat=True)
+        .first()
+    )
+
+    recent = list(
+        InboundMessage.objects.filter(status="DONE", started_at__isnull=False)
+        .order_by("-id")
+        .values_list("received_at", "started_at", "finished_at")[:sample_size]
+    )
+    waits = [(s - r).total_seconds() for r, s, f in recent]
+    totals = [(f - r).total_seconds() for r, s, f in recent if f]
+
+    return {
+        "pending": counts["PENDING"],
+        "processing": counts["PROCESSING"],
+        "done": counts["DONE"],
+        "failed": counts["FAILED"],
+        "oldest_pending_age_seconds": (now - oldest).total_seconds() if oldest else 0.0,
+        "avg_wait_seconds": sum(waits) / len(waits) if waits else 0.0,
+        "avg_latency_seconds": sum(totals) / len(totals) if totals else 0.0,
+        "max_latency_seconds": max(totals) if totals else 0.0,
+    }
+
+
+# ======== WORKER POOL ========
+def run_worker(concurrency=4, poll_interval=0.2, stats_interval=30, stop_event=None, warm_ai=False):
+    """
+    Drain the queue with a pool of threads until `stop_event` is set.
+
+    Claimed jobs are always for distinct phones, so threads never run two
+    messages of the same conversation at once. With `warm_ai`, every worker
+    thread builds its AI clients before taking its first job.
+    """
+    stop_event = stop_event or threading.Event()
+    in_flight = set()
+    lock = threading.Lock()
+    last_stats = last_heartbeat = time.monotonic()
+
+    requeue_stale_jobs()
+    if match_backend() == "index":
+        property_index.ensure_built()
+    try:
+        google_clients.warm()
+    except Exception as e:
+        print(f"⚠️ Google clients not warmed: {e}")
+    print(f"🚀 Webhook worker started (concurrency={concurrency})")
+
+    def _done(future, job_id):
+        with lock:
+            in_flight.discard(job_id)
+
+    initializer = None
+    if warm_ai:
+        from .ai.runtime import warm_up
+        initializer = warm_up
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="wa-worker", initializer=initializer) as pool:
+        while not stop_event.is_set():
+            with lock:
+                free = concurrency - len(in_flight)
+
+            jobs = claim_jobs(free) if free > 0 else []
+            for job in jobs:
+                with lock:
+                    in_flight.add(job.id)
+                future = pool.submit(process_job, job)
+                future.add_done_callback(lambda f, job_id=job.id: _done(f, job_id))
+
+            if time.monotonic() - last_heartbeat >= HEARTBEAT_SECONDS:
+                with lock:
+                    running = list(in_flight)
+                heartbeat(running)
+                last_heartbeat = time.monotonic()
+
+            if stats_interval and time.monotonic() - last_stats >= stats_interval:
+                print(f"📊 Queue stats: {queue_stats()} | locks {conversation_locks.stats()}")
+                if property_index.built:
+                    print(f"📊 Property index: {property_index.stats()}")
+                from .views import conversation_engine
+                print(f"📊 Conversation steps: {conversation_engine.stats()}")
+                if conversation_state_cache.enabled:
+                    print(f"📊 State cache: {conversation_state_cache.stats()}")
+                requeue_stale_jobs()
+                message_dedup.maybe_purge()
+                last_stats = time.monotonic()
+
+            if not jobs:
+                stop_event.wait(poll_interval)
+
+    print("🛑 Webhook worker stopped")
+
+
+def ingest_mode():
+    return getattr(settings, "WHATSAPP_INGEST_MODE", "inline")
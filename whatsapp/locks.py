@@ -0,0 +1,117 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+
+# Namespace for pg advisory locks so they cannot collide with other users of the DB
+ADVISORY_LOCK_CLASS_ID = 4242
+
+
+class KeyedLock:
+    """
+    One re-entrant lock per key, created on demand and dropped when unused.
+
+    Different keys never block each other; the same key is strictly serialized.
+    """
+
+    def __init__(self):
+        self._locks = {}  # key -> [RLock, users]
+        self._registry_lock = threading.Lock()
+        self.acquisitions = 0
+        self.contended = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def acquire(self, key):
+        with self._registry_lock:
+            entry = self._locks.setdefault(key, [threading.RLock(), 0])
+            entry[1] += 1
+        lock = entry[0]
+
+        if lock.acquire(blocking=False):
+            self._record(0.0, contended=False)
+            return
+
+        start = time.perf_counter()
+        lock.acquire()
+        self._record(time.perf_counter() - start, contended=True)
+
+    def release(self, key):
+        with self._registry_lock:
+            entry = self._locks[key]
+            entry[0].release()
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+    def _record(self, waited, contended):
+        with self._registry_lock:
+            self.acquisitions += 1
+            if contended:
+                self.contended += 1
+                self.total_wait_seconds += waited
+                self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+    def record_external_wait(self, waited):
+        """Count time spent waiting on a lock held by another process."""
+        with self._registry_lock:
+            self.contended += 1
+            self.total_wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+    def stats(self):
+        with self._registry_lock:
+            return {
+                "acquisitions": self.acquisitions,
+                "contended": self.contended,
+                "contention_ratio": self.contended / self.acquisitions if self.acquisitions else 0.0,
+                "avg_wait_seconds": self.total_wait_seconds / self.contended if self.contended else 0.0,
+                "max_wait_seconds": self.max_wait_seconds,
+                "active_keys": len(self._locks),
+            }
+
+
+conversation_locks = KeyedLock()
+
+
+def _advisory_lock(phone):
+    """Cross-process lock on Postgres; returns True if we had to wait for it."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s, hashtext(%s))", [ADVISORY_LOCK_CLASS_ID, phone])
+        if cursor.fetchone()[0]:
+            return False
+        cursor.execute("SELECT pg_advisory_lock(%s, hashtext(%s))", [ADVISORY_LOCK_CLASS_ID, phone])
+        return True
+
+
+def _advisory_unlock(phone):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_unlock(%s, hashtext(%s))", [ADVISORY_LOCK_CLASS_ID, phone])
+
+
+@contextmanager
+def conversation_lock(phone):
+    """
+    Serialize all processing for one phone number.
+
+    Threads in this process queue on an in-process keyed lock. On Postgres a
+    session-level advisory lock additionally serializes gunicorn workers and
+    queue workers across processes; SQLite deployments are single-node, where
+    the in-process lock is enough. Both locks are re-entrant, so nested
+    processing for the same phone cannot deadlock.
+    """
+    conversation_locks.acquire(phone)
+    use_advisory = connection.vendor == "postgresql"
+    try:
+        if use_advisory:
+            start = time.perf_counter()
+            if _advisory_lock(phone):
+                conversation_locks.record_external_wait(time.perf_counter() - start)
+        try:
+            yield
+        finally:
+            if use_advisory:
+                _advisory_unlock(phone)
+    finally:
+        conversation_locks.release(phone)
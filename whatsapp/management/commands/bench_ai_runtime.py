@@ -0,0 +1,53 @@
+import importlib
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from whatsapp.ai import runtime
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+class Command(BaseCommand):
+    help = "Measure AI module import time and cold vs warm runtime/LLM call latency."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--live", action="store_true", help="Also time real normalize calls (uses the OpenAI API)")
+        parser.add_argument("--calls", type=int, default=3, help="Warm calls to average with --live")
+
+    def handle(self, *args, **opts):
+        for module in ("whatsapp.ai.normalizer", "whatsapp.ai.scorer"):
+            sys.modules.pop(module, None)
+            elapsed, _ = _timed(lambda: importlib.import_module(module))
+            self.stdout.write(f"import {module:<24} {elapsed * 1000:8.2f} ms")
+
+        try:
+            cold, _ = _timed(runtime.get_openai_client)
+            warm, _ = _timed(runtime.get_openai_client)
+            self.stdout.write(f"openai client    cold {cold * 1000:8.2f} ms | warm {warm * 1000:8.4f} ms")
+
+            cold, _ = _timed(lambda: runtime.get_crew("normalize"))
+            warm, _ = _timed(lambda: runtime.get_crew("normalize"))
+            self.stdout.write(f"normalize crew   cold {cold * 1000:8.2f} ms | warm {warm * 1000:8.4f} ms")
+        except (ImportError, ValueError) as e:
+            self.stdout.write(f"runtime build skipped: {e}")
+            return
+
+        if not opts["live"]:
+            return
+
+        from whatsapp.ai.normalizer import _llm_normalize
+
+        # Bypass fast path and cache: this measures the agent call itself
+        runtime._thread_state.crews = {}
+        cold, _ = _timed(lambda: _llm_normalize("Location", "gachi bowli hyd"))
+        warm = [_timed(lambda: _llm_normalize("Location", "gachi bowli hyd"))[0] for _ in range(opts["calls"])]
+        self.stdout.write(
+            f"normalize call   cold {cold * 1000:8.0f} ms | warm avg {sum(warm) / len(warm) * 1000:8.0f} ms"
+        )
+        self.stdout.write(f"runtime stats: {runtime.runtime_stats()}")
@@ -0,0 +1,72 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from whatsapp.alerts import _accepts, _nearby_localities, match_new_listings
+from whatsapp.gazetteer import gazetteer
+from whatsapp.management.commands.bench_property_matching import synthetic_property
+from whatsapp.matching import BUDGET_STRETCH
+from whatsapp.models import BuyerQuery, Lead, Property
+
+BENCH_PREFIX = "bench-buyer-"
+
+
+class Command(BaseCommand):
+    help = "Time reverse matching of new listings against many open buyer searches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--buyers", type=int, default=20000, help="Open buyer searches to insert")
+        parser.add_argument("--listings", type=int, default=50, help="New listings matched in one batch")
+        parser.add_argument("--seed", type=int, default=11)
+
+    def handle(self, *args, **opts):
+        rng = random.Random(opts["seed"])
+        localities = list(gazetteer.localities)
+
+        start = time.perf_counter()
+        with transaction.atomic():
+            leads = Lead.objects.bulk_create(
+                [Lead(phone=f"{BENCH_PREFIX}{i}", lead_type="BUYER") for i in range(opts["buyers"])], batch_size=5000
+            )
+            if leads[0].pk is None:
+                leads = list(Lead.objects.filter(phone__startswith=BENCH_PREFIX))
+            BuyerQuery.objects.bulk_create([
+                BuyerQuery(
+                    lead=lead,
+                    property_kind=rng.choice(["APARTMENT", "HOUSE", "PLOT", ""]),
+                    locality=rng.choice(localities),
+                    bhk_count=rng.choice([None, 1, 2, 3, 4]),
+                    price_cap=int(rng.randrange(30, 400, 10) * 100000 * BUDGET_STRETCH),
+                ) for lead in leads
+            ], batch_size=5000)
+            seller = Lead.objects.create(phone=f"{BENCH_PREFIX}seller", lead_type="SELLER")
+            listings = [synthetic_property(rng, seller) for _ in range(opts["listings"])]
+            Property.objects.bulk_create(listings)
+            listings = list(Property.objects.filter(SELLER=seller))
+        self.stdout.write(f"inserted {opts['buyers']} buyer searches in {time.perf_counter() - start:.1f}s")
+
+        try:
+            start = time.perf_counter()
+            with CaptureQueriesContext(connection) as queries:
+                pairs = match_new_listings(listings)
+            batched = time.perf_counter() - start
+            self.stdout.write(
+                f"batched match: {len(listings)} listings -> {len(pairs)} alerts in {batched * 1000:.1f} ms "
+                f"({len(queries)} queries)"
+            )
+
+            # Baseline: read every open search once per listing and test it in Python
+            start = time.perf_counter()
+            naive = 0
+            for prop in listings:
+                nearby = _nearby_localities(prop.locality)
+                naive += sum(1 for q in BuyerQuery.objects.filter(is_open=True) if _accepts(q, prop, nearby))
+            scan = time.perf_counter() - start
+            self.stdout.write(f"full scan per listing: {naive} alerts in {scan * 1000:.1f} ms")
+        finally:
+            BuyerQuery.objects.filter(lead__phone__startswith=BENCH_PREFIX).delete()
+            Property.objects.filter(SELLER__phone__startswith=BENCH_PREFIX).delete()
+            Lead.objects.filter(phone__startswith=BENCH_PREFIX).delete()
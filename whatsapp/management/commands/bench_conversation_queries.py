@@ -0,0 +1,83 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from whatsapp.models import DriveFolder, Lead, OutboundMessage
+from whatsapp.state_cache import conversation_state_cache
+from whatsapp.views import handle_message
+
+# Answers the fast-path normalizer resolves, so no LLM call is made
+SELLER_SCRIPT = ["hi", "sell", "Apartment", "1200", "2BHK", "Ravi", "Kondapur", "80L", "Other", "Lift, Garden", "thanks"]
+BUYER_SCRIPT = ["hello", "buy", "Apartment", "1000-1500", "2BHK", "Sita", "Kondapur", "70-90 lakhs", "Gym", "abc", "1", "thanks"]
+CONVERSATION_TABLES = ("whatsapp_lead",)
+BENCH_FOLDER_ID = "bench-conversation-folder"
+
+
+def classify(sql):
+    verb = sql.lstrip().split(None, 1)[0].upper()
+    if verb in ("BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE"):
+        return "txn"
+    return "read" if verb == "SELECT" else "write"
+
+
+class Command(BaseCommand):
+    help = (
+        "Count DB statements per inbound message for a scripted seller and buyer conversation. "
+        "Runs offline (outbox sends, deferred scoring and Sheets, pooled Drive folder) and deletes its rows afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--phone-prefix", default="bench-conv-")
+        parser.add_argument("--state-cache", action="store_true", help="Serve leads from the conversation state cache")
+
+    def handle(self, *args, **opts):
+        seller_phone, buyer_phone = f"{opts['phone_prefix']}seller", f"{opts['phone_prefix']}buyer"
+        phones = [seller_phone, buyer_phone]
+        overrides = dict(
+            WHATSAPP_OUTBOUND_MODE="outbox",
+            LEAD_SCORING_MODE="deferred",
+            SHEETS_SYNC_MODE="deferred",
+            PIPELINE_WORKERS=0,
+            DRIVE_FOLDER_POOL_SIZE=1,
+            BUYER_ALERTS_ENABLED=False,
+            CONVERSATION_STATE_CACHE_ENABLED=opts["state_cache"],
+        )
+        totals = Counter()
+        messages = 0
+        try:
+            DriveFolder.objects.create(folder_id=BENCH_FOLDER_ID, link="https://drive.google.com/drive/folders/bench")
+            with override_settings(**overrides):
+                self.stdout.write(f"{'phone':<8} {'message':<14} {'step after':<24} reads writes txn |       lead | other tables")
+                for phone, script in ((seller_phone, SELLER_SCRIPT), (buyer_phone, BUYER_SCRIPT)):
+                    for text in script:
+                        with CaptureQueriesContext(connection) as captured:
+                            handle_message(phone, text)
+                        kinds = Counter(classify(q["sql"]) for q in captured.captured_queries)
+                        conversation = sum(
+                            1 for q in captured.captured_queries
+                            if classify(q["sql"]) != "txn" and any(t in q["sql"] for t in CONVERSATION_TABLES)
+                        )
+                        other = sum(kinds[k] for k in ("read", "write")) - conversation
+                        step = Lead.objects.values_list("current_step", flat=True).get(phone=phone)
+                        self.stdout.write(
+                            f"{phone.rsplit('-', 1)[-1]:<8} {text[:14]:<14} {step:<24} "
+                            f"{kinds['read']:>5} {kinds['write']:>6} {kinds['txn']:>3} | {conversation:>10} | {other:>12}"
+                        )
+                        totals.update(kinds)
+                        totals["conversation"] += conversation
+                        messages += 1
+            self.stdout.write(
+                f"\n{messages} messages: {totals['conversation'] / messages:.2f} lead statements per message, "
+                f"{(totals['read'] + totals['write']) / messages:.2f} statements overall "
+                f"(+{totals['txn'] / messages:.2f} transaction control)"
+            )
+            if opts["state_cache"]:
+                self.stdout.write(f"State cache: {conversation_state_cache.stats()}")
+        finally:
+            DriveFolder.objects.filter(folder_id=BENCH_FOLDER_ID).delete()
+            OutboundMessage.objects.filter(phone__in=phones).delete()
+            Lead.objects.filter(phone__in=phones).delete()
+            for phone in phones:
+                conversation_state_cache.invalidate(phone)
@@ -0,0 +1,133 @@
+import json
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import google.auth.transport.requests
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from django.core.management.base import BaseCommand
+from google.oauth2 import service_account
+from googleapiclient.discovery import build
+
+from whatsapp.google_clients import DRIVE_SCOPES, GoogleClients
+
+
+class FakeTokenHandler(BaseHTTPRequestHandler):
+    """OAuth token endpoint that grants an hour-long token after a simulated round trip."""
+
+    protocol_version = "HTTP/1.1"
+    latency = 0.0
+    minted = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with self.lock:
+            FakeTokenHandler.minted += 1
+        time.sleep(self.latency)
+        body = json.dumps({"access_token": "bench-token", "expires_in": 3600, "token_type": "Bearer"}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def write_service_account(path, token_uri):
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+    path.write_text(json.dumps({
+        "type": "service_account",
+        "project_id": "bench",
+        "private_key_id": "bench",
+        "private_key": pem.decode(),
+        "client_email": "bench@bench.iam.gserviceaccount.com",
+        "client_id": "1",
+        "token_uri": token_uri,
+    }))
+
+
+def legacy_drive_service(auth_file):
+    """What create_drive_folder used to do per seller, plus the token mint its first request triggered."""
+    creds = service_account.Credentials.from_service_account_file(auth_file, scopes=list(DRIVE_SCOPES))
+    service = build("drive", "v3", credentials=creds, cache_discovery=False)
+    creds.refresh(google.auth.transport.requests.Request())
+    return service
+
+
+class Command(BaseCommand):
+    help = "Measure Drive client setup per call with and without the shared Google client registry (offline, fake token server)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ops", type=int, default=20, help="Client setups timed per scenario")
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--token-latency-ms", type=float, default=150.0, help="Simulated token endpoint round trip")
+
+    def _time(self, fn, ops):
+        timings = []
+        for _ in range(ops):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        return timings[len(timings) // 2] * 1000
+
+    def _report(self, label, ms, minted):
+        self.stdout.write(f"{label:<34} {ms:8.2f} ms | {minted} token mint(s)")
+
+    def handle(self, *args, **opts):
+        FakeTokenHandler.latency = opts["token_latency_ms"] / 1000
+        server = ThreadingHTTPServer(("127.0.0.1", 0), FakeTokenHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            auth_file = Path(tmp) / "service_account.json"
+            cache_dir = Path(tmp) / "discovery"
+            write_service_account(auth_file, f"http://127.0.0.1:{server.server_address[1]}/token")
+            self.stdout.write(f"token endpoint RTT {opts['token_latency_ms']:.0f} ms, {opts['ops']} ops per scenario")
+
+            FakeTokenHandler.minted = 0
+            ms = self._time(lambda: legacy_drive_service(auth_file), opts["ops"])
+            self._report("before: load + build + mint", ms, FakeTokenHandler.minted)
+
+            FakeTokenHandler.minted = 0
+            clients = GoogleClients(auth_file=auth_file, cache_dir=cache_dir)
+            ms = self._time(clients.drive_service, 1)
+            self._report("after: first call (bundled doc)", ms, FakeTokenHandler.minted)
+
+            FakeTokenHandler.minted = 0
+            ms = self._time(clients.drive_service, opts["ops"])
+            self._report("after: later calls, same thread", ms, FakeTokenHandler.minted)
+            clients.close()
+
+            FakeTokenHandler.minted = 0
+            restarted = GoogleClients(auth_file=auth_file, cache_dir=cache_dir)
+            ms = self._time(lambda: restarted.discovery_document("drive", "v3"), 1)
+            self._report("after restart: doc from local cache", ms, FakeTokenHandler.minted)
+
+            FakeTokenHandler.minted = 0
+            per_thread = []
+
+            def worker():
+                per_thread.append(self._time(restarted.drive_service, opts["ops"]))
+
+            threads = [threading.Thread(target=worker) for _ in range(opts["threads"])]
+            start = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            self._report(
+                f"after: {opts['threads']} threads x {opts['ops']} calls (total)",
+                (time.perf_counter() - start) * 1000,
+                FakeTokenHandler.minted,
+            )
+            self.stdout.write(f"registry stats: {restarted.stats()}")
+            restarted.close()
+        server.shutdown()
@@ -0,0 +1,143 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from whatsapp.gazetteer import gazetteer
+from whatsapp.match_index import PropertyMatchIndex
+from whatsapp.matching import buyer_preferences, find_matching_properties_sql
+from whatsapp.models import Lead, Property
+from whatsapp.parsing import AMENITY_BITS
+
+BENCH_SELLER_PHONE = "bench-seller"
+LOCALITIES = [
+    "Gachibowli", "Madhapur", "Kondapur", "Hitech City", "Kukatpally", "Miyapur", "Manikonda",
+    "Banjara Hills", "Jubilee Hills", "Begumpet", "Ameerpet", "Kokapet", "Narsingi", "Tellapur",
+    "Uppal", "LB Nagar", "Shamshabad", "Nanakramguda", "Financial District", "Bachupally",
+]
+TYPES = ["Apartment", "House", "Plot"]
+AMENITY_NAMES = list(AMENITY_BITS)
+# Share of listings given an answer the parsers can't read, per column
+UNPARSED_SHARE = 0.05
+
+
+def synthetic_property(rng, seller):
+    bhk = rng.randint(1, 4)
+    sqft = rng.randrange(500, 3000, 50)
+    price_l = rng.randrange(30, 400, 5)
+    prop = Property(
+        SELLER=seller,
+        property_type=rng.choice(TYPES),
+        area_sqft=str(sqft),
+        bhk=f"{bhk} BHK",
+        location=f"{rng.choice(LOCALITIES)}, Hyderabad",
+        price_range=f"{price_l}L",
+        amenities=", ".join(rng.sample(AMENITY_NAMES, rng.randint(0, 3))),
+    )
+    if rng.random() < UNPARSED_SHARE:
+        prop.bhk = f"{bhk}.5 BHK"
+    if rng.random() < UNPARSED_SHARE:
+        prop.price_range = f"{price_l} lakhs negotiable"
+    if rng.random() < UNPARSED_SHARE:
+        prop.location = "Hyderabad"
+    if rng.random() < UNPARSED_SHARE:
+        prop.property_type = "Farm land"
+    prop.refresh_search_fields()
+    return prop
+
+
+def synthetic_buyer(rng):
+    low = rng.randrange(30, 300, 10)
+    return {
+        "property_type_preference": rng.choice(TYPES),
+        "location_preference": rng.choice(LOCALITIES),
+        "bhk": f"{rng.randint(1, 4)} BHK",
+        "area_preference": "1000-1800",
+        "budget": f"{low}-{low + 40} lakhs",
+        "amenities": rng.choice(AMENITY_NAMES),
+    }
+
+
+def legacy_match(data):
+    """The original icontains scan from send_matching_properties_to_buyer."""
+    qs = Property.objects.all()
+    b_type = (data.get("property_type_preference") or "").lower()
+    b_loc = (data.get("location_preference") or "").lower()
+    if b_type:
+        qs = qs.filter(property_type__icontains=b_type)
+    if b_loc:
+        qs = qs.filter(location__icontains=b_loc)
+    return list(qs[:5])
+
+
+class Command(BaseCommand):
+    help = "Benchmark SQL and in-memory ranked matching against the legacy icontains scan on a synthetic inventory."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=200000, help="Synthetic listings to insert")
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--seed", type=int, default=7)
+        parser.add_argument("--keep", action="store_true", help="Leave the synthetic listings in the database")
+
+    def handle(self, *args, **opts):
+        rng = random.Random(opts["seed"])
+        seller, _ = Lead.objects.get_or_create(phone=BENCH_SELLER_PHONE, defaults={"lead_type": "SELLER"})
+
+        start = time.perf_counter()
+        with transaction.atomic():
+            batch = []
+            for _ in range(opts["count"]):
+                batch.append(synthetic_property(rng, seller))
+                if len(batch) == 5000:
+                    Property.objects.bulk_create(batch)
+                    batch = []
+            Property.objects.bulk_create(batch)
+        self.stdout.write(f"inserted {opts['count']} listings in {time.perf_counter() - start:.1f}s")
+
+        try:
+            index = PropertyMatchIndex()
+            index.build()
+            index_stats = index.stats()
+            self.stdout.write(
+                f"in-memory index: {index_stats['listings']} listings, built in {index_stats['build_ms']} ms, "
+                f"~{index_stats['memory_kb'] / 1024:.1f} MB"
+            )
+
+            buyers = [synthetic_buyer(rng) for _ in range(opts["queries"])]
+            # Buyers naming a place the gazetteer doesn't know: no locality filter, the legacy scan reads every row
+            misses = [dict(b, location_preference="Nowhere Nagar") for b in buyers[: max(1, len(buyers) // 4)]]
+            for workload, queries in (("typical", buyers), ("unknown place", misses)):
+                for label, run in (
+                    ("legacy icontains", legacy_match),
+                    ("sql ranked", lambda data: find_matching_properties_sql(buyer_preferences(Lead(data=data)))),
+                    ("in-memory ranked", lambda data: index.query(buyer_preferences(Lead(data=data)))),
+                ):
+                    timings = []
+                    for data in queries:
+                        t = time.perf_counter()
+                        run(data)
+                        timings.append(time.perf_counter() - t)
+                    timings.sort()
+                    self.stdout.write(
+                        f"{workload:<13} {label:<18} median {timings[len(timings) // 2] * 1000:7.2f} ms | "
+                        f"p95 {timings[int(len(timings) * 0.95)] * 1000:7.2f} ms | max {timings[-1] * 1000:7.2f} ms"
+                    )
+            # Both ranked backends must return the same listings
+            mismatches = sum(
+                1 for data in buyers
+                if {p.id for p in find_matching_properties_sql(buyer_preferences(Lead(data=data)))}
+                != {p.id for p in index.query(buyer_preferences(Lead(data=data)))}
+            )
+            self.stdout.write(f"sql/in-memory result mismatches: {mismatches}/{len(buyers)} (ties may order differently)")
+            unparsed = sum(
+                1 for data in buyers for p in index.query(buyer_preferences(Lead(data=data)))
+                if p.min_price is None or p.bhk_count is None or p.property_kind is None or p.locality not in gazetteer.localities
+            )
+            self.stdout.write(f"unparsed listings offered (only after parsed ones): {unparsed}/{len(buyers) * 5}")
+            self.stdout.write("note: legacy returns the first 5 rows it finds, unranked and ignoring BHK/budget/area/amenities")
+        finally:
+            if not opts["keep"]:
+                Property.objects.filter(SELLER=seller).delete()
+                seller.delete()
+
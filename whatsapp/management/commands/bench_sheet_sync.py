@@ -0,0 +1,287 @@
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import gspread
+import requests
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from whatsapp import sheets
+from whatsapp.models import Lead
+
+SHEETS_API = "https://sheets.googleapis.com"
+CELL_RE = re.compile(r"^([A-Z]*)(\d*)$")
+
+
+def _col_index(letters):
+    n = 0
+    for ch in letters:
+        n = n * 26 + ord(ch) - 64
+    return n
+
+
+def _parse_range(a1, grid):
+    """'Sheet1!N5:R5' -> (row0, col0, row1, col1), 1-based inclusive; open ends cover the data."""
+    a1 = a1.split("!")[-1] if "!" in a1 else ""
+    if not a1:
+        return 1, 1, max(len(grid), 1), 26
+    first, _, last = a1.partition(":")
+    last = last or first
+    c0, r0 = CELL_RE.match(first).groups()
+    c1, r1 = CELL_RE.match(last).groups()
+    return (
+        int(r0) if r0 else 1,
+        _col_index(c0) if c0 else 1,
+        int(r1) if r1 else max(len(grid), 1),
+        _col_index(c1) if c1 else 26,
+    )
+
+
+class FakeSheetsHandler(BaseHTTPRequestHandler):
+    """
+    Just enough of the Sheets v4 API for gspread's calls in whatsapp.sheets:
+    spreadsheet metadata, values get/batchGet/update/append/batchUpdate and
+    delete/insert row requests. Every request is counted by kind.
+    """
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    latency = 0.0
+    grid = []
+    calls = Counter()
+    lock = threading.Lock()
+
+    # ---- helpers ----
+    def _reply(self, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}") if length else {}
+
+    def _route(self):
+        """'' (metadata), ':batchUpdate', 'values:batchGet', 'values:batchUpdate', 'values/<range>' or 'values/<range>:append'."""
+        parts = urlsplit(self.path)
+        path = unquote(parts.path).split("/v4/spreadsheets/", 1)[1]
+        spreadsheet_id, _, rest = path.partition("/")
+        if not rest:
+            rest = ":batchUpdate" if spreadsheet_id.endswith(":batchUpdate") else ""
+        return rest, parse_qs(parts.query)
+
+    def _write(self, row, col, values):
+        for r, row_values in enumerate(values):
+            target = row + r
+            while len(self.grid) < target:
+                self.grid.append([])
+            cells = self.grid[target - 1]
+            while len(cells) < col - 1 + len(row_values):
+                cells.append("")
+            for c, value in enumerate(row_values):
+                cells[col - 1 + c] = value
+
+    def _read(self, a1):
+        r0, c0, r1, c1 = _parse_range(a1, self.grid)
+        return [row[c0 - 1:c1] for row in self.grid[r0 - 1:r1]]
+
+    def _count(self, kind):
+        with self.lock:
+            self.calls[kind] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    # ---- verbs ----
+    def do_GET(self):
+        route, query = self._route()
+        if not route:
+            self._count("metadata")
+            return self._reply({
+                "spreadsheetId": "bench",
+                "properties": {"title": "Bench Leads"},
+                "sheets": [{"properties": {"sheetId": 0, "title": "Sheet1", "index": 0,
+                                           "gridProperties": {"rowCount": 100000, "columnCount": 26}}}],
+            })
+        if route == "values:batchGet":
+            self._count("values.batchGet")
+            with self.lock:
+                ranges = [{"range": a1, "majorDimension": "ROWS", "values": self._read(a1)} for a1 in query.get("ranges", [])]
+            return self._reply({"spreadsheetId": "bench", "valueRanges": ranges})
+        a1 = route[len("values/"):]
+        self._count("values.get")
+        with self.lock:
+            rows = self._read(a1)
+        if query.get("majorDimension") == ["COLUMNS"]:
+            width = max((len(row) for row in rows), default=0)
+            rows = [[row[i] if i < len(row) else "" for row in rows] for i in range(width)]
+        self._reply({"range": a1, "majorDimension": query.get("majorDimension", ["ROWS"])[0], "values": rows})
+
+    def do_PUT(self):
+        route, _ = self._route()
+        a1 = route[len("values/"):]
+        body = self._body()
+        self._count("values.update")
+        with self.lock:
+            r0, c0, _, _ = _parse_range(a1, self.grid)
+            self._write(r0, c0, body.get("values", []))
+        self._reply({"updatedRange": a1})
+
+    def do_POST(self):
+        route, query = self._route()
+        body = self._body()
+        if route == ":batchUpdate":
+            self._count("structure.batchUpdate")
+            with self.lock:
+                for request in body.get("requests", []):
+                    if "deleteDimension" in request:
+                        rng = request["deleteDimension"]["range"]
+                        del self.grid[rng["startIndex"]:rng["endIndex"]]
+                    elif "insertDimension" in request:
+                        rng = request["insertDimension"]["range"]
+                        self.grid[rng["startIndex"]:rng["startIndex"]] = [[] for _ in range(rng["endIndex"] - rng["startIndex"])]
+            return self._reply({"replies": []})
+        if route.endswith(":append"):
+            a1 = route[len("values/"):-len(":append")]
+            self._count("values.append")
+            with self.lock:
+                values = body.get("values", [])
+                r0, _, _, _ = _parse_range(a1, self.grid)
+                if query.get("insertDataOption") == ["INSERT_ROWS"] and "!" in a1 and CELL_RE.match(a1.split("!")[-1]).group(2):
+                    first = r0
+                    self.grid[first - 1:first - 1] = [[] for _ in values]
+                else:
+                    first = len(self.grid) + 1
+                self._write(first, 1, values)
+                last = first + len(values) - 1
+            return self._reply({"updates": {"updatedRange": f"Sheet1!A{first}:R{last}", "updatedRows": len(values)}})
+        self._count("values.batchUpdate")
+        with self.lock:
+            for item in body.get("data", []):
+                r0, c0, _, _ = _parse_range(item["range"], self.grid)
+                self._write(r0, c0, item.get("values", []))
+        self._reply({"totalUpdatedRows": len(body.get("data", []))})
+
+    def log_message(self, *args):
+        pass
+
+
+class LocalSheetsSession(requests.Session):
+    """Sends gspread's Sheets API calls to the fake server instead of Google."""
+
+    def __init__(self, base):
+        super().__init__()
+        self.base = base
+
+    def request(self, method, url, *args, **kwargs):
+        return super().request(method, url.replace(SHEETS_API, self.base), *args, **kwargs)
+
+
+# ======== BEFORE ========
+def legacy_selection_update(sheet, phone, values):
+    """What update_buyer_property_selection used to do: full download, then one update_cell per column."""
+    row_index = None
+    for idx, row in enumerate(sheet.get_all_values(), start=1):
+        if idx > 1 and len(row) > 2 and row[2] == phone:
+            row_index = idx
+            break
+    for offset, value in enumerate(values):
+        sheet.update_cell(row_index, 14 + offset, value)
+
+
+def legacy_upsert(sheet, lead):
+    """What add_lead_to_sheet(update_existing=True) used to do (minus re-authorizing)."""
+    sheets.setup_headers(sheet)
+    row = sheets.lead_to_row(lead)
+    for idx, existing_row in enumerate(sheet.get_all_values(), start=1):
+        if idx > 1 and len(existing_row) > 2 and existing_row[2] == lead.phone:
+            sheet.delete_rows(idx)
+            sheet.insert_row(row, idx)
+            return
+    sheet.append_row(row)
+
+
+class Command(BaseCommand):
+    help = "Measure Sheets API calls and latency of the old and new sync paths against a local fake Sheets server."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=2000, help="Leads already in the sheet")
+        parser.add_argument("--ops", type=int, default=20, help="Operations timed per scenario")
+        parser.add_argument("--latency-ms", type=float, default=30.0, help="Simulated round-trip time per API call")
+        parser.add_argument("--seed", type=int, default=3)
+
+    def _run(self, label, fn, ops):
+        FakeSheetsHandler.calls.clear()
+        timings = []
+        for i in range(ops):
+            start = time.perf_counter()
+            fn(i)
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        calls = sum(FakeSheetsHandler.calls.values())
+        self.stdout.write(
+            f"{label:<28} median {timings[len(timings) // 2] * 1000:7.1f} ms | "
+            f"{calls / ops:5.1f} API calls/op | {dict(FakeSheetsHandler.calls)}"
+        )
+
+    def _check_rows_moved_by_hand(self, worksheet, picks):
+        """Reverse the data rows behind the index's back; the next sync must still write each lead's own row."""
+        with FakeSheetsHandler.lock:
+            FakeSheetsHandler.grid[1:] = FakeSheetsHandler.grid[:0:-1]
+        self._run("upsert after manual sort", lambda i: sheets.sync_leads_to_sheet([picks[i]]), 1)
+        phones = [row[2] for row in FakeSheetsHandler.grid[1:] if len(row) > 2 and row[2]]
+        duplicates = len(phones) - len(set(phones))
+        self.stdout.write(f"rows holding a duplicated phone after the sort: {duplicates}")
+
+    def handle(self, *args, **opts):
+        rng = random.Random(opts["seed"])
+        FakeSheetsHandler.latency = opts["latency_ms"] / 1000
+        FakeSheetsHandler.grid = [["Lead Type", "Name", "Phone"] + [""] * 15]
+        leads = []
+        for i in range(opts["rows"]):
+            lead = Lead(phone=f"9190000{i:05d}", lead_type="BUYER", status="NEW", data={"name": f"Buyer {i}"})
+            leads.append(lead)
+            FakeSheetsHandler.grid.append(sheets.lead_to_row(lead))
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), FakeSheetsHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        session = LocalSheetsSession(f"http://127.0.0.1:{server.server_address[1]}")
+        spreadsheet = gspread.Client(auth=None, session=session).open_by_key("bench")
+        worksheet = spreadsheet.sheet1
+
+        original_connect = sheets.connect_sheet
+        sheets.connect_sheet = lambda sheet_name=None: spreadsheet
+        sheets.reset_worksheet()
+        sheets._last_reconcile = None
+        selection = SimpleNamespace(property_type="Apartment", location="Kondapur", price_range="85L")
+        try:
+            # Index writes are rolled back so the real SheetRow table is untouched
+            with transaction.atomic():
+                sheets.reconcile_row_index(worksheet)
+                picks = [rng.choice(leads) for _ in range(opts["ops"])]
+                values = ["Apartment", "Kondapur", "85L", "", datetime.now().strftime("%Y-%m-%d %H:%M:%S")]
+
+                self.stdout.write(f"sheet rows: {opts['rows']}, simulated RTT {opts['latency_ms']:.0f} ms")
+                self._run("selection: before", lambda i: legacy_selection_update(worksheet, picks[i].phone, values), opts["ops"])
+                self._run("selection: after", lambda i: sheets.update_buyer_property_selection(picks[i], selection), opts["ops"])
+                self._run("lead upsert: before", lambda i: legacy_upsert(worksheet, picks[i]), opts["ops"])
+                sheets.reconcile_row_index(worksheet)  # the legacy upsert moved rows
+                self._run("lead upsert: after", lambda i: sheets.sync_leads_to_sheet([picks[i]]), opts["ops"])
+                self._run(f"{opts['ops']} upserts, one flush", lambda i: sheets.sync_leads_to_sheet(picks), 1)
+                self._check_rows_moved_by_hand(worksheet, picks)
+                transaction.set_rollback(True)
+        finally:
+            sheets.connect_sheet = original_connect
+            sheets.reset_worksheet()
+            sheets._last_reconcile = None
+            server.shutdown()
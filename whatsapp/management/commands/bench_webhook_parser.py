@@ -0,0 +1,73 @@
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from whatsapp.webhook import group_by_phone, parse_webhook_payload
+
+
+def build_payload(entries, changes, messages, statuses, phones, seed=0):
+    """Synthetic multi-entry webhook body shaped like Meta's batched deliveries."""
+    rng = random.Random(seed)
+    base_ts = 1_700_000_000
+    counter = 0
+    payload = {"object": "whatsapp_business_account", "entry": []}
+
+    for e in range(entries):
+        entry = {"id": f"WABA_{e}", "changes": []}
+        for c in range(changes):
+            value = {"messaging_product": "whatsapp", "metadata": {"phone_number_id": "123"}, "messages": [], "statuses": []}
+            for _ in range(messages):
+                counter += 1
+                phone = f"91900000{rng.randrange(phones):04d}"
+                if rng.random() < 0.5:
+                    msg = {"type": "text", "text": {"body": rng.choice(["hi", "buy", "2bhk", "50 lakhs", "Gachibowli"])}}
+                else:
+                    label = rng.choice(["BUY", "SELL", "Apartment", "2BHK", "Pool"])
+                    msg = {"type": "interactive", "interactive": {"type": "button_reply", "button_reply": {"id": label, "title": label}}}
+                msg.update({"from": phone, "id": f"wamid.{counter}", "timestamp": str(base_ts + counter)})
+                value["messages"].append(msg)
+            for _ in range(statuses):
+                counter += 1
+                value["statuses"].append({"id": f"wamid.out.{counter}", "status": "delivered", "timestamp": str(base_ts + counter)})
+            entry["changes"].append({"field": "messages", "value": value})
+        payload["entry"].append(entry)
+
+    return payload
+
+
+class Command(BaseCommand):
+    help = "Benchmark the batch webhook parser on large synthetic multi-entry payloads."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--entries", type=int, default=20)
+        parser.add_argument("--changes", type=int, default=5)
+        parser.add_argument("--messages", type=int, default=50, help="Messages per change")
+        parser.add_argument("--statuses", type=int, default=20, help="Statuses per change")
+        parser.add_argument("--phones", type=int, default=500, help="Distinct senders")
+        parser.add_argument("--iterations", type=int, default=20)
+
+    def handle(self, *args, **opts):
+        payload = build_payload(opts["entries"], opts["changes"], opts["messages"], opts["statuses"], opts["phones"])
+        body = json.dumps(payload).encode("utf-8")
+        expected = opts["entries"] * opts["changes"] * opts["messages"]
+
+        timings = []
+        for _ in range(opts["iterations"]):
+            start = time.perf_counter()
+            messages, statuses = parse_webhook_payload(json.loads(body))
+            groups = group_by_phone(messages)
+            timings.append(time.perf_counter() - start)
+
+        assert len(messages) == expected, f"parsed {len(messages)} of {expected} messages"
+
+        timings.sort()
+        median = timings[len(timings) // 2]
+        self.stdout.write(
+            f"payload: {len(body) / 1024:.1f} KiB, {len(messages)} messages, "
+            f"{len(statuses)} statuses, {len(groups)} phones\n"
+            f"decode+parse+group: median {median * 1000:.2f} ms, "
+            f"min {timings[0] * 1000:.2f} ms, max {timings[-1] * 1000:.2f} ms "
+            f"({len(messages) / median:,.0f} messages/s)"
+        )
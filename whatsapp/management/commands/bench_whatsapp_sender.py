@@ -0,0 +1,95 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from django.core.management.base import BaseCommand
+
+from whatsapp import utils
+
+
+class StubGraphHandler(BaseHTTPRequestHandler):
+    """Minimal stand-in for the Graph API /messages endpoint, with keep-alive."""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    latency = 0.0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.latency:
+            time.sleep(self.latency)
+        body = json.dumps({"messaging_product": "whatsapp", "messages": [{"id": "wamid.stub"}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _summary(label, timings):
+    timings = sorted(timings)
+    total = sum(timings)
+    return (
+        f"{label:<24} total {total * 1000:8.1f} ms | per msg median {timings[len(timings) // 2] * 1000:6.2f} ms "
+        f"| p95 {timings[int(len(timings) * 0.95)] * 1000:6.2f} ms"
+    )
+
+
+class Command(BaseCommand):
+    help = "Compare per-call requests.post against the pooled and async WhatsApp senders on a local stub server."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=300)
+        parser.add_argument("--latency-ms", type=float, default=0.0, help="Simulated server processing time")
+
+    def handle(self, *args, **opts):
+        StubGraphHandler.latency = opts["latency_ms"] / 1000
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StubGraphHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        original_base = utils.API_BASE_URL
+        utils.API_BASE_URL = f"http://127.0.0.1:{server.server_address[1]}"
+        payload = utils.text_payload("919000000000", "benchmark")
+        n = opts["messages"]
+
+        try:
+            # Baseline: what the sender used to do, a new connection per message
+            timings = []
+            for _ in range(n):
+                start = time.perf_counter()
+                requests.post(utils.messages_url(), headers=utils.auth_headers(), data=json.dumps(payload), timeout=utils.REQUEST_TIMEOUT)
+                timings.append(time.perf_counter() - start)
+            self.stdout.write(_summary("requests.post (fresh)", timings))
+
+            utils.post_message(payload)  # open the pooled connection
+            timings = []
+            for _ in range(n):
+                start = time.perf_counter()
+                utils.post_message(payload)
+                timings.append(time.perf_counter() - start)
+            self.stdout.write(_summary("pooled session", timings))
+
+            if utils.httpx is None:
+                self.stdout.write("async client skipped: httpx not installed")
+                return
+
+            async def run_async():
+                async with utils.AsyncWhatsAppClient() as client:
+                    await client.post(payload)
+                    result = []
+                    for _ in range(n):
+                        start = time.perf_counter()
+                        await client.post(payload)
+                        result.append(time.perf_counter() - start)
+                    return result
+
+            self.stdout.write(_summary("async client (httpx)", asyncio.run(run_async())))
+        finally:
+            utils.API_BASE_URL = original_base
+            server.shutdown()
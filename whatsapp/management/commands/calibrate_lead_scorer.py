@@ -0,0 +1,72 @@
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from whatsapp.ai.local_scorer import SEGMENT_THRESHOLDS, is_borderline, score_lead_locally
+from whatsapp.models import Lead
+
+SEGMENTS = [segment for _, segment in SEGMENT_THRESHOLDS]
+
+
+class Command(BaseCommand):
+    help = "Compare the local lead scorer with GPT scores across the Lead table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--live", action="store_true", help="Re-score with GPT instead of using the stored score (costs API calls)")
+        parser.add_argument("--limit", type=int, default=None)
+        parser.add_argument("--margin", type=int, default=5, help="Borderline margin used to estimate hybrid GPT usage")
+
+    def handle(self, *args, **opts):
+        leads = Lead.objects.exclude(lead_type__in=["", "UNKNOWN"]).order_by("id")
+        if not opts["live"]:
+            # Only GPT's own scores are a reference; local and unknown-origin scores are left out
+            leads = leads.filter(score__isnull=False, scored_by="GPT")
+        if opts["limit"]:
+            leads = leads[: opts["limit"]]
+
+        if opts["live"]:
+            from whatsapp.ai.scorer import ai_score_lead
+
+        pairs = []
+        failed = 0
+        local_seconds = 0.0
+        for lead in leads.iterator():
+            start = time.perf_counter()
+            local = score_lead_locally(lead)
+            local_seconds += time.perf_counter() - start
+
+            if opts["live"]:
+                try:
+                    reference = ai_score_lead(lead)
+                except Exception:
+                    failed += 1
+                    continue
+            else:
+                reference = (lead.score, lead.segment, lead.rejection_reason)
+            pairs.append((local, reference))
+
+        if failed:
+            self.stdout.write(f"GPT failed on {failed} lead(s), left out of the comparison")
+        if not pairs:
+            self.stdout.write("No GPT-scored leads to compare (use --live to score with GPT).")
+            return
+
+        n = len(pairs)
+        diffs = [local[0] - ref[0] for local, ref in pairs]
+        agree = sum(1 for local, ref in pairs if local[1] == ref[1])
+        borderline = sum(1 for local, _ in pairs if is_borderline(local[0], opts["margin"]))
+        confusion = Counter((ref[1], local[1]) for local, ref in pairs)
+
+        self.stdout.write(f"leads compared:        {n} ({'live GPT' if opts['live'] else 'stored GPT scores'})")
+        self.stdout.write(f"segment agreement:     {agree / n:.1%}")
+        self.stdout.write(f"mean abs score diff:   {sum(abs(d) for d in diffs) / n:.1f}")
+        self.stdout.write(f"mean bias (local-gpt): {sum(diffs) / n:+.1f}")
+        self.stdout.write(f"hybrid GPT share:      {borderline / n:.1%} within ±{opts['margin']} of a boundary")
+        self.stdout.write(f"local latency:         {local_seconds / n * 1e6:.1f} µs/lead")
+
+        self.stdout.write("\nconfusion (rows = GPT, cols = local):")
+        self.stdout.write(" " * 10 + "".join(f"{s:>10}" for s in SEGMENTS))
+        for ref_segment in SEGMENTS:
+            row = "".join(f"{confusion[(ref_segment, s)]:>10}" for s in SEGMENTS)
+            self.stdout.write(f"{ref_segment:<10}{row}")
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from whatsapp.models import LLMCacheEntry
+
+
+class Command(BaseCommand):
+    help = "Report LLM cache size, hit counts and estimated token savings per function."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--evict", action="store_true", help="Run expiry/size eviction first")
+
+    def handle(self, *args, **options):
+        if options["evict"]:
+            from whatsapp.ai.cache import llm_cache
+            llm_cache.evict()
+
+        rows = (
+            LLMCacheEntry.objects.filter(expires_at__gt=timezone.now())
+            .values("function", "prompt_version")
+            .annotate(entries=Count("id"), total_hits=Sum("hits"), tokens_saved=Sum(F("hits") * F("tokens")))
+            .order_by("function", "prompt_version")
+        )
+        if not rows:
+            self.stdout.write("LLM cache is empty")
+            return
+
+        for row in rows:
+            hits = row["total_hits"] or 0
+            self.stdout.write(
+                f"{row['function']:<18} v{row['prompt_version']}  entries={row['entries']:<6} "
+                f"hits={hits:<7} hit_rate={hits / (hits + row['entries']):.0%}  tokens_saved={row['tokens_saved'] or 0}"
+            )
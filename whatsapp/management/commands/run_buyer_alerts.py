@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from whatsapp.alerts import match_pending_listings, run_alerts
+
+
+class Command(BaseCommand):
+    help = "Match new listings against open buyer searches and send the alerts under a rate limit."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=50, help="New listings matched per pass")
+        parser.add_argument("--poll-interval", type=float, default=5.0)
+        parser.add_argument("--match-only", action="store_true", help="Create alerts for one batch without sending and exit")
+
+    def handle(self, *args, **options):
+        if options["match_only"]:
+            match_pending_listings(options["batch_size"])
+            return
+        try:
+            run_alerts(batch_size=options["batch_size"], poll_interval=options["poll_interval"])
+        except KeyboardInterrupt:
+            self.stdout.write("Interrupted")
@@ -0,0 +1,26 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from whatsapp.drive import pool_stats, rename_claimed_folders, run_drive_pool
+
+
+class Command(BaseCommand):
+    help = "Keep DRIVE_FOLDER_POOL_SIZE shared Drive upload folders ready and rename the ones sellers claim."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, default=None, help="Seconds between idle passes (default: DRIVE_FOLDER_POOL_INTERVAL_SECONDS)")
+        parser.add_argument("--stats", action="store_true", help="Print pool depth and claim latency, then exit")
+        parser.add_argument("--rename-only", action="store_true", help="Rename claimed folders once and exit")
+
+    def handle(self, *args, **options):
+        if options["stats"]:
+            self.stdout.write(json.dumps(pool_stats(), indent=2))
+            return
+        if options["rename_only"]:
+            self.stdout.write(f"Renamed {rename_claimed_folders()} folder(s)")
+            return
+        try:
+            run_drive_pool(interval=options["interval"])
+        except KeyboardInterrupt:
+            self.stdout.write("Interrupted")
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from whatsapp.scoring import run_scorer, score_pending_leads
+
+
+class Command(BaseCommand):
+    help = "Score leads left pending by LEAD_SCORING_MODE=deferred, several per model request."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None, help="Leads per model request (default: LEAD_SCORING_BATCH_SIZE)")
+        parser.add_argument("--poll-interval", type=float, default=5.0)
+        parser.add_argument("--once", action="store_true", help="Score a single batch and exit")
+
+    def handle(self, *args, **options):
+        if options["once"]:
+            score_pending_leads(options["batch_size"])
+            return
+        try:
+            run_scorer(batch_size=options["batch_size"], poll_interval=options["poll_interval"])
+        except KeyboardInterrupt:
+            self.stdout.write("Interrupted")
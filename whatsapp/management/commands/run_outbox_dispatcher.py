@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from whatsapp.outbox import run_dispatcher
+
+
+class Command(BaseCommand):
+    help = "Send queued outbound WhatsApp messages under a token-bucket rate limit."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rate", type=float, default=None, help="Messages per second (default: WHATSAPP_SEND_RATE_PER_SECOND)")
+        parser.add_argument("--burst", type=int, default=None, help="Bucket capacity (default: WHATSAPP_SEND_BURST)")
+        parser.add_argument("--poll-interval", type=float, default=0.5)
+
+    def handle(self, *args, **options):
+        try:
+            run_dispatcher(rate=options["rate"], burst=options["burst"], poll_interval=options["poll_interval"])
+        except KeyboardInterrupt:
+            self.stdout.write("Interrupted")
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from whatsapp.sheets import flush_dirty_leads, run_sheet_sync
+
+
+class Command(BaseCommand):
+    help = "Write leads marked dirty by SHEETS_SYNC_MODE=deferred to Google Sheets in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, default=None, help="Seconds between flushes (default: SHEETS_SYNC_INTERVAL_SECONDS)")
+        parser.add_argument("--batch-size", type=int, default=None, help="Leads per flush (default: SHEETS_SYNC_BATCH_SIZE)")
+        parser.add_argument("--once", action="store_true", help="Flush a single batch and exit")
+
+    def handle(self, *args, **options):
+        if options["once"]:
+            flush_dirty_leads(options["batch_size"])
+            return
+        try:
+            run_sheet_sync(interval=options["interval"], batch_size=options["batch_size"])
+        except KeyboardInterrupt:
+            self.stdout.write("Interrupted")
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from whatsapp.jobs import run_worker
+
+
+class Command(BaseCommand):
+    help = "Drain queued webhook messages through the conversation state machine."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=4, help="Number of worker threads")
+        parser.add_argument("--poll-interval", type=float, default=0.2, help="Seconds to sleep when the queue is empty")
+        parser.add_argument("--warm-ai", action="store_true", help="Build OpenAI/CrewAI clients in each thread at startup")
+        parser.add_argument("--stats-interval", type=float, default=30, help="Seconds between queue stats log lines (0 disables)")
+
+    def handle(self, *args, **options):
+        try:
+            run_worker(
+                concurrency=options["concurrency"],
+                poll_interval=options["poll_interval"],
+                stats_interval=options["stats_interval"],
+                warm_ai=options["warm_ai"],
+            )
+        except KeyboardInterrupt:
+            self.stdout.write("Interrupted, waiting for in-flight messages to finish...")
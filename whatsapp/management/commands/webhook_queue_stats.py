@@ -0,0 +1,12 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from whatsapp.jobs import queue_stats
+
+
+class Command(BaseCommand):
+    help = "Print webhook queue depth and processing latency."
+
+    def handle(self, *args, **options):
+        self.stdout.write(json.dumps(queue_stats(), indent=2))
@@ -0,0 +1,374 @@
+import heapq
+import sys
+import threading
+import time
+from bisect import bisect_right, insort
+from collections import deque, namedtuple
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import TextField, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .matching import (
+    AMENITY_POINTS,
+    AREA_POINTS,
+    BHK_EXACT_POINTS,
+    BHK_NEAR_POINTS,
+    BUDGET_STRETCH,
+    PRICE_IN_BUDGET_POINTS,
+    PRICE_STRETCH_POINTS,
+    locality_filter,
+)
+from .models import Lead, Property
+from .gazetteer import gazetteer
+from .parsing import AMENITY_BITS
+
+# Everything the buyer flow reads from a listing, including the seller's drive link
+IndexedProperty = namedtuple("IndexedProperty", [
+    "id", "SELLER_id", "property_type", "area_sqft", "bhk", "location", "price_range", "amenities",
+    "property_kind", "locality", "bhk_count", "min_price", "max_price", "min_sqft", "max_sqft",
+    "amenity_mask", "created_at", "drive_link",
+])
+INDEX_COLUMNS = [f for f in IndexedProperty._fields if f != "drive_link"]
+EMPTY = frozenset()
+UNKNOWN_LOCALITY = ""  # _by_locality bucket for listings whose place the gazetteer doesn't know
+LATENCY_SAMPLES = 1000
+
+
+def _entry_from_row(row):
+    return IndexedProperty(**row)
+
+
+def _entry_from_instance(prop, drive_link):
+    values = {field: getattr(prop, field) for field in INDEX_COLUMNS}
+    return IndexedProperty(drive_link=drive_link or "", **values)
+
+
+def _locality_bucket(locality):
+    return locality if locality in gazetteer.localities else UNKNOWN_LOCALITY
+
+
+def make_parsed_counter(prefs, localities):
+    """Python twin of matching._known_expression."""
+    checks = []
+    if prefs.get("property_kind"):
+        checks.append(lambda e: e.property_kind is not None)
+    if localities:
+        checks.append(lambda e: e.locality in gazetteer.localities)
+    if prefs.get("bhk_count"):
+        checks.append(lambda e: e.bhk_count is not None)
+    if prefs.get("price_range"):
+        checks.append(lambda e: e.min_price is not None)
+    return lambda entry: sum(1 for check in checks if check(entry))
+
+
+def make_scorer(prefs):
+    """
+    Python twin of matching._rank_expression, so both backends rank alike.
+
+    Everything derived from the preferences is computed once; the returned
+    function only reads the entry.
+    """
+    bhk = prefs.get("bhk_count")
+    price = prefs.get("price_range")
+    price_stretch = int(price[1] * BUDGET_STRETCH) if price else None
+    area = prefs.get("area_range")
+    wanted = [bit for bit in AMENITY_BITS.values() if prefs.get("amenity_mask", 0) & bit]
+    amenity_points = AMENITY_POINTS // len(wanted) if wanted else 0
+
+    def score(entry):
+        total = 0
+        if bhk and entry.bhk_count is not None:
+            if entry.bhk_count == bhk:
+                total += BHK_EXACT_POINTS
+            elif abs(entry.bhk_count - bhk) == 1:
+                total += BHK_NEAR_POINTS
+        if price and entry.min_price is not None:
+            if entry.min_price <= price[1] and entry.max_price is not None and entry.max_price >= price[0]:
+                total += PRICE_IN_BUDGET_POINTS
+            elif entry.min_price <= price_stretch:
+                total += PRICE_STRETCH_POINTS
+        if area and entry.min_sqft is not None and entry.max_sqft is not None:
+            if entry.min_sqft <= area[1] and entry.max_sqft >= area[0]:
+                total += AREA_POINTS
+        for bit in wanted:
+            if entry.amenity_mask & bit:
+                total += amenity_points
+        return total
+
+    return score
+
+
+class PropertyMatchIndex:
+    """
+    In-process index of active listings for buyer matching.
+
+    Inverted indexes map property kind, locality and BHK count to listing
+    ids, and a sorted (min_price, id) array answers "at most this price"
+    with a bisect. The index is built on first use and kept current by the
+    Property/Lead signals below; a background refresh picks up rows written
+    by other processes (new ids every SYNC seconds, full rebuild every
+    REBUILD seconds), so queries never wait on the database.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._refreshing = threading.Lock()
+        self._reset()
+        self.built = False
+        self.build_seconds = 0.0
+        self.last_sync = 0.0
+        self.last_rebuild = 0.0
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.queries = 0
+
+    def _reset(self):
+        self._entries = {}
+        self._by_kind = {}
+        self._by_locality = {}
+        self._by_bhk = {}
+        self._by_seller = {}
+        self._prices = []  # sorted (min_price, id)
+        self._unpriced = set()  # ids whose price could not be parsed
+        self._max_id = 0
+
+    # ---- building ----
+    def _load_rows(self, **filters):
+        return (
+            Property.objects.filter(is_active=True, **filters)
+            .values(*INDEX_COLUMNS, drive_link=Coalesce("SELLER__drive_link", Value(""), output_field=TextField()))
+            .order_by("id")
+        )
+
+    def build(self):
+        """Load every active listing into fresh structures and swap them in."""
+        start = time.perf_counter()
+        fresh = PropertyMatchIndex()
+        for row in self._load_rows().iterator(chunk_size=5000):
+            fresh._add(_entry_from_row(row), keep_sorted=False)
+        fresh._prices.sort()
+        with self._lock:
+            for name in ("_entries", "_by_kind", "_by_locality", "_by_bhk", "_by_seller", "_prices", "_unpriced", "_max_id"):
+                setattr(self, name, getattr(fresh, name))
+            self.built = True
+            self.build_seconds = time.perf_counter() - start
+            self.last_sync = self.last_rebuild = time.monotonic()
+        print(f"🗂️ Property index built: {len(self._entries)} listings in {self.build_seconds * 1000:.0f} ms")
+
+    def ensure_built(self):
+        if not self.built:
+            with self._lock:
+                if not self.built:
+                    self.build()
+
+    def _sync_new(self):
+        rows = list(self._load_rows(id__gt=self._max_id))
+        with self._lock:
+            for row in rows:
+                self.upsert(_entry_from_row(row))
+            self.last_sync = time.monotonic()
+
+    def _refresh(self, rebuild):
+        try:
+            if rebuild:
+                self.build()
+            else:
+                self._sync_new()
+        except Exception as e:
+            print(f"❌ Property index refresh failed: {e}")
+        finally:
+            self._refreshing.release()
+
+    def _maybe_refresh(self):
+        now = time.monotonic()
+        rebuild = now - self.last_rebuild >= getattr(settings, "PROPERTY_INDEX_REBUILD_SECONDS", 600)
+        sync = now - self.last_sync >= getattr(settings, "PROPERTY_INDEX_SYNC_SECONDS", 30)
+        if (rebuild or sync) and self._refreshing.acquire(blocking=False):
+            threading.Thread(target=self._refresh, args=(rebuild,), name="property-index-refresh", daemon=True).start()
+
+    # ---- incremental maintenance (callers hold self._lock) ----
+    # Unparsed kind / BHK are kept under None and unknown places under
+    # UNKNOWN_LOCALITY, so queries can let them through every filter
+    def _add(self, entry, keep_sorted=True):
+        self._entries[entry.id] = entry
+        self._by_kind.setdefault(entry.property_kind, set()).add(entry.id)
+        self._by_locality.setdefault(_locality_bucket(entry.locality), set()).add(entry.id)
+        self._by_bhk.setdefault(entry.bhk_count, set()).add(entry.id)
+        self._by_seller.setdefault(entry.SELLER_id, set()).add(entry.id)
+        if entry.min_price is None:
+            self._unpriced.add(entry.id)
+        elif keep_sorted:
+            insort(self._prices, (entry.min_price, entry.id))
+        else:
+            self._prices.append((entry.min_price, entry.id))
+        self._max_id = max(self._max_id, entry.id)
+
+    def _discard(self, property_id):
+        entry = self._entries.pop(property_id, None)
+        if entry is None:
+            return None
+        for mapping, key in (
+            (self._by_kind, entry.property_kind),
+            (self._by_locality, _locality_bucket(entry.locality)),
+            (self._by_bhk, entry.bhk_count),
+            (self._by_seller, entry.SELLER_id),
+        ):
+            ids = mapping.get(key)
+            if ids is not None:
+                ids.discard(property_id)
+                if not ids:
+                    del mapping[key]
+        self._unpriced.discard(property_id)
+        if entry.min_price is not None:
+            pos = bisect_right(self._prices, (entry.min_price, property_id)) - 1
+            if pos >= 0 and self._prices[pos] == (entry.min_price, property_id):
+                del self._prices[pos]
+        return entry
+
+    def upsert(self, entry):
+        with self._lock:
+            self._discard(entry.id)
+            self._add(entry)
+
+    def remove(self, property_id):
+        with self._lock:
+            self._discard(property_id)
+
+    def seller_drive_link(self, seller_id):
+        with self._lock:
+            for property_id in self._by_seller.get(seller_id, ()):
+                return self._entries[property_id].drive_link
+        return None
+
+    def set_drive_link(self, seller_id, drive_link):
+        with self._lock:
+            for property_id in self._by_seller.get(seller_id, ()):
+                entry = self._entries[property_id]
+                if entry.drive_link != drive_link:
+                    self._entries[property_id] = entry._replace(drive_link=drive_link)
+
+    # ---- queries ----
+    def get(self, property_id):
+        self.ensure_built()
+        return self._entries.get(property_id)
+
+    def query(self, prefs, limit=5):
+        """Same filters and ranking as matching.find_matching_properties, from memory."""
+        self.ensure_built()
+        self._maybe_refresh()
+        start = time.perf_counter()
+
+        kind = prefs.get("property_kind")
+        localities = locality_filter(prefs)
+        bhk = prefs.get("bhk_count")
+        price = prefs.get("price_range")
+        price_cap = int(price[1] * BUDGET_STRETCH) if price else None
+
+        with self._lock:
+            # Equality filters are set intersections (run in C, cost bounded by the smaller set)
+            exact = [self._by_kind.get(kind, EMPTY) | self._by_kind.get(None, EMPTY)] if kind else []
+            if localities:
+                exact.append(set().union(
+                    self._by_locality.get(UNKNOWN_LOCALITY, EMPTY), *(self._by_locality.get(key, EMPTY) for key in localities)
+                ))
+            exact.sort(key=len)
+            bhk_groups = [self._by_bhk.get(b, EMPTY) for b in (bhk - 1, bhk, bhk + 1, None)] if bhk else []
+
+            if exact:
+                ids = exact[0].intersection(*exact[1:])
+                if bhk_groups:
+                    ids = set().union(*(ids & group for group in bhk_groups))
+            elif bhk_groups:
+                ids = set().union(*bhk_groups)
+            else:
+                ids = None  # no equality filter: walk the price prefix or everything
+
+            if price_cap is not None and ids is None:
+                cut = bisect_right(self._prices, (price_cap, float("inf")))
+                matches = [self._entries[pid] for _, pid in islice(self._prices, cut)]
+                matches += [self._entries[pid] for pid in self._unpriced]
+            else:
+                entries = self._entries
+                matches = [entries[pid] for pid in (entries if ids is None else ids)]
+                if price_cap is not None:
+                    matches = [e for e in matches if e.min_price is None or e.min_price <= price_cap]
+
+        score = make_scorer(prefs)
+        parsed = make_parsed_counter(prefs, localities)
+        top = heapq.nlargest(limit, matches, key=lambda e: (parsed(e), score(e), e.created_at))
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.queries += 1
+            self._latencies.append(elapsed)
+        return top
+
+    # ---- stats ----
+    def memory_bytes(self):
+        """Approximate footprint: entries, their field values and the index containers."""
+        with self._lock:
+            total = sys.getsizeof(self._entries) + sys.getsizeof(self._prices) + sys.getsizeof(self._unpriced)
+            for entry in self._entries.values():
+                total += sys.getsizeof(entry) + sum(sys.getsizeof(v) for v in entry)
+            total += sum(sys.getsizeof(item) for item in self._prices)
+            for mapping in (self._by_kind, self._by_locality, self._by_bhk, self._by_seller):
+                total += sys.getsizeof(mapping) + sum(sys.getsizeof(ids) for ids in mapping.values())
+        return total
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            listings = len(self._entries)
+            queries = self.queries
+        pick = lambda q: latencies[min(int(len(latencies) * q), len(latencies) - 1)] * 1e6 if latencies else 0.0
+        return {
+            "built": self.built,
+            "listings": listings,
+            "build_ms": round(self.build_seconds * 1000, 1),
+            "memory_kb": round(self.memory_bytes() / 1024),
+            "queries": queries,
+            "p50_us": round(pick(0.5), 1),
+            "p95_us": round(pick(0.95), 1),
+        }
+
+
+property_index = PropertyMatchIndex()
+
+
+# ======== SIGNALS ========
+# Applied after commit so a rolled-back save never reaches the index.
+# bulk_create/update/delete bypass signals; the periodic refresh covers them.
+@receiver(post_save, sender=Property)
+def _property_saved(sender, instance, **kwargs):
+    if not property_index.built:
+        return
+
+    def apply():
+        if not instance.is_active:
+            property_index.remove(instance.pk)
+            return
+        if Property.SELLER.is_cached(instance):
+            drive_link = instance.SELLER.drive_link or ""
+        else:
+            drive_link = property_index.seller_drive_link(instance.SELLER_id)
+        property_index.upsert(_entry_from_instance(instance, drive_link))
+
+    transaction.on_commit(apply)
+
+
+@receiver(post_delete, sender=Property)
+def _property_deleted(sender, instance, **kwargs):
+    if property_index.built:
+        # delete() clears instance.pk before the commit callbacks run
+        property_id = instance.pk
+        transaction.on_commit(lambda: property_index.remove(property_id))
+
+
+@receiver(post_save, sender=Lead)
+def _seller_saved(sender, instance, **kwargs):
+    if property_index.built and instance.lead_type == "SELLER":
+        drive_link = instance.drive_link or ""
+        transaction.on_commit(lambda: property_index.set_drive_link(instance.pk, drive_link))
@@ -0,0 +1,231 @@
+from django.conf import settings
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.db.models.lookups import GreaterThan
+
+from .gazetteer import gazetteer, locality_key
+from .models import Lead, Property
+from .parsing import (
+    AMENITY_BITS,
+    amenity_mask,
+    parse_area_range,
+    parse_bhk,
+    parse_price_range,
+    parse_property_type,
+)
+
+# Ranking weights (max 100)
+BHK_EXACT_POINTS = 30
+BHK_NEAR_POINTS = 10
+PRICE_IN_BUDGET_POINTS = 30
+PRICE_STRETCH_POINTS = 10
+AREA_POINTS = 20
+AMENITY_POINTS = 20
+
+# Listings up to this much over budget are still shown, ranked lower
+BUDGET_STRETCH = 1.2
+
+
+def buyer_preferences(lead):
+    """Typed search preferences parsed from a buyer's answers."""
+    d = lead.data or {}
+    kind = parse_property_type(d.get("property_type_preference"))
+    return {
+        "property_kind": kind.upper() if kind else None,
+        "locality": d.get("location_key") or locality_key(d.get("location_preference")),
+        "bhk_count": parse_bhk(d.get("bhk")),
+        "area_range": parse_area_range(d.get("area_preference")),
+        "price_range": parse_price_range(d.get("budget")),
+        "amenity_mask": amenity_mask(d.get("amenities")),
+    }
+
+
+def listing_details(p):
+    """What the buyer flow stores about each offered listing in lead.data["matching_properties"]."""
+    return {
+        "property_id": p.id,
+        "seller_id": p.SELLER_id,
+        "property_type": p.property_type,
+        "area_sqft": p.area_sqft,
+        "bhk": p.bhk,
+        "location": p.location,
+        "price_range": p.price_range,
+        "amenities": p.amenities
+    }
+
+
+def format_listing(idx, p):
+    return (
+        f"{idx}) {p.bhk or ''} {p.property_type or ''}\n"
+        f"📐 {p.area_sqft or 'N/A'} sq.ft\n"
+        f"📍 {p.location or 'N/A'}\n"
+        f"💰 {p.price_range or 'N/A'}\n"
+        f"🛠 Amenities: {p.amenities or 'N/A'}\n"
+    )
+
+
+def _rank_expression(prefs):
+    terms = []
+
+    bhk = prefs.get("bhk_count")
+    if bhk:
+        terms.append(Case(
+            When(bhk_count=bhk, then=Value(BHK_EXACT_POINTS)),
+            When(bhk_count__in=[bhk - 1, bhk + 1], then=Value(BHK_NEAR_POINTS)),
+            default=Value(0),
+        ))
+
+    price = prefs.get("price_range")
+    if price:
+        terms.append(Case(
+            When(min_price__lte=price[1], max_price__gte=price[0], then=Value(PRICE_IN_BUDGET_POINTS)),
+            When(min_price__lte=int(price[1] * BUDGET_STRETCH), then=Value(PRICE_STRETCH_POINTS)),
+            default=Value(0),
+        ))
+
+    area = prefs.get("area_range")
+    if area:
+        terms.append(Case(
+            When(min_sqft__lte=area[1], max_sqft__gte=area[0], then=Value(AREA_POINTS)),
+            default=Value(0),
+        ))
+
+    wanted = [bit for bit in AMENITY_BITS.values() if prefs.get("amenity_mask", 0) & bit]
+    for bit in wanted:
+        terms.append(Case(
+            When(GreaterThan(F("amenity_mask").bitand(bit), 0), then=Value(AMENITY_POINTS // len(wanted))),
+            default=Value(0),
+        ))
+
+    if not terms:
+        return Value(0, output_field=IntegerField())
+    expression = terms[0]
+    for term in terms[1:]:
+        expression = expression + term
+    return expression
+
+
+def locality_filter(prefs):
+    """
+    Gazetteer keys to narrow the search to, or None.
+
+    A city-level or unrecognised answer ("Hyderabad", a street address)
+    resolves to no gazetteer locality and doesn't narrow the search.
+    """
+    locality = prefs.get("locality")
+    if locality:
+        return [locality] if locality in gazetteer.localities else None
+    return prefs.get("localities") or None
+
+
+def _known_expression(prefs, localities):
+    """
+    How many of the applied filters a listing passed on a parsed value
+    rather than an unparsed (NULL or unrecognised) one; sorted on before
+    the score, so unparsed listings only fill places parsed ones leave.
+    """
+    terms = []
+    if prefs.get("property_kind"):
+        terms.append(Case(When(property_kind__isnull=False, then=Value(1)), default=Value(0)))
+    if localities:
+        terms.append(Case(When(locality__in=list(gazetteer.localities), then=Value(1)), default=Value(0)))
+    if prefs.get("bhk_count"):
+        terms.append(Case(When(bhk_count__isnull=False, then=Value(1)), default=Value(0)))
+    if prefs.get("price_range"):
+        terms.append(Case(When(min_price__isnull=False, then=Value(1)), default=Value(0)))
+    if not terms:
+        return Value(0, output_field=IntegerField())
+    expression = terms[0]
+    for term in terms[1:]:
+        expression = expression + term
+    return expression
+
+
+def match_backend():
+    return getattr(settings, "PROPERTY_MATCH_BACKEND", "sql")
+
+
+def _search(prefs, limit):
+    if match_backend() == "index":
+        from .match_index import property_index
+        return property_index.query(prefs, limit=limit)
+    return find_matching_properties_sql(prefs, limit=limit)
+
+
+def find_matching_properties(prefs, limit=5):
+    """
+    Top `limit` listings for the buyer, from the in-memory index or SQL per
+    PROPERTY_MATCH_BACKEND.
+
+    If the buyer's locality has fewer than `limit` matches, the rest are
+    filled from gazetteer neighbours within PROPERTY_MATCH_RADIUS_KM.
+    Listings whose answers could not be parsed are kept, ranked after
+    parsed ones (see find_matching_properties_sql).
+    """
+    matches = _search(prefs, limit)
+    locality = prefs.get("locality")
+    radius = getattr(settings, "PROPERTY_MATCH_RADIUS_KM", 5)
+    if len(matches) < limit and locality and radius:
+        nearby = [key for key, _ in gazetteer.neighbours(locality, radius)]
+        if nearby:
+            # Unparsed-place listings pass both searches; don't offer one twice
+            seen = {m.id for m in matches}
+            extra = _search(dict(prefs, locality=None, localities=nearby), limit)
+            matches += [m for m in extra if m.id not in seen][:limit - len(matches)]
+    return matches
+
+
+def get_listing(property_id):
+    """
+    (listing, drive_link) for a buyer's selection, or (None, "") if it is gone.
+
+    The index backend answers from memory and only asks the database for
+    the seller's drive link if the index has not seen it yet.
+    """
+    if match_backend() == "index":
+        from .match_index import property_index
+        listing = property_index.get(property_id)
+        if listing is None:
+            return None, ""
+        drive_link = listing.drive_link
+        if not drive_link:
+            drive_link = Lead.objects.filter(pk=listing.SELLER_id).values_list("drive_link", flat=True).first() or ""
+        return listing, drive_link
+
+    listing = Property.objects.select_related("SELLER").filter(pk=property_id).first()
+    if listing is None:
+        return None, ""
+    return listing, listing.SELLER.drive_link or ""
+
+
+def find_matching_properties_sql(prefs, limit=5):
+    """
+    Ranked listing search.
+
+    Property kind and locality (see locality_filter) are filters on indexed
+    columns, and listings far over budget or far off the BHK count are
+    excluded up front. A listing whose free text for a filtered column could
+    not be parsed (NULL, or a place the gazetteer doesn't know) passes that
+    filter but sorts after every listing that passed on parsed values. The
+    candidates are scored on BHK, budget, area and amenities in SQL and
+    only the top `limit` rows are fetched.
+    """
+    qs = Property.objects.filter(is_active=True)
+
+    if prefs.get("property_kind"):
+        qs = qs.filter(Q(property_kind=prefs["property_kind"]) | Q(property_kind__isnull=True))
+    localities = locality_filter(prefs)
+    if localities:
+        qs = qs.filter(Q(locality__in=localities) | ~Q(locality__in=list(gazetteer.localities)))
+
+    bhk = prefs.get("bhk_count")
+    if bhk:
+        qs = qs.filter(Q(bhk_count__gte=bhk - 1, bhk_count__lte=bhk + 1) | Q(bhk_count__isnull=True))
+
+    price = prefs.get("price_range")
+    if price:
+        qs = qs.filter(Q(min_price__lte=int(price[1] * BUDGET_STRETCH)) | Q(min_price__isnull=True))
+
+    return list(
+        qs.annotate(match_score=_rank_expression(prefs), parsed_filters=_known_expression(prefs, localities))
+        .order_by("-parsed_filters", "-match_score", "-created_at")[:limit]
+    )
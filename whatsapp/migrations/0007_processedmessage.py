@@ -0,0 +1,22 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('whatsapp', '0006_inboundmessage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessedMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('message_id', models.CharField(max_length=128, unique=True)),
+                ('phone', models.CharField(blank=True, default='', max_length=20)),
+                ('processed_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
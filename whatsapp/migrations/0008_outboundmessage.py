@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('whatsapp', '0007_processedmessage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboundMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phone', models.CharField(max_length=20)),
+                ('payload', models.JSONField()),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('SENT', 'Sent'), ('DELIVERED', 'Delivered'), ('READ', 'Read'), ('FAILED', 'Failed')], default='PENDING', max_length=12)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, null=True)),
+                ('next_attempt_at', models.DateTimeField(blank=True, null=True)),
+                ('wa_message_id', models.CharField(blank=True, db_index=True, max_length=128, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('delivered_at', models.DateTimeField(blank=True, null=True)),
+                ('read_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'id'], name='whatsapp_ou_status_766a6c_idx'), models.Index(fields=['phone', 'status'], name='whatsapp_ou_phone_57d719_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('whatsapp', '0008_outboundmessage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LLMCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('function', models.CharField(max_length=50)),
+                ('prompt_version', models.CharField(max_length=16)),
+                ('value', models.JSONField()),
+                ('tokens', models.PositiveIntegerField(default=0)),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(db_index=True)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
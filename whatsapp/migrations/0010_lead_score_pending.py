@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('whatsapp', '0009_llmcacheentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lead',
+            name='score_pending',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+        migrations.AddField(
+            model_name='lead',
+            name='scored_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
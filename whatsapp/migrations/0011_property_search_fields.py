@@ -0,0 +1,74 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('whatsapp', '0010_lead_score_pending'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='amenity_mask',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='bhk_count',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='is_active',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='locality',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='max_price',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='max_sqft',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='min_price',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='min_sqft',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='property_kind',
+            field=models.CharField(blank=True, max_length=10, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['property_kind', 'locality', 'bhk_count'], name='property_kind_loc_bhk_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['property_kind', 'locality', 'min_price'], name='property_kind_loc_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['property_kind', 'min_price'], name='property_kind_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['locality', 'min_price'], name='property_loc_price_idx'),
+        ),
+    ]
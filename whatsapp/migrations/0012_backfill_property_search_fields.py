@@ -0,0 +1,175 @@
+"""
+Backfill the Property search columns added in 0011.
+
+The parsers are frozen copies of whatsapp.parsing as it stood when the
+columns were added, so later changes to that module never change what this
+migration writes. Localities are the plain normalized text; 0013 re-keys
+them against the gazetteer. Rows saved afterwards are refreshed by
+Property.save with the live code.
+"""
+import re
+
+from django.db import migrations
+
+CHUNK_SIZE = 2000
+
+# ======== PARSERS ========
+PROPERTY_TYPES = {
+    "apartment": "Apartment", "apartments": "Apartment", "apt": "Apartment", "flat": "Apartment", "flats": "Apartment",
+    "house": "House", "independent house": "House", "individual house": "House", "villa": "House",
+    "plot": "Plot", "plots": "Plot", "open plot": "Plot", "land": "Plot",
+}
+NUMBER_WORDS = {"one": 1, "single": 1, "two": 2, "double": 2, "three": 3, "four": 4, "five": 5, "six": 6}
+BHK_RE = re.compile(
+    r"^(\d{1,2}|" + "|".join(NUMBER_WORDS) + r")\s*"
+    r"(?:bhk|b\.h\.k\.?|bed\s*rooms?|bedrooms?|beds?|br|rk)?$"
+)
+_NUM = r"(\d[\d,]*(?:\.\d+)?)"
+AREA_RE = re.compile(
+    r"^" + _NUM + r"\s*(?:sq\.?\s*ft\.?|sqft|sft|sq\.?\s*feet|square\s*feet|ft2)?\s*"
+    r"(?:(?:-|–|to)\s*" + _NUM + r"\s*(?:sq\.?\s*ft\.?|sqft|sft|sq\.?\s*feet|square\s*feet|ft2)?)?$"
+)
+MIN_SQFT, MAX_SQFT = 100, 100000
+LAKH, CRORE = 100_000, 10_000_000
+PRICE_UNITS = {
+    "l": LAKH, "lac": LAKH, "lacs": LAKH, "lakh": LAKH, "lakhs": LAKH, "lk": LAKH,
+    "cr": CRORE, "crs": CRORE, "crore": CRORE, "crores": CRORE,
+    "k": 1_000, "thousand": 1_000,
+}
+_UNIT = r"(" + "|".join(sorted(PRICE_UNITS, key=len, reverse=True)) + r")?"
+PRICE_RE = re.compile(r"^" + _NUM + r"\s*" + _UNIT + r"\s*(?:(?:-|–|to)\s*" + _NUM + r"\s*" + _UNIT + r")?$")
+MIN_PRICE, MAX_PRICE = LAKH, 1000 * CRORE
+AMENITIES = {
+    "pool": "Pool", "swimming pool": "Pool", "swimming": "Pool",
+    "gym": "Gym", "gymnasium": "Gym", "fitness center": "Gym",
+    "lift": "Lift", "lifts": "Lift", "elevator": "Lift",
+    "garden": "Garden", "park": "Garden",
+    "power backup": "Power Backup", "backup": "Power Backup", "generator": "Power Backup",
+    "parking": "Parking", "car parking": "Parking",
+    "security": "Security", "24x7 security": "Security",
+    "cctv": "CCTV",
+    "clubhouse": "Clubhouse", "club house": "Clubhouse",
+    "play area": "Play Area", "kids play area": "Play Area", "children play area": "Play Area",
+}
+AMENITY_SPLIT_RE = re.compile(r"\s*(?:,|/|&|\+|;|\band\b)\s*")
+AMENITY_BITS = {
+    name: 1 << i for i, name in enumerate(
+        ["Pool", "Gym", "Lift", "Garden", "Power Backup", "Parking", "Security", "CCTV", "Clubhouse", "Play Area"]
+    )
+}
+APPROX_RE = re.compile(r"^(?:around|approx\.?|approximately|about|roughly|~)\s*")
+CITY_SUFFIX_RE = re.compile(r"[,\s]+(?:hyderabad|hyd|secunderabad|telangana|india)$")
+
+
+def _clean(text):
+    return re.sub(r"\s+", " ", str(text or "").strip().lower()).rstrip(".")
+
+
+def _to_number(value):
+    return float(value.replace(",", ""))
+
+
+def parse_bhk(text):
+    match = BHK_RE.match(_clean(text))
+    if not match:
+        return None
+    count = NUMBER_WORDS.get(match.group(1)) or int(match.group(1))
+    return count if 1 <= count <= 10 else None
+
+
+def parse_area_range(text):
+    match = AREA_RE.match(APPROX_RE.sub("", _clean(text)))
+    if not match:
+        return None
+    low = _to_number(match.group(1))
+    high = _to_number(match.group(2)) if match.group(2) else low
+    low, high = int(min(low, high)), int(max(low, high))
+    if low < MIN_SQFT or high > MAX_SQFT:
+        return None
+    return low, high
+
+
+def parse_price_range(text):
+    cleaned = re.sub(r"^(?:rs\.?|inr|₹)\s*", "", APPROX_RE.sub("", _clean(text)))
+    cleaned = re.sub(r"\s*(?:rs\.?|inr|₹)\s*", " ", cleaned).strip()
+    match = PRICE_RE.match(cleaned)
+    if not match:
+        return None
+    low_num, low_unit, high_num, high_unit = match.groups()
+    if high_num is None:
+        high_num, high_unit = low_num, low_unit
+    low_unit = low_unit or high_unit
+    low = _to_number(low_num) * PRICE_UNITS.get(low_unit, 1)
+    high = _to_number(high_num) * PRICE_UNITS.get(high_unit, 1)
+    low, high = int(min(low, high)), int(max(low, high))
+    if low < MIN_PRICE or high > MAX_PRICE:
+        return None
+    return low, high
+
+
+def amenity_mask(text):
+    mask = 0
+    for part in AMENITY_SPLIT_RE.split(_clean(text)):
+        amenity = AMENITIES.get(part)
+        if amenity:
+            mask |= AMENITY_BITS[amenity]
+    return mask
+
+
+def normalize_locality(text):
+    cleaned = re.sub(r"[^a-z0-9, ]+", " ", _clean(text))
+    cleaned = re.sub(r"\s+", " ", cleaned).strip(" ,")
+    while True:
+        stripped = CITY_SUFFIX_RE.sub("", cleaned).strip(" ,")
+        if stripped == cleaned or not stripped:
+            return cleaned
+        cleaned = stripped
+
+
+def property_search_fields(property_type, area, bhk, location, price, amenities):
+    kind = PROPERTY_TYPES.get(_clean(property_type))
+    area_range = parse_area_range(area) or (None, None)
+    price_range = parse_price_range(price) or (None, None)
+    return {
+        "property_kind": kind.upper() if kind else None,
+        "min_sqft": area_range[0],
+        "max_sqft": area_range[1],
+        "bhk_count": parse_bhk(bhk),
+        "min_price": price_range[0],
+        "max_price": price_range[1],
+        "locality": normalize_locality(location),
+        "amenity_mask": amenity_mask(amenities),
+    }
+
+
+# ======== BACKFILL ========
+def backfill(apps, schema_editor):
+    Property = apps.get_model("whatsapp", "Property")
+    fields = list(property_search_fields(None, None, None, None, None, None))
+    locality_length = Property._meta.get_field("locality").max_length
+    batch = []
+    for prop in Property.objects.order_by("id").iterator(chunk_size=CHUNK_SIZE):
+        parsed = property_search_fields(
+            prop.property_type, prop.area_sqft, prop.bhk, prop.location, prop.price_range, prop.amenities
+        )
+        # Free-text locations can outgrow the column
+        parsed["locality"] = parsed["locality"][:locality_length].rstrip(" ,")
+        for field, value in parsed.items():
+            setattr(prop, field, value)
+        batch.append(prop)
+        if len(batch) >= CHUNK_SIZE:
+            Property.objects.bulk_update(batch, fields)
+            batch = []
+    if batch:
+        Property.objects.bulk_update(batch, fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('whatsapp', '0011_property_search_fields'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
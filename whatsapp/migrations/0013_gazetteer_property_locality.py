@@ -0,0 +1,153 @@
+"""
+Re-key Property.locality against the Hyderabad gazetteer.
+
+The gazetteer lookup is a frozen copy of whatsapp.gazetteer.locality_key
+as it stood when this migration was written, so later changes to the
+gazetteer never change what this migration writes. Rows saved afterwards are keyed
+by Property.save with the live code.
+"""
+import re
+from collections import Counter
+
+from django.db import migrations
+
+CHUNK_SIZE = 2000
+
+
+# ======== GAZETTEER ========
+# (canonical name, aliases); coordinates are not needed for keys
+LOCALITIES = [
+    ("Gachibowli", ["gachibouli"]), ("Hitech City", ["hi tech city", "hitec city", "hi-tec city", "cyberabad"]),
+    ("Madhapur", []), ("Kondapur", []), ("Financial District", ["financial dist", "fin district"]),
+    ("Nanakramguda", ["nanakram guda"]), ("Kokapet", []), ("Narsingi", []), ("Puppalaguda", []),
+    ("Manikonda", []), ("Gandipet", []), ("Tellapur", []), ("Kollur", []), ("Lingampally", ["lingampalli"]),
+    ("Serilingampally", ["serilingampalli"]), ("Chandanagar", ["chanda nagar"]), ("Miyapur", []),
+    ("Bachupally", ["bachupalli"]), ("Nizampet", []), ("Pragathi Nagar", []),
+    ("Kukatpally", ["kukatpalli", "kphb", "kphb colony"]), ("Moosapet", []), ("Patancheru", []),
+    ("Shankarpally", ["shankarpalli"]), ("Jubilee Hills", []), ("Banjara Hills", []),
+    ("Tolichowki", ["toli chowki"]), ("Mehdipatnam", []), ("Attapur", []), ("Rajendranagar", []),
+    ("Shamshabad", []), ("Somajiguda", []), ("Ameerpet", []), ("Begumpet", []), ("Himayatnagar", []),
+    ("Abids", []), ("Secunderabad", ["secbad"]), ("Bowenpally", ["bowenpalli"]), ("Kompally", ["kompalli"]),
+    ("Medchal", []), ("Alwal", []), ("Sainikpuri", []), ("Malkajgiri", []),
+    ("ECIL", ["ecil x roads", "a s rao nagar", "as rao nagar"]), ("Habsiguda", []), ("Uppal", []), ("Nagole", []),
+    ("Dilsukhnagar", ["dilsukh nagar", "dsnr"]), ("LB Nagar", ["l b nagar", "lal bahadur nagar"]),
+    ("Adibatla", []), ("Amberpet", []), ("Malakpet", []), ("Kothapet", []), ("Vanasthalipuram", []),
+    ("Balanagar", []), ("Shaikpet", []), ("Nallagandla", []), ("Bandlaguda Jagir", ["bandlaguda"]),
+]
+CITY_SUFFIX_RE = re.compile(r"[,\s]+(?:hyderabad|hyd|secunderabad|telangana|india)$")
+FILLER_RE = re.compile(r"\b(?:near|opp|opposite|beside|behind|area|road|rd|colony|main|x roads|cross roads)\b")
+MIN_TRIGRAM_SIMILARITY = 0.4
+CHARS_PER_EDIT = 4
+LOCALITY_KEY_MAX_LENGTH = 100
+
+
+def normalize_locality(text):
+    cleaned = re.sub(r"[^a-z0-9, ]+", " ", str(text or "").strip().lower())
+    cleaned = re.sub(r"\s+", " ", cleaned).strip(" ,")
+    while True:
+        stripped = CITY_SUFFIX_RE.sub("", cleaned).strip(" ,")
+        if stripped == cleaned or not stripped:
+            return cleaned
+        cleaned = stripped
+
+
+def _compact(text):
+    return text.replace(" ", "").replace(",", "")
+
+
+def _trigrams(compact):
+    padded = f"  {compact} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _edit_distance(a, b, limit):
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        current = [i]
+        for j, cb in enumerate(b, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class Gazetteer:
+    def __init__(self, localities):
+        self.aliases = {}  # compact alias -> key
+        self.trigram_index = {}  # trigram -> set of compact aliases
+        for name, aliases in localities:
+            key = normalize_locality(name)
+            for alias in [name, *aliases]:
+                compact = _compact(normalize_locality(alias))
+                self.aliases[compact] = key
+                for gram in _trigrams(compact):
+                    self.trigram_index.setdefault(gram, set()).add(compact)
+
+    def fuzzy(self, compact):
+        grams = _trigrams(compact)
+        shared = Counter()
+        for gram in grams:
+            for alias in self.trigram_index.get(gram, ()):
+                shared[alias] += 1
+        best = None
+        for alias, common in shared.most_common(5):
+            if common / len(grams | _trigrams(alias)) < MIN_TRIGRAM_SIMILARITY:
+                continue
+            limit = max(1, len(alias) // CHARS_PER_EDIT)
+            distance = _edit_distance(compact, alias, limit)
+            if distance <= limit and (best is None or distance < best[0]):
+                best = (distance, alias)
+        return self.aliases[best[1]] if best else None
+
+    def lookup(self, cleaned):
+        compact = _compact(cleaned)
+        key = self.aliases.get(compact) or (self.fuzzy(compact) if len(compact) >= 4 else None)
+        if key:
+            return key
+        words = FILLER_RE.sub(" ", cleaned.replace(",", " ")).split()
+        for size in range(min(3, len(words)), 0, -1):
+            for start in range(len(words) - size + 1):
+                run = "".join(words[start:start + size])
+                if len(run) < 4:
+                    continue
+                key = self.aliases.get(run) or self.fuzzy(run)
+                if key:
+                    return key
+        return None
+
+
+def locality_key(gazetteer, text):
+    cleaned = normalize_locality(text)
+    key = gazetteer.lookup(cleaned) if cleaned else None
+    return key or cleaned[:LOCALITY_KEY_MAX_LENGTH].rstrip(" ,")
+
+
+# ======== RE-KEY ========
+def rekey_localities(apps, schema_editor):
+    Property = apps.get_model("whatsapp", "Property")
+    gazetteer = Gazetteer(LOCALITIES)
+    batch = []
+    for prop in Property.objects.only("id", "location", "locality").order_by("id").iterator(chunk_size=CHUNK_SIZE):
+        key = locality_key(gazetteer, prop.location)
+        if key != prop.locality:
+            prop.locality = key
+            batch.append(prop)
+        if len(batch) >= CHUNK_SIZE:
+            Property.objects.bulk_update(batch, ["locality"])
+            batch = []
+    if batch:
+        Property.objects.bulk_update(batch, ["locality"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('whatsapp', '0012_backfill_property_search_fields'),
+    ]
+
+    operations = [
+        migrations.RunPython(rekey_localities, migrations.RunPython.noop),
+    ]
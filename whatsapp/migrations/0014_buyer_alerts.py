@@ -0,0 +1,51 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('whatsapp', '0013_gazetteer_property_locality'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='alerts_pending',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+        migrations.CreateModel(
+            name='BuyerQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('property_kind', models.CharField(blank=True, default='', max_length=10)),
+                ('locality', models.CharField(blank=True, default='', max_length=100)),
+                ('bhk_count', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('price_cap', models.BigIntegerField(blank=True, null=True)),
+                ('is_open', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('lead', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='buyer_query', to='whatsapp.lead')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['is_open', 'property_kind', 'locality'], name='buyerquery_open_kind_loc_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PropertyAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('SENT', 'Sent'), ('SKIPPED', 'Skipped')], default='PENDING', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('buyer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='property_alerts', to='whatsapp.lead')),
+                ('property', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='whatsapp.property')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'id'], name='whatsapp_pr_status_002469_idx')],
+                'constraints': [models.UniqueConstraint(fields=('buyer', 'property'), name='unique_property_alert')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('whatsapp', '0014_buyer_alerts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SheetRow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phone', models.CharField(max_length=20, unique=True)),
+                ('row', models.PositiveIntegerField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='lead',
+            name='sheet_dirty_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('whatsapp', '0015_sheet_sync'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DriveFolder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('folder_id', models.CharField(max_length=128, unique=True)),
+                ('link', models.CharField(max_length=255)),
+                ('status', models.CharField(choices=[('READY', 'Ready'), ('CLAIMED', 'Claimed'), ('ASSIGNED', 'Assigned')], default='READY', max_length=10)),
+                ('name', models.CharField(blank=True, default='', max_length=255)),
+                ('pooled', models.BooleanField(default=True)),
+                ('claim_ms', models.FloatField(blank=True, null=True)),
+                ('rename_attempts', models.PositiveSmallIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('assigned_at', models.DateTimeField(blank=True, null=True)),
+                ('lead', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='drive_folders', to='whatsapp.lead')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'id'], name='whatsapp_dr_status_37cf6f_idx')],
+            },
+        ),
+    ]
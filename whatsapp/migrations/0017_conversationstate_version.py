@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('whatsapp', '0016_drive_folder_pool'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversationstate',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,40 @@
+from django.db import migrations, models
+
+# Postgres only: a GIN index for containment / key lookups over all of
+# `data`, and expression indexes matching the SQL Django emits for
+# KT("data__location") / KT("data__budget"). SQLite binds the JSON path as a
+# query parameter, so it could never use an index on the expression.
+POSTGRES_INDEXES = {
+    "lead_data_gin_idx": "USING gin (data jsonb_path_ops)",
+    "lead_data_location_idx": "((data ->> 'location'))",
+    "lead_data_budget_idx": "((data ->> 'budget'))",
+}
+
+
+def create_data_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, definition in POSTGRES_INDEXES.items():
+        schema_editor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON whatsapp_lead {definition}")
+
+
+def drop_data_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name in POSTGRES_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('whatsapp', '0017_conversationstate_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['segment'], name='lead_segment_idx'),
+        ),
+        migrations.RunPython(create_data_indexes, drop_data_indexes),
+    ]
@@ -0,0 +1,141 @@
+
+from django.db import migrations, models
+
+# The location and budget expression indexes from 0018 are superseded by
+# the indexed columns; the GIN index over `data` stays for the long tail
+REPLACED_POSTGRES_INDEXES = {
+    "lead_data_location_idx": "((data ->> 'location'))",
+    "lead_data_budget_idx": "((data ->> 'budget'))",
+}
+
+
+def drop_expression_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name in REPLACED_POSTGRES_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+def restore_expression_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, definition in REPLACED_POSTGRES_INDEXES.items():
+        schema_editor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON whatsapp_lead {definition}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('whatsapp', '0018_lead_data_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lead',
+            name='amenities',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='lead',
+            name='amenity_mask',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='lead',
+            name='area',
+            field=models.CharField(blank=True, max_length=50, null=True),
+        ),
+        migrations.AddField(
+            model_name='lead',
+            name='bhk',
+            field=models.CharField(blank=True, max_length=50, null=True),
+        ),
+        migrations.AddField(
+            model_name='lead',
+            name='bhk_count',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='lead',
+            name='budget',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='lead',
+            name='drive_link',
+            field=models.CharField(blank=True, max_length=500, null=True),
+        ),
+        migrations.AddField(
+            model_name='lead',
+            name='locality',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='lead',
+            name='location',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='lead',
+            name='max_price',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='lead',
+            name='max_sqft',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='lead',
+            name='min_price',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='lead',
+            name='min_sqft',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='lead',
+            name='property_kind',
+            field=models.CharField(blank=True, max_length=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='lead',
+            name='property_type',
+            field=models.CharField(blank=True, max_length=50, null=True),
+        ),
+        migrations.AddField(
+            model_name='lead',
+            name='selected_property_drive_link',
+            field=models.CharField(blank=True, max_length=500, null=True),
+        ),
+        migrations.AddField(
+            model_name='lead',
+            name='selected_property_location',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='lead',
+            name='selected_property_price',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='lead',
+            name='selected_property_type',
+            field=models.CharField(blank=True, max_length=50, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['lead_type', 'locality'], name='lead_type_locality_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['lead_type', 'min_price'], name='lead_type_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['lead_type', 'property_kind', 'bhk_count'], name='lead_type_kind_bhk_idx'),
+        ),
+        migrations.RunPython(drop_expression_indexes, restore_expression_indexes),
+    ]
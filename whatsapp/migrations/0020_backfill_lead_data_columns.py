@@ -0,0 +1,301 @@
+"""
+Backfill the Lead columns added in 0019 from `data`.
+
+The answer-key mapping, the parsers and the gazetteer lookup are frozen
+copies of whatsapp.parsing / whatsapp.gazetteer as they stood when the
+columns were added, so later changes to those modules never change what
+this migration writes. Rows saved afterwards are refreshed by
+Lead.refresh_data_fields with the live code.
+"""
+import re
+from collections import Counter
+
+from django.db import migrations, transaction
+
+CHUNK_SIZE = 1000
+
+# ======== ANSWER KEYS ========
+# Lead column -> lead.data keys it is read from
+LEAD_ANSWER_KEYS = {
+    "name": ("name",),
+    "property_type": ("property_type", "property_type_preference"),
+    "budget": ("budget", "price_range"),
+    "location": ("location", "location_preference"),
+    "area": ("area_sqft", "area_preference"),
+    "bhk": ("bhk",),
+    "amenities": ("amenities",),
+    "drive_link": ("drive_link",),
+    "selected_property_type": ("selected_property_type",),
+    "selected_property_location": ("selected_property_location",),
+    "selected_property_price": ("selected_property_price",),
+    "selected_property_drive_link": ("selected_property_drive_link",),
+}
+
+# ======== PARSERS ========
+PROPERTY_TYPES = {
+    "apartment": "Apartment", "apartments": "Apartment", "apt": "Apartment", "flat": "Apartment", "flats": "Apartment",
+    "house": "House", "independent house": "House", "individual house": "House", "villa": "House",
+    "plot": "Plot", "plots": "Plot", "open plot": "Plot", "land": "Plot",
+}
+NUMBER_WORDS = {"one": 1, "single": 1, "two": 2, "double": 2, "three": 3, "four": 4, "five": 5, "six": 6}
+BHK_RE = re.compile(
+    r"^(\d{1,2}|" + "|".join(NUMBER_WORDS) + r")\s*"
+    r"(?:bhk|b\.h\.k\.?|bed\s*rooms?|bedrooms?|beds?|br|rk)?$"
+)
+_NUM = r"(\d[\d,]*(?:\.\d+)?)"
+AREA_RE = re.compile(
+    r"^" + _NUM + r"\s*(?:sq\.?\s*ft\.?|sqft|sft|sq\.?\s*feet|square\s*feet|ft2)?\s*"
+    r"(?:(?:-|–|to)\s*" + _NUM + r"\s*(?:sq\.?\s*ft\.?|sqft|sft|sq\.?\s*feet|square\s*feet|ft2)?)?$"
+)
+MIN_SQFT, MAX_SQFT = 100, 100000
+LAKH, CRORE = 100_000, 10_000_000
+PRICE_UNITS = {
+    "l": LAKH, "lac": LAKH, "lacs": LAKH, "lakh": LAKH, "lakhs": LAKH, "lk": LAKH,
+    "cr": CRORE, "crs": CRORE, "crore": CRORE, "crores": CRORE,
+    "k": 1_000, "thousand": 1_000,
+}
+_UNIT = r"(" + "|".join(sorted(PRICE_UNITS, key=len, reverse=True)) + r")?"
+PRICE_RE = re.compile(r"^" + _NUM + r"\s*" + _UNIT + r"\s*(?:(?:-|–|to)\s*" + _NUM + r"\s*" + _UNIT + r")?$")
+MIN_PRICE, MAX_PRICE = LAKH, 1000 * CRORE
+AMENITIES = {
+    "pool": "Pool", "swimming pool": "Pool", "swimming": "Pool",
+    "gym": "Gym", "gymnasium": "Gym", "fitness center": "Gym",
+    "lift": "Lift", "lifts": "Lift", "elevator": "Lift",
+    "garden": "Garden", "park": "Garden",
+    "power backup": "Power Backup", "backup": "Power Backup", "generator": "Power Backup",
+    "parking": "Parking", "car parking": "Parking",
+    "security": "Security", "24x7 security": "Security",
+    "cctv": "CCTV",
+    "clubhouse": "Clubhouse", "club house": "Clubhouse",
+    "play area": "Play Area", "kids play area": "Play Area", "children play area": "Play Area",
+}
+AMENITY_SPLIT_RE = re.compile(r"\s*(?:,|/|&|\+|;|\band\b)\s*")
+AMENITY_BITS = {
+    name: 1 << i for i, name in enumerate(
+        ["Pool", "Gym", "Lift", "Garden", "Power Backup", "Parking", "Security", "CCTV", "Clubhouse", "Play Area"]
+    )
+}
+APPROX_RE = re.compile(r"^(?:around|approx\.?|approximately|about|roughly|~)\s*")
+
+
+def _clean(text):
+    return re.sub(r"\s+", " ", str(text or "").strip().lower()).rstrip(".")
+
+
+def _to_number(value):
+    return float(value.replace(",", ""))
+
+
+def parse_bhk(text):
+    match = BHK_RE.match(_clean(text))
+    if not match:
+        return None
+    count = NUMBER_WORDS.get(match.group(1)) or int(match.group(1))
+    return count if 1 <= count <= 10 else None
+
+
+def parse_area_range(text):
+    match = AREA_RE.match(APPROX_RE.sub("", _clean(text)))
+    if not match:
+        return None
+    low = _to_number(match.group(1))
+    high = _to_number(match.group(2)) if match.group(2) else low
+    low, high = int(min(low, high)), int(max(low, high))
+    if low < MIN_SQFT or high > MAX_SQFT:
+        return None
+    return low, high
+
+
+def parse_price_range(text):
+    cleaned = re.sub(r"^(?:rs\.?|inr|₹)\s*", "", APPROX_RE.sub("", _clean(text)))
+    cleaned = re.sub(r"\s*(?:rs\.?|inr|₹)\s*", " ", cleaned).strip()
+    match = PRICE_RE.match(cleaned)
+    if not match:
+        return None
+    low_num, low_unit, high_num, high_unit = match.groups()
+    if high_num is None:
+        high_num, high_unit = low_num, low_unit
+    low_unit = low_unit or high_unit
+    low = _to_number(low_num) * PRICE_UNITS.get(low_unit, 1)
+    high = _to_number(high_num) * PRICE_UNITS.get(high_unit, 1)
+    low, high = int(min(low, high)), int(max(low, high))
+    if low < MIN_PRICE or high > MAX_PRICE:
+        return None
+    return low, high
+
+
+def amenity_mask(text):
+    mask = 0
+    for part in AMENITY_SPLIT_RE.split(_clean(text)):
+        amenity = AMENITIES.get(part)
+        if amenity:
+            mask |= AMENITY_BITS[amenity]
+    return mask
+
+
+# ======== GAZETTEER ========
+# (canonical name, aliases); coordinates are not needed for keys
+LOCALITIES = [
+    ("Gachibowli", ["gachibouli"]), ("Hitech City", ["hi tech city", "hitec city", "hi-tec city", "cyberabad"]),
+    ("Madhapur", []), ("Kondapur", []), ("Financial District", ["financial dist", "fin district"]),
+    ("Nanakramguda", ["nanakram guda"]), ("Kokapet", []), ("Narsingi", []), ("Puppalaguda", []),
+    ("Manikonda", []), ("Gandipet", []), ("Tellapur", []), ("Kollur", []), ("Lingampally", ["lingampalli"]),
+    ("Serilingampally", ["serilingampalli"]), ("Chandanagar", ["chanda nagar"]), ("Miyapur", []),
+    ("Bachupally", ["bachupalli"]), ("Nizampet", []), ("Pragathi Nagar", []),
+    ("Kukatpally", ["kukatpalli", "kphb", "kphb colony"]), ("Moosapet", []), ("Patancheru", []),
+    ("Shankarpally", ["shankarpalli"]), ("Jubilee Hills", []), ("Banjara Hills", []),
+    ("Tolichowki", ["toli chowki"]), ("Mehdipatnam", []), ("Attapur", []), ("Rajendranagar", []),
+    ("Shamshabad", []), ("Somajiguda", []), ("Ameerpet", []), ("Begumpet", []), ("Himayatnagar", []),
+    ("Abids", []), ("Secunderabad", ["secbad"]), ("Bowenpally", ["bowenpalli"]), ("Kompally", ["kompalli"]),
+    ("Medchal", []), ("Alwal", []), ("Sainikpuri", []), ("Malkajgiri", []),
+    ("ECIL", ["ecil x roads", "a s rao nagar", "as rao nagar"]), ("Habsiguda", []), ("Uppal", []), ("Nagole", []),
+    ("Dilsukhnagar", ["dilsukh nagar", "dsnr"]), ("LB Nagar", ["l b nagar", "lal bahadur nagar"]),
+    ("Adibatla", []), ("Amberpet", []), ("Malakpet", []), ("Kothapet", []), ("Vanasthalipuram", []),
+    ("Balanagar", []), ("Shaikpet", []), ("Nallagandla", []), ("Bandlaguda Jagir", ["bandlaguda"]),
+]
+CITY_SUFFIX_RE = re.compile(r"[,\s]+(?:hyderabad|hyd|secunderabad|telangana|india)$")
+FILLER_RE = re.compile(r"\b(?:near|opp|opposite|beside|behind|area|road|rd|colony|main|x roads|cross roads)\b")
+MIN_TRIGRAM_SIMILARITY = 0.4
+CHARS_PER_EDIT = 4
+LOCALITY_KEY_MAX_LENGTH = 100
+
+
+def normalize_locality(text):
+    cleaned = re.sub(r"[^a-z0-9, ]+", " ", str(text or "").strip().lower())
+    cleaned = re.sub(r"\s+", " ", cleaned).strip(" ,")
+    while True:
+        stripped = CITY_SUFFIX_RE.sub("", cleaned).strip(" ,")
+        if stripped == cleaned or not stripped:
+            return cleaned
+        cleaned = stripped
+
+
+def _compact(text):
+    return text.replace(" ", "").replace(",", "")
+
+
+def _trigrams(compact):
+    padded = f"  {compact} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _edit_distance(a, b, limit):
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        current = [i]
+        for j, cb in enumerate(b, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class Gazetteer:
+    def __init__(self, localities):
+        self.aliases = {}  # compact alias -> key
+        self.trigram_index = {}  # trigram -> set of compact aliases
+        for name, aliases in localities:
+            key = normalize_locality(name)
+            for alias in [name, *aliases]:
+                compact = _compact(normalize_locality(alias))
+                self.aliases[compact] = key
+                for gram in _trigrams(compact):
+                    self.trigram_index.setdefault(gram, set()).add(compact)
+
+    def fuzzy(self, compact):
+        grams = _trigrams(compact)
+        shared = Counter()
+        for gram in grams:
+            for alias in self.trigram_index.get(gram, ()):
+                shared[alias] += 1
+        best = None
+        for alias, common in shared.most_common(5):
+            if common / len(grams | _trigrams(alias)) < MIN_TRIGRAM_SIMILARITY:
+                continue
+            limit = max(1, len(alias) // CHARS_PER_EDIT)
+            distance = _edit_distance(compact, alias, limit)
+            if distance <= limit and (best is None or distance < best[0]):
+                best = (distance, alias)
+        return self.aliases[best[1]] if best else None
+
+    def lookup(self, cleaned):
+        compact = _compact(cleaned)
+        key = self.aliases.get(compact) or (self.fuzzy(compact) if len(compact) >= 4 else None)
+        if key:
+            return key
+        words = FILLER_RE.sub(" ", cleaned.replace(",", " ")).split()
+        for size in range(min(3, len(words)), 0, -1):
+            for start in range(len(words) - size + 1):
+                run = "".join(words[start:start + size])
+                if len(run) < 4:
+                    continue
+                key = self.aliases.get(run) or self.fuzzy(run)
+                if key:
+                    return key
+        return None
+
+
+def locality_key(gazetteer, text):
+    cleaned = normalize_locality(text)
+    key = gazetteer.lookup(cleaned) if cleaned else None
+    return key or cleaned[:LOCALITY_KEY_MAX_LENGTH].rstrip(" ,")
+
+
+# ======== BACKFILL ========
+def lead_data_fields(gazetteer, data):
+    data = data or {}
+    answers = {}
+    for field, keys in LEAD_ANSWER_KEYS.items():
+        value = next((data[key] for key in keys if data.get(key) not in (None, "")), None)
+        answers[field] = None if value is None else str(value)
+    kind = PROPERTY_TYPES.get(_clean(answers["property_type"]))
+    area_range = parse_area_range(answers["area"]) or (None, None)
+    price_range = parse_price_range(answers["budget"]) or (None, None)
+    return {
+        **answers,
+        "property_kind": kind.upper() if kind else None,
+        "min_sqft": area_range[0],
+        "max_sqft": area_range[1],
+        "bhk_count": parse_bhk(answers["bhk"]),
+        "min_price": price_range[0],
+        "max_price": price_range[1],
+        "locality": locality_key(gazetteer, answers["location"]),
+        "amenity_mask": amenity_mask(answers["amenities"]),
+    }
+
+
+def backfill(apps, schema_editor):
+    Lead = apps.get_model("whatsapp", "Lead")
+    gazetteer = Gazetteer(LOCALITIES)
+    max_lengths = {field: Lead._meta.get_field(field).max_length for field in lead_data_fields(gazetteer, {})}
+    last_id = 0
+    # Keyset pages in id order, reading only `data`; each page commits on its own
+    # so a large table is never held in one transaction
+    while True:
+        chunk = list(Lead.objects.filter(id__gt=last_id).order_by("id").values_list("id", "data")[:CHUNK_SIZE])
+        if not chunk:
+            break
+        with transaction.atomic():
+            for lead_id, data in chunk:
+                fields = lead_data_fields(gazetteer, data)
+                for field, value in fields.items():
+                    if max_lengths[field] and value:
+                        fields[field] = value[:max_lengths[field]]
+                # bulk_update's per-row CASE expressions cost far more than one UPDATE per row
+                Lead.objects.filter(id=lead_id).update(**fields)
+        last_id = chunk[-1][0]
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('whatsapp', '0019_lead_data_columns'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations
+from django.db.models.functions import Length
+
+# gazetteer.LOCALITY_KEY_MAX_LENGTH when this migration was written
+MAX_LENGTH = 100
+
+
+def truncate(apps, schema_editor):
+    # SQLite stored over-long fallback keys; cut them the way locality_key now does
+    for model_name in ("Property", "BuyerQuery", "Lead"):
+        model = apps.get_model("whatsapp", model_name)
+        long_keys = model.objects.annotate(key_length=Length("locality")).filter(key_length__gt=MAX_LENGTH)
+        for pk, locality in long_keys.values_list("pk", "locality").iterator():
+            model.objects.filter(pk=pk).update(locality=locality[:MAX_LENGTH].rstrip(" ,"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('whatsapp', '0020_backfill_lead_data_columns'),
+    ]
+
+    operations = [
+        migrations.RunPython(truncate, migrations.RunPython.noop),
+    ]
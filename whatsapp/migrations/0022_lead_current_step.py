@@ -0,0 +1,46 @@
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def copy_steps_to_leads(apps, schema_editor):
+    Lead = apps.get_model("whatsapp", "Lead")
+    ConversationState = apps.get_model("whatsapp", "ConversationState")
+    states = ConversationState.objects.filter(phone=OuterRef("phone"))
+    Lead.objects.update(current_step=Coalesce(Subquery(states.values("current_step")[:1]), Value("INIT")))
+    # A state without a lead (older rows) keeps its step on a new lead
+    orphans = ConversationState.objects.exclude(phone__in=Lead.objects.values("phone"))
+    Lead.objects.bulk_create(
+        [Lead(phone=s.phone, current_step=s.current_step) for s in orphans.iterator()], batch_size=1000
+    )
+
+
+def copy_steps_to_states(apps, schema_editor):
+    Lead = apps.get_model("whatsapp", "Lead")
+    ConversationState = apps.get_model("whatsapp", "ConversationState")
+    ConversationState.objects.bulk_create(
+        [
+            ConversationState(phone=phone, current_step=step)
+            for phone, step in Lead.objects.values_list("phone", "current_step").iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('whatsapp', '0021_truncate_long_locality_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lead',
+            name='current_step',
+            field=models.CharField(default='INIT', max_length=50),
+        ),
+        migrations.RunPython(copy_steps_to_leads, copy_steps_to_states),
+        migrations.DeleteModel(
+            name='ConversationState',
+        ),
+    ]
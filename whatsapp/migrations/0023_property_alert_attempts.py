@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('whatsapp', '0022_lead_current_step'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='propertyalert',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='propertyalert',
+            name='last_error',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='propertyalert',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('SENT', 'Sent'), ('SKIPPED', 'Skipped'), ('FAILED', 'Failed')], default='PENDING', max_length=10),
+        ),
+    ]
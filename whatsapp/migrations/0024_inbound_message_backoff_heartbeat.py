@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('whatsapp', '0023_property_alert_attempts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inboundmessage',
+            name='available_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='inboundmessage',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('whatsapp', '0024_inbound_message_backoff_heartbeat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lead',
+            name='scored_by',
+            field=models.CharField(blank=True, choices=[('GPT', 'GPT'), ('LOCAL', 'Local')], default='', max_length=10),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('whatsapp', '0025_lead_scored_by'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lead',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -1,4 +1,13 @@
 from django.db import models
+from django.db.models import F
+from django.utils import timezone
+
+from .parsing import lead_data_fields, property_search_fields
+from .state_cache import conversation_state_cache
+
+# Lead columns kept in step with `data`
+LEAD_DATA_FIELDS = set(lead_data_fields({}))
+
 
 class Lead(models.Model):
     LEAD_TYPES = (
@@ -20,6 +29,11 @@ class Lead(models.Model):
         ("INACTIVE", "Inactive"),
     )
 
+    SCORER_CHOICES = (
+        ("GPT", "GPT"),
+        ("LOCAL", "Local"),
+    )
+
     phone = models.CharField(max_length=20, unique=True)
     name = models.CharField(max_length=100, null=True, blank=True)
     lead_type = models.CharField(max_length=10, choices=LEAD_TYPES, default="UNKNOWN")
@@ -30,23 +44,92 @@ class Lead(models.Model):
     score = models.IntegerField(null=True, blank=True)
     segment = models.CharField(max_length=10, choices=SEGMENT_CHOICES, default="INACTIVE")
     rejection_reason = models.TextField(null=True, blank=True)
+    score_pending = models.BooleanField(default=False, db_index=True)
+    scored_at = models.DateTimeField(null=True, blank=True)
+    scored_by = models.CharField(max_length=10, choices=SCORER_CHOICES, blank=True, default="")  # blank: unknown / not scored
+    sheet_dirty_at = models.DateTimeField(null=True, blank=True, db_index=True)  # changed since last Sheets sync
+    current_step = models.CharField(max_length=50, default="INIT")  # conversation step: INIT / BUY_Q1 / SELL_Q3 etc
+
+    # Copied from the answers in `data` on every save (see refresh_data_fields);
+    # `data` stays the source and keeps everything else
+    property_type = models.CharField(max_length=50, null=True, blank=True)
+    budget = models.CharField(max_length=100, null=True, blank=True)  # buyer budget or seller price range
+    location = models.CharField(max_length=255, null=True, blank=True)
+    area = models.CharField(max_length=50, null=True, blank=True)
+    bhk = models.CharField(max_length=50, null=True, blank=True)
+    amenities = models.TextField(null=True, blank=True)
+    drive_link = models.CharField(max_length=500, null=True, blank=True)
+    selected_property_type = models.CharField(max_length=50, null=True, blank=True)
+    selected_property_location = models.CharField(max_length=255, null=True, blank=True)
+    selected_property_price = models.CharField(max_length=100, null=True, blank=True)
+    selected_property_drive_link = models.CharField(max_length=500, null=True, blank=True)
+
+    # Parsed from the answers above, as for Property
+    property_kind = models.CharField(max_length=10, null=True, blank=True)
+    min_sqft = models.PositiveIntegerField(null=True, blank=True)
+    max_sqft = models.PositiveIntegerField(null=True, blank=True)
+    bhk_count = models.PositiveSmallIntegerField(null=True, blank=True)
+    min_price = models.BigIntegerField(null=True, blank=True)  # rupees
+    max_price = models.BigIntegerField(null=True, blank=True)  # rupees
+    locality = models.CharField(max_length=100, blank=True, default="")
+    amenity_mask = models.PositiveIntegerField(default=0)  # bits from parsing.AMENITY_BITS
+
+    # Bumped on every write, so a cached copy of the lead can tell it is stale
+    version = models.PositiveIntegerField(default=0)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
-    def __str__(self):
-        return f"{self.phone} ({self.lead_type})"
+    class Meta:
+        indexes = [
+            models.Index(fields=["segment"], name="lead_segment_idx"),
+            models.Index(fields=["lead_type", "locality"], name="lead_type_locality_idx"),
+            models.Index(fields=["lead_type", "min_price"], name="lead_type_price_idx"),
+            models.Index(fields=["lead_type", "property_kind", "bhk_count"], name="lead_type_kind_bhk_idx"),
+        ]
+        # On Postgres, migration 0018 also adds a GIN index over `data`
 
+    def refresh_data_fields(self):
+        for field, value in lead_data_fields(self.data).items():
+            max_length = self._meta.get_field(field).max_length
+            if max_length and value:
+                value = value[:max_length]  # free-text answers can outgrow the column
+            setattr(self, field, value)
 
-class ConversationState(models.Model):
-    phone = models.CharField(max_length=20, unique=True)
-    current_step = models.CharField(max_length=50, default="INIT")  # init / BUY_Q1 / SELL_Q3 etc
-    last_message = models.TextField(null=True, blank=True)
+    def save(self, *args, **kwargs):
+        self.refresh_data_fields()
+        self.version += 1
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "version"} | (LEAD_DATA_FIELDS if "data" in update_fields else set())
+        super().save(*args, **kwargs)
+        if conversation_state_cache.enabled:
+            conversation_state_cache.invalidate(self.phone)
 
-    updated_at = models.DateTimeField(auto_now=True)
+    def save_if_current(self, update_fields):
+        """
+        save(update_fields=...) as one UPDATE that only lands if the row is
+        still at the version this copy was read at. False (nothing written)
+        if another write got there first.
+        """
+        self.refresh_data_fields()
+        self.updated_at = timezone.now()
+        fields = {*update_fields, "updated_at"} | (LEAD_DATA_FIELDS if "data" in update_fields else set())
+        updated = Lead.objects.filter(pk=self.pk, version=self.version).update(
+            **{name: getattr(self, name) for name in fields}, version=F("version") + 1
+        )
+        if updated:
+            self.version += 1
+        return bool(updated)
 
     def __str__(self):
-        return f"{self.phone} -> {self.current_step}"
+        return f"{self.phone} ({self.lead_type})"
+
+
+# Property columns derived from the free-text answers, and the answers they come from
+PROPERTY_SEARCH_FIELDS = {"property_kind", "min_sqft", "max_sqft", "bhk_count", "min_price", "max_price", "locality", "amenity_mask"}
+PROPERTY_SOURCE_FIELDS = {"property_type", "area_sqft", "bhk", "location", "price_range", "amenities"}
+
 
 class Property(models.Model):
     SELLER = models.ForeignKey(Lead, on_delete=models.CASCADE, related_name="properties")
@@ -58,7 +141,233 @@ class Property(models.Model):
     price_range = models.CharField(max_length=100, null=True, blank=True)
     amenities = models.TextField(null=True, blank=True)
 
+    # Parsed from the free-text answers above on every save (see refresh_search_fields)
+    property_kind = models.CharField(max_length=10, null=True, blank=True)
+    min_sqft = models.PositiveIntegerField(null=True, blank=True)
+    max_sqft = models.PositiveIntegerField(null=True, blank=True)
+    bhk_count = models.PositiveSmallIntegerField(null=True, blank=True)
+    min_price = models.BigIntegerField(null=True, blank=True)  # rupees
+    max_price = models.BigIntegerField(null=True, blank=True)  # rupees
+    locality = models.CharField(max_length=100, blank=True, default="")
+    amenity_mask = models.PositiveIntegerField(default=0)  # bits from parsing.AMENITY_BITS
+    is_active = models.BooleanField(default=True)
+    alerts_pending = models.BooleanField(default=False, db_index=True)  # not yet matched against open buyers
+
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["property_kind", "locality", "bhk_count"], name="property_kind_loc_bhk_idx"),
+            models.Index(fields=["property_kind", "locality", "min_price"], name="property_kind_loc_price_idx"),
+            models.Index(fields=["property_kind", "min_price"], name="property_kind_price_idx"),
+            models.Index(fields=["locality", "min_price"], name="property_loc_price_idx"),
+        ]
+
+    def refresh_search_fields(self):
+        for field, value in property_search_fields(
+            self.property_type, self.area_sqft, self.bhk, self.location, self.price_range, self.amenities
+        ).items():
+            setattr(self, field, value)
+
+    def save(self, *args, **kwargs):
+        self.refresh_search_fields()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and PROPERTY_SOURCE_FIELDS & set(update_fields):
+            kwargs["update_fields"] = set(update_fields) | PROPERTY_SEARCH_FIELDS
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.property_type} - {self.bhk} - {self.location}"
+
+
+
+class InboundMessage(models.Model):
+    """Webhook message waiting to be run through the state machine by a worker."""
+
+    STATUS_CHOICES = (
+        ("PENDING", "Pending"),
+        ("PROCESSING", "Processing"),
+        ("DONE", "Done"),
+        ("FAILED", "Failed"),
+    )
+
+    phone = models.CharField(max_length=20)
+    text = models.TextField()
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default="PENDING")
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(null=True, blank=True)
+
+    received_at = models.DateTimeField(auto_now_add=True)
+    available_at = models.DateTimeField(null=True, blank=True)  # not claimed before this (retry backoff)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)  # refreshed by the worker while PROCESSING
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "id"]),
+            models.Index(fields=["phone", "status"]),
+        ]
+
+    def __str__(self):
+        return f"{self.phone} [{self.status}] {self.text[:30]}"
+
+
+class ProcessedMessage(models.Model):
+    """WhatsApp message ids already accepted, so webhook retries are not processed twice."""
+
+    message_id = models.CharField(max_length=128, unique=True)
+    phone = models.CharField(max_length=20, blank=True, default="")
+    processed_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.message_id} ({self.phone})"
+
+
+class OutboundMessage(models.Model):
+    """WhatsApp message waiting to be sent (or already sent) by the outbox dispatcher."""
+
+    STATUS_CHOICES = (
+        ("PENDING", "Pending"),
+        ("SENT", "Sent"),
+        ("DELIVERED", "Delivered"),
+        ("READ", "Read"),
+        ("FAILED", "Failed"),
+    )
+
+    phone = models.CharField(max_length=20)
+    payload = models.JSONField()
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default="PENDING")
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(null=True, blank=True)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    wa_message_id = models.CharField(max_length=128, null=True, blank=True, db_index=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+    read_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "id"]),
+            models.Index(fields=["phone", "status"]),
+        ]
+
+    def __str__(self):
+        return f"→ {self.phone} [{self.status}]"
+
+
+class LLMCacheEntry(models.Model):
+    """Memoized LLM result keyed by (function, question, normalized input, prompt version)."""
+
+    key = models.CharField(max_length=64, unique=True)
+    function = models.CharField(max_length=50)
+    prompt_version = models.CharField(max_length=16)
+    value = models.JSONField()
+    tokens = models.PositiveIntegerField(default=0)
+    hits = models.PositiveIntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(db_index=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.function}@{self.prompt_version} ({self.hits} hits)"
+
+
+class BuyerQuery(models.Model):
+    """A buyer's search, kept open so listings added later can be matched against it."""
+
+    lead = models.OneToOneField(Lead, on_delete=models.CASCADE, related_name="buyer_query")
+    # Empty / null means "any"
+    property_kind = models.CharField(max_length=10, blank=True, default="")
+    locality = models.CharField(max_length=100, blank=True, default="")
+    bhk_count = models.PositiveSmallIntegerField(null=True, blank=True)
+    price_cap = models.BigIntegerField(null=True, blank=True)  # rupees, budget incl. stretch
+    is_open = models.BooleanField(default=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["is_open", "property_kind", "locality"], name="buyerquery_open_kind_loc_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.lead.phone}: {self.property_kind or 'any'} in {self.locality or 'any'}"
+
+
+class PropertyAlert(models.Model):
+    """A new listing matched to an open buyer query; sent at most once per (buyer, property)."""
+
+    STATUS_CHOICES = (
+        ("PENDING", "Pending"),
+        ("SENT", "Sent"),
+        ("SKIPPED", "Skipped"),
+        ("FAILED", "Failed"),
+    )
+
+    buyer = models.ForeignKey(Lead, on_delete=models.CASCADE, related_name="property_alerts")
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name="alerts")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="PENDING")
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["buyer", "property"], name="unique_property_alert"),
+        ]
+        indexes = [
+            models.Index(fields=["status", "id"]),
+        ]
+
+    def __str__(self):
+        return f"{self.property_id} -> {self.buyer_id} [{self.status}]"
+
+
+class SheetRow(models.Model):
+    """Which Google Sheets row holds each phone's lead, so syncs never scan the sheet."""
+
+    phone = models.CharField(max_length=20, unique=True)
+    row = models.PositiveIntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.phone} -> row {self.row}"
+
+
+class DriveFolder(models.Model):
+    """A shared Drive upload folder, created ahead of time and handed to a seller on completion."""
+
+    STATUS_CHOICES = (
+        ("READY", "Ready"),  # in the pool, not given out yet
+        ("CLAIMED", "Claimed"),  # given to a seller, still has its placeholder name
+        ("ASSIGNED", "Assigned"),  # named after its seller
+    )
+
+    folder_id = models.CharField(max_length=128, unique=True)
+    link = models.CharField(max_length=255)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="READY")
+    lead = models.ForeignKey(Lead, on_delete=models.SET_NULL, null=True, blank=True, related_name="drive_folders")
+    name = models.CharField(max_length=255, blank=True, default="")
+    # False when the pool was empty and the folder was created while the seller waited
+    pooled = models.BooleanField(default=True)
+    claim_ms = models.FloatField(null=True, blank=True)
+    rename_attempts = models.PositiveSmallIntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    assigned_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "id"]),
+        ]
+
+    def __str__(self):
+        return f"{self.folder_id} [{self.status}]"
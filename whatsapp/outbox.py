@@ -0,0 +1,165 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import OutboundMessage
+
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 2
+
+# Statuses only move forward: a late "delivered" must not overwrite "read"
+STATUS_RANK = {"PENDING": 0, "SENT": 1, "DELIVERED": 2, "READ": 3, "FAILED": 4}
+
+
+def outbound_mode():
+    return getattr(settings, "WHATSAPP_OUTBOUND_MODE", "direct")
+
+
+# ======== ENQUEUE ========
+def enqueue_outbound(phone, payload):
+    return OutboundMessage.objects.create(phone=phone, payload=payload)
+
+
+# ======== RATE LIMIT ========
+class TokenBucket:
+    """Blocking token bucket: `rate` sends per second with bursts up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+# ======== DISPATCH ========
+def _deliver(message):
+    """
+    Send one message. Only failures where WhatsApp certainly didn't take it
+    (connect errors, 429) are retried; after a read error or any other
+    status it may have gone out, so the message is FAILED rather than resent.
+    """
+    from .utils import RETRY_STATUSES, is_connect_error, post_message
+
+    now = timezone.now()
+    try:
+        response = post_message(message.payload)
+        if response.ok:
+            message.status = "SENT"
+            message.sent_at = now
+            message.last_error = None
+            message.wa_message_id = (response.json().get("messages") or [{}])[0].get("id")
+            return True
+        error = f"HTTP {response.status_code}: {response.text[:500]}"
+        retry = response.status_code in RETRY_STATUSES
+    except Exception as e:
+        error = str(e)
+        retry = is_connect_error(e)
+
+    message.attempts += 1
+    message.last_error = error
+    if not retry or message.attempts >= MAX_ATTEMPTS:
+        message.status = "FAILED"
+    else:
+        message.next_attempt_at = now + timedelta(seconds=RETRY_BASE_SECONDS * 2 ** message.attempts)
+    print(f"❌ Outbox send to {message.phone} failed (attempt {message.attempts}{'' if retry else ', not retried'}): {error}")
+    return False
+
+
+def dispatch_pending(bucket, limit=200):
+    """
+    Send one pass of pending messages in id order under the rate limit.
+
+    A recipient whose earlier message is still waiting for a retry is skipped
+    for the rest of the pass, so per-recipient order is never broken. Run a
+    single dispatcher process to keep that guarantee.
+    """
+    now = timezone.now()
+    blocked_phones = set()
+    sent = 0
+
+    for message in OutboundMessage.objects.filter(status="PENDING").order_by("id")[:limit]:
+        if message.phone in blocked_phones:
+            continue
+        if message.next_attempt_at and message.next_attempt_at > now:
+            blocked_phones.add(message.phone)
+            continue
+
+        bucket.acquire()
+        if _deliver(message):
+            sent += 1
+        else:
+            blocked_phones.add(message.phone)
+        message.save(update_fields=["status", "attempts", "last_error", "next_attempt_at", "wa_message_id", "sent_at"])
+
+    return sent
+
+
+def run_dispatcher(rate=None, burst=None, poll_interval=0.5, stop_event=None):
+    rate = rate or getattr(settings, "WHATSAPP_SEND_RATE_PER_SECOND", 20)
+    burst = burst or getattr(settings, "WHATSAPP_SEND_BURST", 40)
+    bucket = TokenBucket(rate, burst)
+    stop_event = stop_event or threading.Event()
+
+    print(f"🚀 Outbox dispatcher started ({rate}/s, burst {burst})")
+    while not stop_event.is_set():
+        sent = dispatch_pending(bucket)
+        close_old_connections()
+        if not sent:
+            stop_event.wait(poll_interval)
+    print("🛑 Outbox dispatcher stopped")
+
+
+# ======== DELIVERY TRACKING ========
+def _status_time(status):
+    """When WhatsApp says the status happened; now if the timestamp is missing or malformed."""
+    try:
+        return datetime.fromtimestamp(int(status.get("timestamp")), tz=dt_timezone.utc)
+    except (TypeError, ValueError, OverflowError, OSError):
+        if status.get("timestamp"):
+            print(f"⚠️ Bad timestamp {status.get('timestamp')!r} on status for {status.get('id')}")
+        return timezone.now()
+
+
+def record_statuses(statuses):
+    """Apply webhook `statuses` callbacks (sent / delivered / read / failed) to outbox rows."""
+    by_id = {s.get("id"): s for s in statuses if s.get("id")}
+    if not by_id:
+        return 0
+
+    changed = []
+    for message in OutboundMessage.objects.filter(wa_message_id__in=by_id.keys()):
+        status = by_id[message.wa_message_id]
+        new_status = (status.get("status") or "").upper()
+        if new_status not in STATUS_RANK or STATUS_RANK[new_status] <= STATUS_RANK[message.status]:
+            continue
+
+        at = _status_time(status)
+        message.status = new_status
+        if new_status == "DELIVERED":
+            message.delivered_at = at
+        elif new_status == "READ":
+            message.read_at = at
+            message.delivered_at = message.delivered_at or at
+        elif new_status == "FAILED":
+            message.last_error = str(status.get("errors") or "")
+        changed.append(message)
+
+    OutboundMessage.objects.bulk_update(changed, ["status", "delivered_at", "read_at", "last_error"])
+    return len(changed)
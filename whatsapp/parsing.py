@@ -0,0 +1,275 @@
+"""
+Deterministic parsers for the questionnaire answers.
+
+Everything here is plain Python with no I/O, so it is cheap enough to run on
+every message and safe to import from models.
+"""
+import re
+
+from whatsapp.gazetteer import locality_key
+
+# ======== PROPERTY TYPE ========
+PROPERTY_TYPES = {
+    "apartment": "Apartment",
+    "apartments": "Apartment",
+    "apt": "Apartment",
+    "flat": "Apartment",
+    "flats": "Apartment",
+    "house": "House",
+    "independent house": "House",
+    "individual house": "House",
+    "villa": "House",
+    "plot": "Plot",
+    "plots": "Plot",
+    "open plot": "Plot",
+    "land": "Plot",
+}
+
+
+def parse_property_type(text):
+    return PROPERTY_TYPES.get(_clean(text))
+
+
+# ======== BHK ========
+NUMBER_WORDS = {"one": 1, "single": 1, "two": 2, "double": 2, "three": 3, "four": 4, "five": 5, "six": 6}
+
+BHK_RE = re.compile(
+    r"^(\d{1,2}|" + "|".join(NUMBER_WORDS) + r")\s*"
+    r"(?:bhk|b\.h\.k\.?|bed\s*rooms?|bedrooms?|beds?|br|rk)?$"
+)
+
+
+def parse_bhk(text):
+    """'2bhk', '2 BHK', 'two bedrooms', '2' -> 2"""
+    match = BHK_RE.match(_clean(text))
+    if not match:
+        return None
+    value = match.group(1)
+    count = NUMBER_WORDS.get(value) or int(value)
+    return count if 1 <= count <= 10 else None
+
+
+def format_bhk(count):
+    return f"{count} BHK"
+
+
+# ======== AREA ========
+_NUM = r"(\d[\d,]*(?:\.\d+)?)"
+AREA_RE = re.compile(
+    r"^" + _NUM + r"\s*(?:sq\.?\s*ft\.?|sqft|sft|sq\.?\s*feet|square\s*feet|ft2)?\s*"
+    r"(?:(?:-|–|to)\s*" + _NUM + r"\s*(?:sq\.?\s*ft\.?|sqft|sft|sq\.?\s*feet|square\s*feet|ft2)?)?$"
+)
+MIN_SQFT = 100
+MAX_SQFT = 100000
+
+
+def parse_area_range(text):
+    """'1200 sqft' -> (1200, 1200); '1000-1500 sq.ft' -> (1000, 1500)"""
+    match = AREA_RE.match(_strip_qualifiers(_clean(text)))
+    if not match:
+        return None
+    low = _to_number(match.group(1))
+    high = _to_number(match.group(2)) if match.group(2) else low
+    low, high = int(min(low, high)), int(max(low, high))
+    if low < MIN_SQFT or high > MAX_SQFT:
+        return None
+    return low, high
+
+
+def format_area(area_range):
+    low, high = area_range
+    return str(low) if low == high else f"{low}-{high}"
+
+
+# ======== PRICE (Indian notation) ========
+LAKH = 100_000
+CRORE = 10_000_000
+PRICE_UNITS = {
+    "l": LAKH, "lac": LAKH, "lacs": LAKH, "lakh": LAKH, "lakhs": LAKH, "lk": LAKH,
+    "cr": CRORE, "crs": CRORE, "crore": CRORE, "crores": CRORE,
+    "k": 1_000, "thousand": 1_000,
+}
+_UNIT = r"(" + "|".join(sorted(PRICE_UNITS, key=len, reverse=True)) + r")?"
+PRICE_RE = re.compile(
+    r"^" + _NUM + r"\s*" + _UNIT + r"\s*(?:(?:-|–|to)\s*" + _NUM + r"\s*" + _UNIT + r")?$"
+)
+MIN_PRICE = LAKH
+MAX_PRICE = 1000 * CRORE
+
+
+def parse_price_range(text):
+    """
+    Rupee range from Indian price notation.
+
+    '50 lakhs' -> (5000000, 5000000); '50-60L' -> (5000000, 6000000);
+    '80 lakh to 1.2 cr' -> (8000000, 12000000). A unit given only on the
+    upper bound applies to both ('50-60 lakhs').
+    """
+    cleaned = re.sub(r"^(?:rs\.?|inr|₹)\s*", "", _strip_qualifiers(_clean(text)))
+    cleaned = re.sub(r"\s*(?:rs\.?|inr|₹)\s*", " ", cleaned).strip()
+    match = PRICE_RE.match(cleaned)
+    if not match:
+        return None
+
+    low_num, low_unit, high_num, high_unit = match.groups()
+    if high_num is None:
+        high_num, high_unit = low_num, low_unit
+    low_unit = low_unit or high_unit
+
+    low = _to_number(low_num) * PRICE_UNITS.get(low_unit, 1)
+    high = _to_number(high_num) * PRICE_UNITS.get(high_unit, 1)
+    low, high = int(min(low, high)), int(max(low, high))
+    if low < MIN_PRICE or high > MAX_PRICE:
+        return None
+    return low, high
+
+
+def _format_rupees(amount):
+    if amount >= CRORE:
+        return f"{amount / CRORE:g}Cr"
+    return f"{amount / LAKH:g}L"
+
+
+def format_price(price_range):
+    """(5000000, 7500000) -> '50-75L'; (8000000, 12000000) -> '80L-1.2Cr'"""
+    low, high = price_range
+    if low == high:
+        return _format_rupees(low)
+    if high < CRORE:
+        return f"{low / LAKH:g}-{high / LAKH:g}L"
+    if low >= CRORE:
+        return f"{low / CRORE:g}-{high / CRORE:g}Cr"
+    return f"{_format_rupees(low)}-{_format_rupees(high)}"
+
+
+# ======== AMENITIES ========
+AMENITIES = {
+    "pool": "Pool",
+    "swimming pool": "Pool",
+    "swimming": "Pool",
+    "gym": "Gym",
+    "gymnasium": "Gym",
+    "fitness center": "Gym",
+    "lift": "Lift",
+    "lifts": "Lift",
+    "elevator": "Lift",
+    "garden": "Garden",
+    "park": "Garden",
+    "power backup": "Power Backup",
+    "backup": "Power Backup",
+    "generator": "Power Backup",
+    "parking": "Parking",
+    "car parking": "Parking",
+    "security": "Security",
+    "24x7 security": "Security",
+    "cctv": "CCTV",
+    "clubhouse": "Clubhouse",
+    "club house": "Clubhouse",
+    "play area": "Play Area",
+    "kids play area": "Play Area",
+    "children play area": "Play Area",
+}
+AMENITY_SPLIT_RE = re.compile(r"\s*(?:,|/|&|\+|;|\band\b)\s*")
+
+
+def parse_amenities(text):
+    """'pool, gym & lift' -> ['Pool', 'Gym', 'Lift']; None if any part is unknown."""
+    parts = [p for p in AMENITY_SPLIT_RE.split(_clean(text)) if p]
+    if not parts:
+        return None
+    found = []
+    for part in parts:
+        amenity = AMENITIES.get(part)
+        if amenity is None:
+            return None
+        if amenity not in found:
+            found.append(amenity)
+    return found
+
+
+def format_amenities(amenities):
+    return ", ".join(amenities)
+
+
+# ======== HELPERS ========
+def _clean(text):
+    return re.sub(r"\s+", " ", str(text or "").strip().lower()).rstrip(".")
+
+
+APPROX_RE = re.compile(r"^(?:around|approx\.?|approximately|about|roughly|~)\s*")
+
+
+def _strip_qualifiers(text):
+    return APPROX_RE.sub("", text)
+
+
+def _to_number(value):
+    return float(value.replace(",", ""))
+
+
+# ======== AMENITY BITSET ========
+# Bit positions are persisted in Property.amenity_mask: append new amenities, never reorder
+AMENITY_ORDER = ["Pool", "Gym", "Lift", "Garden", "Power Backup", "Parking", "Security", "CCTV", "Clubhouse", "Play Area"]
+AMENITY_BITS = {name: 1 << i for i, name in enumerate(AMENITY_ORDER)}
+
+
+def amenity_mask(text):
+    """Bitmask of every known amenity mentioned in `text`; unknown parts are ignored."""
+    mask = 0
+    for part in AMENITY_SPLIT_RE.split(_clean(text)):
+        amenity = AMENITIES.get(part)
+        if amenity:
+            mask |= AMENITY_BITS[amenity]
+    return mask
+
+
+# ======== LISTING SEARCH FIELDS ========
+def property_search_fields(property_type, area, bhk, location, price, amenities):
+    """Typed, indexable columns parsed from a listing's free-text answers."""
+    kind = parse_property_type(property_type)
+    area_range = parse_area_range(area) or (None, None)
+    price_range = parse_price_range(price) or (None, None)
+    return {
+        "property_kind": kind.upper() if kind else None,
+        "min_sqft": area_range[0],
+        "max_sqft": area_range[1],
+        "bhk_count": parse_bhk(bhk),
+        "min_price": price_range[0],
+        "max_price": price_range[1],
+        "locality": locality_key(location),
+        "amenity_mask": amenity_mask(amenities),
+    }
+
+
+# ======== LEAD COLUMNS ========
+# Lead column -> lead.data keys it is read from; buyers and sellers store the same answer under different keys
+LEAD_ANSWER_KEYS = {
+    "name": ("name",),
+    "property_type": ("property_type", "property_type_preference"),
+    "budget": ("budget", "price_range"),
+    "location": ("location", "location_preference"),
+    "area": ("area_sqft", "area_preference"),
+    "bhk": ("bhk",),
+    "amenities": ("amenities",),
+    "drive_link": ("drive_link",),
+    "selected_property_type": ("selected_property_type",),
+    "selected_property_location": ("selected_property_location",),
+    "selected_property_price": ("selected_property_price",),
+    "selected_property_drive_link": ("selected_property_drive_link",),
+}
+
+
+def lead_data_fields(data):
+    """Typed lead columns promoted from the answers in lead.data, plus the search fields parsed from them."""
+    data = data or {}
+    answers = {}
+    for field, keys in LEAD_ANSWER_KEYS.items():
+        value = next((data[key] for key in keys if data.get(key) not in (None, "")), None)
+        answers[field] = None if value is None else str(value)
+    return {
+        **answers,
+        **property_search_fields(
+            answers["property_type"], answers["area"], answers["bhk"],
+            answers["location"], answers["budget"], answers["amenities"],
+        ),
+    }
@@ -0,0 +1,137 @@
+"""
+Runs a handful of side effects as a dependency graph.
+
+Each stage names the stages it needs and is called with their results as
+keyword arguments. A stage starts on a shared, bounded thread pool as soon
+as its dependencies finish, so the caller waits for the longest chain
+rather than the sum of all stages. With no workers configured the stages
+run one after another in the calling thread, in the order they were added.
+"""
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import close_old_connections
+
+Stage = namedtuple("Stage", ["name", "fn", "after"])
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def pipeline_workers():
+    return getattr(settings, "PIPELINE_WORKERS", 0)
+
+
+def get_executor():
+    """Pool shared by every pipeline in the process, so concurrent conversations stay bounded."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=pipeline_workers(), thread_name_prefix="pipeline")
+        return _executor
+
+
+class PipelineError(Exception):
+    def __init__(self, pipeline, errors):
+        self.errors = errors
+        super().__init__(f"{pipeline}: " + ", ".join(f"{name} failed ({e})" for name, e in errors.items()))
+
+
+class PipelineResult:
+    def __init__(self, name):
+        self.name = name
+        self.results = {}
+        self.timings = {}  # stage -> ms
+        self.errors = {}  # stage -> exception
+        self.skipped = []
+        self.total_ms = 0.0
+
+    def __getitem__(self, stage):
+        return self.results[stage]
+
+    def summary(self):
+        parts = [f"{stage} {ms:.0f} ms" for stage, ms in self.timings.items()]
+        parts += [f"{stage} skipped" for stage in self.skipped]
+        return f"{self.name} {self.total_ms:.0f} ms: " + ", ".join(parts)
+
+    def raise_for_errors(self):
+        if self.errors:
+            raise PipelineError(self.name, self.errors)
+
+
+class Pipeline:
+    def __init__(self, name):
+        self.name = name
+        self.stages = {}
+
+    def stage(self, name, fn, after=()):
+        missing = [dep for dep in after if dep not in self.stages]
+        if missing:
+            # Dependencies must be added first, which also rules out cycles
+            raise ValueError(f"Stage {name} depends on unknown stage(s) {missing}")
+        self.stages[name] = Stage(name, fn, tuple(after))
+        return self
+
+    def _call(self, stage, result, in_pool):
+        start = time.perf_counter()
+        try:
+            return stage.fn(**{dep: result.results[dep] for dep in stage.after})
+        finally:
+            result.timings[stage.name] = (time.perf_counter() - start) * 1000
+            if in_pool:
+                close_old_connections()
+
+    def _ready(self, stage, result):
+        return all(dep in result.results for dep in stage.after)
+
+    def _blocked(self, stage, result):
+        return any(dep in result.errors or dep in result.skipped for dep in stage.after)
+
+    def run(self):
+        """Run every stage; a failed stage skips its dependents. Returns a PipelineResult."""
+        result = PipelineResult(self.name)
+        start = time.perf_counter()
+        if pipeline_workers() > 0:
+            self._run_concurrent(result)
+        else:
+            self._run_serial(result)
+        result.total_ms = (time.perf_counter() - start) * 1000
+        for name, e in result.errors.items():
+            print(f"❌ {self.name}: stage {name} failed: {e}")
+        print(f"⏱️ {result.summary()}")
+        return result
+
+    def _run_serial(self, result):
+        for stage in self.stages.values():
+            if self._blocked(stage, result):
+                result.skipped.append(stage.name)
+                continue
+            try:
+                result.results[stage.name] = self._call(stage, result, in_pool=False)
+            except Exception as e:
+                result.errors[stage.name] = e
+
+    def _run_concurrent(self, result):
+        executor = get_executor()
+        pending = dict(self.stages)
+        running = {}
+        while pending or running:
+            for name, stage in list(pending.items()):
+                if self._blocked(stage, result):
+                    result.skipped.append(name)
+                    del pending[name]
+                elif self._ready(stage, result):
+                    running[executor.submit(self._call, stage, result, True)] = name
+                    del pending[name]
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    result.results[name] = future.result()
+                except Exception as e:
+                    result.errors[name] = e
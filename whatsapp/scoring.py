@@ -0,0 +1,97 @@
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Lead
+from .state_cache import conversation_state_cache
+
+QUALIFIED_SEGMENTS = ["PREMIUM", "ACTIVE"]
+# Columns apply_score sets
+SCORE_FIELDS = ["score", "segment", "rejection_reason", "status", "score_pending", "scored_at", "scored_by", "updated_at"]
+
+
+def scoring_mode():
+    return getattr(settings, "LEAD_SCORING_MODE", "inline")
+
+
+def apply_score(lead, score, segment, reason, scored_by):
+    lead.score = score
+    lead.segment = segment
+    lead.rejection_reason = reason if segment == "INACTIVE" else ""
+    lead.status = "QUALIFIED" if segment in QUALIFIED_SEGMENTS else "UNQUALIFIED"
+    lead.score_pending = False
+    lead.scored_at = timezone.now()
+    lead.scored_by = scored_by
+
+
+def request_scoring(lead):
+    """Mark a completed lead for the background scorer (caller saves the lead)."""
+    lead.score_pending = True
+
+
+# ======== BATCH SCORER ========
+def score_pending_leads(batch_size=None):
+    """
+    Score one batch of pending leads (GPT-scored leads share a single model request).
+
+    Each score is written back only if the lead hasn't been saved since it
+    was read, so a scoring pass never overwrites a newer answer or pending
+    mark. The scored leads are pushed to Sheets in one sync (or marked
+    dirty for run_sheet_sync). Returns the number of leads scored.
+    """
+    from whatsapp.ai.scorer import score_lead, score_leads
+    from whatsapp.sheets import queue_sheet_sync
+
+    batch_size = batch_size or getattr(settings, "LEAD_SCORING_BATCH_SIZE", 10)
+    leads = list(Lead.objects.filter(score_pending=True).order_by("updated_at")[:batch_size])
+    if not leads:
+        return 0
+
+    try:
+        results = score_leads(leads)
+    except Exception as e:
+        # Model unavailable: keep the batch pending for the next pass
+        print(f"❌ GPT Batch Scoring Error: {e}")
+        return 0
+
+    scored = []
+    for lead in leads:
+        result = results.get(lead.id)
+        if result is None:
+            # A lead the model skipped in the batch answer is scored on its own
+            try:
+                result = score_lead(lead)
+            except Exception as e:
+                print(f"❌ Lead {lead.id} not scored, kept pending: {e}")
+                continue
+        apply_score(lead, *result)
+        lead.updated_at = timezone.now()
+        # Only lands on the row as it was scored (every Lead.save bumps the
+        # version); a lead changed meanwhile keeps its answers and its pending mark
+        if Lead.objects.filter(pk=lead.pk, version=lead.version).update(
+            version=F("version") + 1, **{field: getattr(lead, field) for field in SCORE_FIELDS}
+        ):
+            if conversation_state_cache.enabled:
+                conversation_state_cache.invalidate(lead.phone)
+            scored.append(lead)
+        else:
+            print(f"⏭️ Lead {lead.id} changed while being scored, left for the next pass")
+
+    if scored:
+        queue_sheet_sync(scored)
+    print(f"🧮 Scored {len(scored)}/{len(leads)} pending lead(s)")
+    return len(scored)
+
+
+def run_scorer(batch_size=None, poll_interval=5.0, stop_event=None):
+    stop_event = stop_event or threading.Event()
+    print("🚀 Lead scorer started")
+    while not stop_event.is_set():
+        scored = score_pending_leads(batch_size)
+        close_old_connections()
+        if not scored:
+            stop_event.wait(poll_interval)
+    print("🛑 Lead scorer stopped")
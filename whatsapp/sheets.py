@@ -1,24 +1,53 @@
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
 from datetime import datetime
 import os
+import re
+import threading
+import time
 from dotenv import load_dotenv
 
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from gspread.utils import rowcol_to_a1
+
+from .google_clients import google_clients
+from .models import Lead, SheetRow
+
 # Load environment variables
 load_dotenv()
 
-# Path to google JSON - use environment variable or default
-GOOGLE_CREDENTIALS_FILE = os.getenv('GOOGLE_CREDENTIALS_FILE', 'google_credentials.json')
-GOOGLE_AUTH_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), GOOGLE_CREDENTIALS_FILE)
-
 # ======== CONNECTION ========
+# Opening the spreadsheet costs several API calls, so the worksheet is
+# cached per process. Tokens are kept fresh by google_clients; the
+# worksheet is still re-opened now and then to pick up a renamed tab.
+CLIENT_MAX_AGE_SECONDS = 45 * 60
+_client_lock = threading.Lock()
+_worksheets = {}  # sheet name -> (worksheet, opened_at)
+
+
 def connect_sheet(sheet_name=None):
     if sheet_name is None:
         sheet_name = os.getenv('GOOGLE_SHEETS_NAME', 'Dheeraj Leads Database')
-    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-    creds = ServiceAccountCredentials.from_json_keyfile_name(GOOGLE_AUTH_FILE, scope)
-    client = gspread.authorize(creds)
-    return client.open(sheet_name)
+    return google_clients.gspread_client().open(sheet_name)
+
+
+def get_worksheet(sheet_name=None):
+    """First tab of the leads spreadsheet, authorized once per process and with headers checked once."""
+    with _client_lock:
+        cached = _worksheets.get(sheet_name)
+        if cached and time.monotonic() - cached[1] < CLIENT_MAX_AGE_SECONDS:
+            return cached[0]
+        sheet = connect_sheet(sheet_name).sheet1
+        if cached is None:
+            setup_headers(sheet)
+        _worksheets[sheet_name] = (sheet, time.monotonic())
+        return sheet
+
+
+def reset_worksheet():
+    """Drop the cached worksheet (e.g. after an auth error) so the next call re-authorizes."""
+    with _client_lock:
+        _worksheets.clear()
 
 
 # ======== SETUP HEADERS ========
@@ -50,6 +79,7 @@ def setup_headers(sheet):
             ]
             # Insert headers at the top (this will shift existing rows down)
             sheet.insert_row(headers, 1)
+            reconcile_row_index(sheet)
             # Format header row (make it bold)
             try:
                 sheet.format("A1:R1", {"textFormat": {"bold": True}})
@@ -59,116 +89,289 @@ def setup_headers(sheet):
         print(f"⚠️ Warning: Could not setup headers: {e}")
 
 
+# ======== ROW FORMAT ========
+def lead_to_row(lead):
+    """Sheet row (columns A-R) for a lead, from its typed columns (see Lead.refresh_data_fields)."""
+    row = [
+        lead.lead_type,
+        lead.name or "",
+        lead.phone,
+        lead.score or "",  # Score column
+        lead.segment or "",  # Segment column
+        lead.budget or "",
+        lead.location or "",
+        lead.property_type or "",
+        lead.area or "",
+        lead.bhk or "",
+        lead.status,
+        lead.drive_link or "",  # Drive Link column
+        datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        lead.selected_property_type or "",  # Selected Property Type
+        lead.selected_property_location or "",  # Selected Property Location
+        lead.selected_property_price or "",  # Selected Property Price
+        lead.selected_property_drive_link or "",  # Selected Property Drive Link
+        (lead.data or {}).get("selection_timestamp", "")  # Selection Timestamp
+    ]
+    return row
+
+
 # ======== PUSH DATA ========
+def sync_mode():
+    return getattr(settings, "SHEETS_SYNC_MODE", "inline")
+
+
 def add_lead_to_sheet(lead, update_existing=False):
     """
-    Add or update lead in sheet.
-    If update_existing=True, will try to find and update existing row by phone number.
-    Otherwise, appends a new row.
+    Add or update the lead's row in the sheet.
+
+    A lead has one row, found through the SheetRow index, so the row is
+    always updated in place (`update_existing` is kept for callers). In
+    "deferred" mode the lead is only marked dirty and `run_sheet_sync`
+    writes it with the next batch.
+    """
+    return queue_sheet_sync([lead])
+
+
+def queue_sheet_sync(leads):
+    leads = [lead for lead in leads if lead.pk]
+    if not leads:
+        return True
+    if sync_mode() == "deferred":
+        # Repeated changes before the next flush coalesce into one row write
+        Lead.objects.filter(pk__in=[lead.pk for lead in leads]).update(sheet_dirty_at=timezone.now())
+        return True
+    return sync_leads_to_sheet(leads)
+
+
+def _report_sheets_error(e):
+    error_msg = str(e)
+    if "accessNotConfigured" in error_msg or "403" in error_msg or "Drive API" in error_msg:
+        print("❌ Google Sheets Error: Google Drive API is not enabled in your Google Cloud project.")
+        print("   Please enable it at: https://console.cloud.google.com/apis/library/drive.googleapis.com")
+        print("   Note: Google Sheets requires Drive API to be enabled for file access.")
+    else:
+        print(f"❌ Google Sheets Error: {e}")
+
+
+# ======== ROW INDEX ========
+APPENDED_RANGE_RE = re.compile(r"![A-Z]+(\d+)(?::[A-Z]+(\d+))?$")
+PHONE_COLUMN = "C"
+
+_last_reconcile = None  # monotonic time of this process's last full read of the phone column
+
+
+def reconcile_row_index(sheet=None):
+    """
+    Re-read the phone column (one API call) and bring SheetRow in line with it.
+
+    Catches rows moved, added or deleted by hand in the sheet; when a phone
+    appears on several rows the latest one wins. Returns the number of
+    index entries changed.
+    """
+    global _last_reconcile
+    sheet = sheet or get_worksheet()
+    actual = {}
+    for idx, phone in enumerate(sheet.col_values(3), start=1):
+        if idx > 1 and phone:
+            actual[phone] = idx
+
+    known = dict(SheetRow.objects.values_list("phone", "row"))
+    changed = [SheetRow(phone=phone, row=row) for phone, row in actual.items() if known.get(phone) != row]
+    gone = [phone for phone in known if phone not in actual]
+
+    with transaction.atomic():
+        if changed:
+            SheetRow.objects.bulk_create(
+                changed, update_conflicts=True, unique_fields=["phone"], update_fields=["row", "updated_at"], batch_size=1000
+            )
+        if gone:
+            SheetRow.objects.filter(phone__in=gone).delete()
+    _last_reconcile = time.monotonic()
+    if changed or gone:
+        print(f"🗂️ Sheet row index reconciled: {len(changed)} updated, {len(gone)} removed")
+    return len(changed) + len(gone)
+
+
+def ensure_row_index(sheet):
+    """Reconcile SheetRow on first use in this process and every SHEETS_ROW_RECONCILE_SECONDS after."""
+    every = getattr(settings, "SHEETS_ROW_RECONCILE_SECONDS", 600)
+    if _last_reconcile is not None and (not every or time.monotonic() - _last_reconcile < every):
+        return
+    reconcile_row_index(sheet)
+
+
+def _moved_phones(sheet, phone_to_row):
+    """Phones whose indexed row no longer holds them, checked with one batch_get of their phone cells."""
+    items = list(phone_to_row.items())
+    cells = sheet.batch_get([f"{PHONE_COLUMN}{row}" for _, row in items])
+    return [
+        phone for (phone, _), cell in zip(items, cells)
+        if str(cell[0][0] if cell and cell[0] else "") != phone
+    ]
+
+
+def indexed_rows(sheet, phones):
+    """
+    phone -> sheet row for those of `phones` already in the sheet.
+
+    The indexed rows are checked against the phone column before anything
+    is written to them; rows sorted, inserted or deleted by hand since the
+    last reconcile trigger a full re-read, so a write never lands on
+    another lead's row.
+    """
+    ensure_row_index(sheet)
+    phone_to_row = dict(SheetRow.objects.filter(phone__in=phones).values_list("phone", "row"))
+    if phone_to_row and _moved_phones(sheet, phone_to_row):
+        print("⚠️ Sheet rows moved since they were indexed, re-reading the phone column")
+        reconcile_row_index(sheet)
+        phone_to_row = dict(SheetRow.objects.filter(phone__in=phones).values_list("phone", "row"))
+    return phone_to_row
+
+
+def _appended_rows(response, count):
+    """Row numbers written by append_rows, read from the API's updatedRange ('Sheet1!A12:R14')."""
+    updated_range = ((response or {}).get("updates") or {}).get("updatedRange", "")
+    match = APPENDED_RANGE_RE.search(updated_range)
+    if not match:
+        return []
+    first = int(match.group(1))
+    return list(range(first, first + count))
+
+
+def _index_appended(sheet, phones, response):
+    """
+    Record the rows append_rows just wrote for `phones`.
+
+    If the response doesn't say where they landed, the phone column is
+    re-read instead: an unindexed phone would be appended again on its
+    next sync. Should that read fail too, the index is marked stale so the
+    next sync re-reads it before writing anything.
     """
+    global _last_reconcile
+    new_rows = _appended_rows(response, len(phones))
+    if new_rows:
+        SheetRow.objects.bulk_create(
+            [SheetRow(phone=phone, row=row) for phone, row in zip(phones, new_rows)],
+            update_conflicts=True, unique_fields=["phone"], update_fields=["row", "updated_at"],
+        )
+        return
+    print(f"⚠️ No row numbers in append response {response!r}, re-reading the phone column")
     try:
-        sheet = connect_sheet().sheet1  # first tab
-
-        # Setup headers if needed
-        setup_headers(sheet)
-
-        data = lead.data or {}
-        row = [
-            lead.lead_type,
-            data.get("name", ""),
-            lead.phone,
-            lead.score or "",  # Score column
-            lead.segment or "",  # Segment column
-            data.get("budget") or data.get("price_range") or "",
-            data.get("location") or data.get("location_preference") or "",
-            data.get("property_type") or data.get("property_type_preference") or "",
-            data.get("area_sqft") or data.get("area_preference") or "",  # Area field - FIXED
-            data.get("bhk") or "",
-            lead.status,
-            data.get("drive_link", ""),  # Drive Link column
-            datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            data.get("selected_property_type", ""),  # Selected Property Type
-            data.get("selected_property_location", ""),  # Selected Property Location
-            data.get("selected_property_price", ""),  # Selected Property Price
-            data.get("selected_property_drive_link", ""),  # Selected Property Drive Link
-            data.get("selection_timestamp", "")  # Selection Timestamp
-        ]
+        reconcile_row_index(sheet)
+    except Exception as e:
+        _last_reconcile = None
+        print(f"❌ Could not index appended rows for {len(phones)} lead(s): {e}")
+
 
-        # Try to update existing row if requested
-        if update_existing:
-            all_values = sheet.get_all_values()
-            for idx, existing_row in enumerate(all_values, start=1):
-                # Skip header row
-                if idx == 1:
-                    continue
-                # Check if phone matches (column C, index 2)
-                if len(existing_row) > 2 and existing_row[2] == lead.phone:
-                    # Update the existing row
-                    sheet.delete_rows(idx)
-                    sheet.insert_row(row, idx)
-                    print(f"✅ Updated existing row {idx} for phone {lead.phone}")
-                    return True
-
-        # Append new row if not updating or row not found
-        sheet.append_row(row)
-        print(f"✅ Added new row for phone {lead.phone}")
+# ======== BULK SYNC ========
+def sync_leads_to_sheet(leads):
+    """
+    Upsert several leads with one read and at most two writes.
+
+    Rows known to the SheetRow index are verified (see indexed_rows) and
+    rewritten with one batch_update; the rest are added with one
+    append_rows and their new row numbers are recorded from the response.
+    """
+    leads = list({lead.phone: lead for lead in leads}.values())
+    if not leads:
+        return True
+    try:
+        sheet = get_worksheet()
+        phone_to_row = indexed_rows(sheet, [lead.phone for lead in leads])
+
+        updates = []
+        appends = []
+        for lead in leads:
+            row = lead_to_row(lead)
+            row_index = phone_to_row.get(lead.phone)
+            if row_index:
+                updates.append({"range": f"A{row_index}:R{row_index}", "values": [row]})
+            else:
+                appends.append((lead.phone, row))
+
+        if updates:
+            sheet.batch_update(updates)
+        if appends:
+            response = sheet.append_rows([row for _, row in appends])
+            _index_appended(sheet, [phone for phone, _ in appends], response)
+        print(f"✅ Synced {len(leads)} lead(s) to sheets ({len(updates)} updated, {len(appends)} added)")
         return True
 
     except Exception as e:
-        error_msg = str(e)
-        if "accessNotConfigured" in error_msg or "403" in error_msg or "Drive API" in error_msg:
-            print("❌ Google Sheets Error: Google Drive API is not enabled in your Google Cloud project.")
-            print("   Please enable it at: https://console.cloud.google.com/apis/library/drive.googleapis.com")
-            print("   Note: Google Sheets requires Drive API to be enabled for file access.")
-        else:
-            print(f"❌ Google Sheets Error: {e}")
+        reset_worksheet()
+        _report_sheets_error(e)
         return False
 
 
+def flush_dirty_leads(batch_size=None):
+    """Write one batch of leads marked by queue_sheet_sync. Returns the number flushed."""
+    batch_size = batch_size or getattr(settings, "SHEETS_SYNC_BATCH_SIZE", 200)
+    started = timezone.now()
+    leads = list(Lead.objects.filter(sheet_dirty_at__isnull=False).order_by("sheet_dirty_at")[:batch_size])
+    if not leads or not sync_leads_to_sheet(leads):
+        return 0
+    # Leads changed again during the flush keep their mark for the next pass
+    Lead.objects.filter(pk__in=[lead.pk for lead in leads], sheet_dirty_at__lte=started).update(sheet_dirty_at=None)
+    return len(leads)
+
+
+def run_sheet_sync(interval=None, batch_size=None, stop_event=None):
+    stop_event = stop_event or threading.Event()
+    interval = interval or getattr(settings, "SHEETS_SYNC_INTERVAL_SECONDS", 10)
+    print("🚀 Sheets sync started")
+    while not stop_event.is_set():
+        try:
+            ensure_row_index(get_worksheet())
+        except Exception as e:
+            reset_worksheet()
+            _report_sheets_error(e)
+        flushed = flush_dirty_leads(batch_size)
+        close_old_connections()
+        # A full batch means more are waiting; otherwise let changes coalesce for a while
+        if flushed < (batch_size or getattr(settings, "SHEETS_SYNC_BATCH_SIZE", 200)):
+            stop_event.wait(interval)
+    print("🛑 Sheets sync stopped")
+
+
 # ======== UPDATE BUYER PROPERTY SELECTION ========
-def update_buyer_property_selection(lead, selected_property, seller_lead):
+# Selection columns N-R, in sheet order
+SELECTION_FIRST_COLUMN = 14
+
+
+def write_row_range(sheet, row, first_col, values):
+    """Write a contiguous block of cells in one row with a single API call."""
+    start = rowcol_to_a1(row, first_col)
+    end = rowcol_to_a1(row, first_col + len(values) - 1)
+    return sheet.update(values=[values], range_name=f"{start}:{end}")
+
+
+def update_buyer_property_selection(lead, selected_property, drive_link=""):
     """Update buyer's row in sheets with selected property details"""
+    if sync_mode() == "deferred":
+        # lead.data already holds the selection, so the full-row flush carries it
+        return queue_sheet_sync([lead])
+
     try:
-        sheet = connect_sheet().sheet1
-        
-        # Find the buyer's row by phone number
-        all_values = sheet.get_all_values()
-        row_index = None
-        
-        for idx, row in enumerate(all_values, start=1):
-            # Skip header row
-            if idx == 1:
-                continue
-            # Check if phone matches (column C, index 2)
-            if len(row) > 2 and row[2] == lead.phone:
-                row_index = idx
-                break
-        
+        sheet = get_worksheet()
+        row_index = indexed_rows(sheet, [lead.phone]).get(lead.phone)
+
         if not row_index:
-            print(f"⚠️ Buyer row not found for phone {lead.phone}")
-            return False
-        
-        # Get seller's drive link
-        seller_data = seller_lead.data or {}
-        drive_link = seller_data.get("drive_link", "")
-        
-        # Update the row with selected property details
-        # Column indices: N=13, O=14, P=15, Q=16, R=17 (0-indexed: 13, 14, 15, 16, 17)
-        updates = {
-            13: selected_property.property_type or "",  # Selected Property Type
-            14: selected_property.location or "",  # Selected Property Location
-            15: selected_property.price_range or "",  # Selected Property Price
-            16: drive_link,  # Selected Property Drive Link
-            17: datetime.now().strftime("%Y-%m-%d %H:%M:%S")  # Selection Timestamp
-        }
-        
-        # Update each cell
-        for col_idx, value in updates.items():
-            sheet.update_cell(row_index, col_idx + 1, value)  # +1 because gspread is 1-indexed
-        
+            print(f"⚠️ Buyer row not found for phone {lead.phone}, adding it")
+            return sync_leads_to_sheet([lead])
+
+        values = [
+            selected_property.property_type or "",  # Selected Property Type
+            selected_property.location or "",  # Selected Property Location
+            selected_property.price_range or "",  # Selected Property Price
+            drive_link,  # Selected Property Drive Link
+            (lead.data or {}).get("selection_timestamp") or datetime.now().strftime("%Y-%m-%d %H:%M:%S"),  # Selection Timestamp
+        ]
+        write_row_range(sheet, row_index, SELECTION_FIRST_COLUMN, values)
+
         print(f"✅ Updated buyer property selection in sheets (row {row_index})")
         return True
-        
+
     except Exception as e:
+        reset_worksheet()
         print(f"❌ Error updating buyer property selection: {e}")
         return False
@@ -0,0 +1,89 @@
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+
+CACHE_ALIAS = "conversation_state"
+# Backends that only this process can see
+LOCAL_BACKENDS = {
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+}
+
+
+class ConversationStateCache:
+    """
+    Write-through cache of each phone's lead row, conversation step included.
+
+    Entries are {column: value} snapshots in the `conversation_state` Django
+    cache and expire after the cache TIMEOUT without a write, so idle
+    conversations fall out. The database stays the source of truth and
+    every lead write bumps Lead.version. With the default local-memory
+    backend each process has its own copy, which another process's writes
+    can leave behind, so load_conversation checks the version before using
+    an entry; a shared backend (CONVERSATION_CACHE_BACKEND) is written
+    through by every process and is used without a query.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.conflicts = 0
+        self.hit_seconds = 0.0
+        self.miss_seconds = 0.0
+
+    @property
+    def enabled(self):
+        return getattr(settings, "CONVERSATION_STATE_CACHE_ENABLED", False)
+
+    @property
+    def shared(self):
+        return settings.CACHES[CACHE_ALIAS]["BACKEND"] not in LOCAL_BACKENDS
+
+    @property
+    def cache(self):
+        return caches[CACHE_ALIAS]
+
+    @staticmethod
+    def _key(phone):
+        return f"conv-state:{phone}"
+
+    def get(self, phone):
+        """{column: value} of the cached lead, or None."""
+        return self.cache.get(self._key(phone))
+
+    def put(self, lead):
+        self.cache.set(self._key(lead.phone), {f.attname: getattr(lead, f.attname) for f in lead._meta.concrete_fields})
+
+    def invalidate(self, phone, conflict=False):
+        """Drop the entry; `conflict` counts it as found stale."""
+        self.cache.delete(self._key(phone))
+        if conflict:
+            with self._lock:
+                self.conflicts += 1
+
+    # ---- stats ----
+    def record_lookup(self, hit, seconds):
+        with self._lock:
+            if hit:
+                self.hits += 1
+                self.hit_seconds += seconds
+            else:
+                self.misses += 1
+                self.miss_seconds += seconds
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+                "conflicts": self.conflicts,
+                "avg_hit_ms": round(self.hit_seconds / self.hits * 1000, 3) if self.hits else 0.0,
+                "avg_miss_ms": round(self.miss_seconds / self.misses * 1000, 3) if self.misses else 0.0,
+            }
+
+
+conversation_state_cache = ConversationStateCache()
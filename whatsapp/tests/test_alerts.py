@@ -0,0 +1,82 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from whatsapp import alerts
+from whatsapp.flows import SELECTION_STEP
+from whatsapp.matching import listing_details
+from whatsapp.models import Lead, OutboundMessage, Property, PropertyAlert
+from whatsapp.outbox import TokenBucket
+
+
+@override_settings(WHATSAPP_OUTBOUND_MODE="outbox", BUYER_ALERTS_PER_DAY=10)
+class AlertFanOutTests(TestCase):
+    def setUp(self):
+        seller = Lead.objects.create(phone="919000000300", lead_type="SELLER")
+        self.listing = Property.objects.create(SELLER=seller, property_type="Apartment", bhk="2 BHK", location="Kondapur")
+        self.buyer = Lead.objects.create(
+            phone="919000000301", lead_type="BUYER", current_step=SELECTION_STEP,
+            data={"matching_property_ids": [999], "location_preference": "Kondapur"},
+        )
+        self.alert = PropertyAlert.objects.create(buyer=self.buyer, property=self.listing)
+        self.bucket = TokenBucket(1000, 1000)
+
+    def test_listing_is_offered_as_next_number(self):
+        self.assertEqual(alerts.send_pending_alerts(self.bucket), 1)
+        self.buyer.refresh_from_db()
+        self.assertEqual(self.buyer.data["matching_property_ids"], [999, self.listing.id])
+        self.assertIn("Reply with 2", OutboundMessage.objects.get(phone=self.buyer.phone).payload["text"]["body"])
+
+    def test_buyer_who_moved_on_is_skipped(self):
+        Lead.objects.filter(pk=self.buyer.pk).update(current_step="COMPLETED")
+        self.assertEqual(alerts.send_pending_alerts(self.bucket), 0)
+        self.alert.refresh_from_db()
+        self.assertEqual(self.alert.status, "SKIPPED")
+
+    def test_concurrent_turn_is_not_overwritten(self):
+        def buyer_answers_meanwhile(prop):
+            # The webhook worker saves the lead after _notify has read it
+            if not Lead.objects.filter(pk=self.buyer.pk, data__has_key="budget").exists():
+                lead = Lead.objects.get(pk=self.buyer.pk)
+                lead.data["budget"] = "80L"
+                lead.save(update_fields=["data", "updated_at"])
+            return listing_details(prop)
+
+        with mock.patch("whatsapp.alerts.listing_details", side_effect=buyer_answers_meanwhile):
+            self.assertEqual(alerts.send_pending_alerts(self.bucket), 1)
+        self.buyer.refresh_from_db()
+        self.assertEqual(self.buyer.data["budget"], "80L")
+        self.assertIn(self.listing.id, self.buyer.data["matching_property_ids"])
+
+    def test_failing_alert_is_failed_after_max_attempts(self):
+        with mock.patch("whatsapp.alerts._notify", side_effect=RuntimeError("send failed")):
+            for _ in range(alerts.MAX_ATTEMPTS):
+                alerts.send_pending_alerts(self.bucket)
+        self.alert.refresh_from_db()
+        self.assertEqual((self.alert.status, self.alert.attempts), ("FAILED", alerts.MAX_ATTEMPTS))
+        self.assertEqual(self.alert.last_error, "send failed")
+
+
+@override_settings(BUYER_ALERTS_ENABLED=True)
+class ReverseMatchTests(TestCase):
+    def setUp(self):
+        self.seller = Lead.objects.create(phone="919000000310", lead_type="SELLER")
+        self.kondapur = Lead.objects.create(phone="919000000311", lead_type="BUYER")
+        self.miyapur = Lead.objects.create(phone="919000000312", lead_type="BUYER")
+        alerts.save_buyer_query(self.kondapur, {"property_kind": "APARTMENT", "locality": "kondapur"})
+        alerts.save_buyer_query(self.miyapur, {"property_kind": "HOUSE", "locality": "miyapur"})
+
+    def listing(self, **answers):
+        return Property.objects.create(SELLER=self.seller, **answers)
+
+    def test_unparsed_listing_is_skipped_without_widening_the_batch(self):
+        parsed = self.listing(property_type="Apartment", location="Kondapur")
+        unparsed = self.listing(property_type="Castle", location="")
+        with self.assertNumQueries(1):
+            pairs = alerts.match_new_listings([parsed, unparsed])
+        self.assertEqual(pairs, [(self.kondapur.id, parsed.id)])
+
+    def test_batch_of_unparsed_listings_matches_nothing(self):
+        unparsed = self.listing(property_type="Castle")
+        with self.assertNumQueries(0):
+            self.assertEqual(alerts.match_new_listings([unparsed]), [])
@@ -0,0 +1,171 @@
+import tempfile
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+
+from whatsapp.ai.normalizer import normalize_answer
+from whatsapp.conversation import ConversationEngine
+from whatsapp.flows import CHOOSE_STEP, COMPLETED_STEP, FLOWS
+from whatsapp.models import Lead
+from whatsapp.state_cache import CACHE_ALIAS, conversation_state_cache
+from whatsapp.views import conversation_engine
+
+# Answers the fast-path normalizer resolves, so no LLM call is made
+SELLER_ANSWERS = ["Apartment", "1200", "2BHK", "Ravi", "Kondapur", "80L"]
+BUYER_ANSWERS = ["Apartment", "1000-1500", "2BHK", "Sita", "Kondapur", "70-90 lakhs"]
+
+
+@override_settings(
+    WHATSAPP_OUTBOUND_MODE="outbox",
+    LEAD_SCORING_MODE="deferred",
+    SHEETS_SYNC_MODE="deferred",
+    PIPELINE_WORKERS=0,
+    BUYER_ALERTS_ENABLED=False,
+)
+class ConversationQueryTests(TestCase):
+    """Statements per message for the scripted flows; replies are collected, not sent."""
+
+    def setUp(self):
+        self.sent = []
+        self.engine = ConversationEngine(
+            FLOWS,
+            actions=conversation_engine.actions,
+            send_message=lambda phone, text: self.sent.append(text),
+            send_buttons=lambda phone, text, buttons: self.sent.append(text),
+            normalize=normalize_answer,
+        )
+
+    def step(self, phone):
+        return Lead.objects.values_list("current_step", flat=True).get(phone=phone)
+
+    def test_first_message_creates_the_lead(self):
+        self.engine.handle("919000000001", "hi")
+        self.assertEqual(self.step("919000000001"), CHOOSE_STEP)
+        self.assertEqual(len(self.sent), 1)
+
+    def test_seller_question_step_is_one_read_and_one_write(self):
+        phone = "919000000002"
+        self.engine.handle(phone, "hi")
+        self.engine.handle(phone, "sell")
+        for number, answer in enumerate(SELLER_ANSWERS, start=2):
+            with self.assertNumQueries(2):
+                self.engine.handle(phone, answer)
+            self.assertEqual(self.step(phone), f"SELL_Q{number}")
+        lead = Lead.objects.get(phone=phone)
+        self.assertEqual(lead.lead_type, "SELLER")
+        self.assertEqual(lead.location, "Kondapur")
+
+    def test_buyer_question_step_is_one_read_and_one_write(self):
+        phone = "919000000003"
+        self.engine.handle(phone, "hello")
+        with self.assertNumQueries(2):
+            self.engine.handle(phone, "buy")
+        for number, answer in enumerate(BUYER_ANSWERS, start=2):
+            with self.assertNumQueries(2):
+                self.engine.handle(phone, answer)
+            self.assertEqual(self.step(phone), f"BUY_Q{number}")
+        self.assertEqual(Lead.objects.get(phone=phone).budget, "70-90L")
+
+    def test_message_that_changes_nothing_writes_nothing(self):
+        phone = "919000000004"
+        Lead.objects.create(phone=phone, lead_type="SELLER", current_step=COMPLETED_STEP)
+        with self.assertNumQueries(1):
+            self.engine.handle(phone, "thanks")
+        self.assertEqual(self.step(phone), COMPLETED_STEP)
+
+
+def cache_settings(backend, location):
+    return {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+        CACHE_ALIAS: {"BACKEND": backend, "LOCATION": location, "TIMEOUT": 60},
+    }
+
+
+class StateCacheTests(ConversationQueryTests):
+    """The same flows with the lead served from a shared (file) cache."""
+
+    def setUp(self):
+        super().setUp()
+        location = tempfile.mkdtemp()
+        overrides = override_settings(
+            CONVERSATION_STATE_CACHE_ENABLED=True,
+            CACHES=cache_settings("django.core.cache.backends.filebased.FileBasedCache", location),
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.addCleanup(caches[CACHE_ALIAS].clear)
+
+    def test_seller_question_step_is_one_read_and_one_write(self):
+        # A warm cache answers the read: each question step is just the UPDATE
+        phone = "919000000012"
+        self.engine.handle(phone, "hi")
+        self.engine.handle(phone, "sell")
+        for number, answer in enumerate(SELLER_ANSWERS, start=2):
+            with self.assertNumQueries(1):
+                self.engine.handle(phone, answer)
+            self.assertEqual(self.step(phone), f"SELL_Q{number}")
+        self.assertEqual(Lead.objects.get(phone=phone).location, "Kondapur")
+
+    def test_buyer_question_step_is_one_read_and_one_write(self):
+        phone = "919000000017"
+        self.engine.handle(phone, "hello")
+        for number, answer in enumerate(["buy", *BUYER_ANSWERS], start=1):
+            with self.assertNumQueries(1):
+                self.engine.handle(phone, answer)
+            self.assertEqual(self.step(phone), f"BUY_Q{number}")
+        self.assertEqual(Lead.objects.get(phone=phone).budget, "70-90L")
+
+    def test_warm_cache_serves_the_read(self):
+        phone = "919000000013"
+        Lead.objects.create(phone=phone, lead_type="SELLER", current_step=COMPLETED_STEP)
+        self.engine.handle(phone, "thanks")
+        hits = conversation_state_cache.stats()["hits"]
+        with self.assertNumQueries(0):
+            self.engine.handle(phone, "thanks")
+        self.assertEqual(conversation_state_cache.stats()["hits"], hits + 1)
+
+    def test_write_outside_the_turn_drops_the_entry(self):
+        phone = "919000000014"
+        lead = Lead.objects.create(phone=phone, lead_type="SELLER", current_step=COMPLETED_STEP)
+        self.engine.handle(phone, "thanks")
+        lead.current_step = CHOOSE_STEP
+        lead.save(update_fields=["current_step"])
+        self.engine.handle(phone, "sell")
+        self.assertEqual(self.step(phone), "SELL_Q1")
+
+    def test_conflicting_write_still_lands(self):
+        phone = "919000000015"
+        self.engine.handle(phone, "hi")
+        # Another process moves the row on behind the shared cache
+        Lead.objects.filter(phone=phone).update(version=99)
+        self.engine.handle(phone, "sell")
+        self.assertEqual(self.step(phone), "SELL_Q1")
+        self.assertIsNone(conversation_state_cache.get(phone))
+
+
+@override_settings(
+    WHATSAPP_OUTBOUND_MODE="outbox",
+    CONVERSATION_STATE_CACHE_ENABLED=True,
+    CACHES=cache_settings("django.core.cache.backends.locmem.LocMemCache", "conversation-state-test"),
+)
+class LocalStateCacheTests(TestCase):
+    def setUp(self):
+        self.sent = []
+        self.engine = ConversationEngine(
+            FLOWS,
+            actions=conversation_engine.actions,
+            send_message=lambda phone, text: self.sent.append(text),
+            send_buttons=lambda phone, text, buttons: self.sent.append(text),
+            normalize=normalize_answer,
+        )
+        self.addCleanup(caches[CACHE_ALIAS].clear)
+
+    def test_local_entry_is_checked_against_the_version(self):
+        phone = "919000000016"
+        self.engine.handle(phone, "hi")
+        with self.assertNumQueries(1):
+            self.engine.handle(phone, "what?")
+        # Another process answered "sell"; this process's copy is behind
+        Lead.objects.filter(phone=phone).update(current_step="SELL_Q1", lead_type="SELLER", version=99)
+        self.engine.handle(phone, "Apartment")
+        self.assertEqual(Lead.objects.get(phone=phone).current_step, "SELL_Q2")
@@ -0,0 +1,95 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.db import DatabaseError, transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from whatsapp.dedup import MessageDedup, message_dedup
+from whatsapp.models import InboundMessage, ProcessedMessage
+from whatsapp.webhook import dispatch_messages
+
+
+class MessageDedupTests(TestCase):
+    def setUp(self):
+        self.dedup = MessageDedup(ttl_seconds=3600, local_size=100)
+
+    def test_claim_once(self):
+        self.assertTrue(self.dedup.claim("wamid.1", "9190"))
+        self.assertFalse(self.dedup.claim("wamid.1", "9190"))
+        # Another process only has the table
+        self.assertFalse(MessageDedup(ttl_seconds=3600, local_size=100).claim("wamid.1", "9190"))
+
+    def test_redelivered_batch_is_dropped(self):
+        batch = [{"id": "wamid.2", "phone": "9190"}, {"id": "wamid.3", "phone": "9190"}]
+        self.assertEqual(self.dedup.filter_new(batch), batch)
+        other = MessageDedup(ttl_seconds=3600, local_size=100)
+        with self.assertNumQueries(1):
+            self.assertEqual(other.filter_new(batch), [])
+
+    def test_repeat_within_one_batch_is_dropped(self):
+        batch = [{"id": "wamid.7", "phone": "9190"}, {"id": "wamid.7", "phone": "9190"}]
+        self.assertEqual(self.dedup.filter_new(batch), batch[:1])
+
+    def test_expired_id_is_new_again(self):
+        ProcessedMessage.objects.create(message_id="wamid.4", processed_at=timezone.now() - timedelta(hours=2))
+        self.assertTrue(self.dedup.claim("wamid.4"))
+
+    def test_purge_expired(self):
+        ProcessedMessage.objects.create(message_id="old", processed_at=timezone.now() - timedelta(hours=2))
+        ProcessedMessage.objects.create(message_id="new", processed_at=timezone.now())
+        self.assertEqual(self.dedup.purge_expired(), 1)
+        self.assertEqual(list(ProcessedMessage.objects.values_list("message_id", flat=True)), ["new"])
+
+    def test_rolled_back_claim_is_forgotten(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.assertTrue(self.dedup.claim("wamid.5"))
+            raise RuntimeError("enqueue failed")
+        self.assertTrue(self.dedup.claim("wamid.5"))
+
+    def test_release(self):
+        self.dedup.claim("wamid.6")
+        self.dedup.release("wamid.6")
+        self.assertTrue(self.dedup.claim("wamid.6"))
+
+    @override_settings(WHATSAPP_DEDUP_PURGE_SECONDS=60)
+    def test_purge_runs_when_due(self):
+        ProcessedMessage.objects.create(message_id="old", processed_at=timezone.now() - timedelta(hours=2))
+
+        class InlineThread:
+            def __init__(self, target, **kwargs):
+                self.target = target
+
+            def start(self):
+                self.target()
+
+        with mock.patch("whatsapp.dedup.threading.Thread", InlineThread), mock.patch("whatsapp.dedup.close_old_connections"):
+            self.dedup.maybe_purge()
+            self.assertTrue(ProcessedMessage.objects.exists())
+            self.dedup.last_purge -= 61
+            self.dedup.maybe_purge()
+        self.assertFalse(ProcessedMessage.objects.exists())
+
+
+class DispatchDedupTests(TestCase):
+    batch = [{"id": "wamid.10", "phone": "9191", "type": "text", "timestamp": 1, "text": "hi"}]
+
+    def setUp(self):
+        message_dedup._local.clear()
+
+    @override_settings(WHATSAPP_INGEST_MODE="queue")
+    def test_failed_enqueue_leaves_ids_unclaimed(self):
+        with mock.patch("whatsapp.webhook.enqueue_messages", side_effect=DatabaseError("disk full")):
+            with self.assertRaises(DatabaseError):
+                dispatch_messages(list(self.batch))
+        self.assertFalse(ProcessedMessage.objects.exists())
+
+        dispatch_messages(list(self.batch))
+        dispatch_messages(list(self.batch))
+        self.assertEqual(InboundMessage.objects.count(), 1)
+
+    @override_settings(WHATSAPP_INGEST_MODE="inline")
+    def test_failed_inline_message_is_released(self):
+        with mock.patch("whatsapp.views.handle_message", side_effect=RuntimeError("boom")):
+            dispatch_messages(list(self.batch))
+        self.assertFalse(ProcessedMessage.objects.exists())
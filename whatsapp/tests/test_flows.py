@@ -0,0 +1,49 @@
+from django.test import TestCase, override_settings
+
+from whatsapp.conversation import ConversationEngine
+from whatsapp.flows import FLOWS, SELLER_FLOW
+from whatsapp.models import Lead
+from whatsapp.views import conversation_engine
+
+
+def engine(sent, actions=None):
+    return ConversationEngine(
+        FLOWS,
+        actions=conversation_engine.actions if actions is None else actions,
+        send_message=lambda phone, text: sent.append(text),
+        send_buttons=lambda phone, text, buttons: sent.append(buttons),
+        normalize=lambda question, text: text,
+    )
+
+
+class FlowTableTests(TestCase):
+    def test_every_step_has_a_handler(self):
+        dispatch = engine([]).dispatch
+        for flow in FLOWS:
+            for step in flow.steps:
+                self.assertIn(step.name, dispatch)
+                if step.other_prompt:
+                    self.assertIn(f"{step.name}_OTHER", dispatch)
+
+    def test_unknown_action_fails_at_startup(self):
+        actions = {name: action for name, action in conversation_engine.actions.items() if name != SELLER_FLOW.finish}
+        with self.assertRaisesMessage(ValueError, SELLER_FLOW.finish):
+            engine([], actions)
+
+    @override_settings(WHATSAPP_OUTBOUND_MODE="outbox")
+    def test_other_answer_takes_the_typed_text(self):
+        sent = []
+        Lead.objects.create(phone="919000000500", lead_type="SELLER", current_step="SELL_Q7")
+        conversation = engine(sent)
+        conversation.handle("919000000500", "other")
+        self.assertEqual(Lead.objects.get(phone="919000000500").current_step, "SELL_Q7_OTHER")
+        self.assertEqual(sent, [SELLER_FLOW.steps[-1].other_prompt])
+
+    def test_reply_to_another_flows_step_falls_back(self):
+        sent = []
+        phone = "919000000005"
+        Lead.objects.create(phone=phone, lead_type="BUYER", current_step="SELL_Q3")
+        with self.assertNumQueries(1):
+            engine(sent).handle(phone, "2BHK")
+        self.assertEqual(Lead.objects.get(phone=phone).current_step, "SELL_Q3")
+        self.assertIn("Type *Hi* to start over", sent[-1])
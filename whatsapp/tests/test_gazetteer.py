@@ -0,0 +1,22 @@
+from django.test import SimpleTestCase
+
+from whatsapp.gazetteer import LOCALITY_KEY_MAX_LENGTH, gazetteer, locality_key
+
+
+class GazetteerTests(SimpleTestCase):
+    def test_locality_key(self):
+        self.assertEqual(locality_key("Gachibowli, Hyderabad"), "gachibowli")
+        self.assertEqual(locality_key("KPHB colony"), "kukatpally")
+        self.assertEqual(locality_key("Gachi bowli"), "gachibowli")
+        self.assertEqual(locality_key("kondapurr"), "kondapur")
+        self.assertEqual(locality_key("flat near miyapur x roads"), "miyapur")
+
+    def test_unknown_place_falls_back_to_its_text(self):
+        self.assertEqual(locality_key("Nowhere Nagar, Hyderabad"), "nowhere nagar")
+        self.assertLessEqual(len(locality_key("near the big temple " * 20)), LOCALITY_KEY_MAX_LENGTH)
+
+    def test_neighbours_nearest_first(self):
+        nearby = gazetteer.neighbours("gachibowli", 5)
+        self.assertIn("hitech city", [key for key, _ in nearby])
+        self.assertNotIn("uppal", [key for key, _ in nearby])
+        self.assertEqual([km for _, km in nearby], sorted(km for _, km in nearby))
@@ -0,0 +1,61 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from whatsapp import jobs
+from whatsapp.models import InboundMessage
+
+
+class JobQueueTests(TestCase):
+    def enqueue(self, phone, text, **fields):
+        return InboundMessage.objects.create(phone=phone, text=text, **fields)
+
+    def test_one_job_per_phone_in_order(self):
+        first = self.enqueue("9191", "hi")
+        self.enqueue("9191", "buy")
+        other = self.enqueue("9192", "hi")
+        self.assertEqual([j.id for j in jobs.claim_jobs(10)], [first.id, other.id])
+        self.assertEqual(jobs.claim_jobs(10), [])
+
+    def test_hot_phone_does_not_starve_the_others(self):
+        self.enqueue("9191", "hi", status="PROCESSING")
+        for n in range(60):
+            self.enqueue("9191", f"message {n}")
+        backed_off = self.enqueue("9192", "hi", available_at=timezone.now() + timedelta(minutes=5))
+        self.enqueue("9192", "buy")
+        waiting = self.enqueue("9193", "hi")
+        self.assertEqual([j.id for j in jobs.claim_jobs(4)], [waiting.id])
+        self.assertEqual(InboundMessage.objects.get(pk=backed_off.pk).status, "PENDING")
+
+    def test_claim_checks_processing_jobs_itself(self):
+        # Another worker claimed the first job after this one built its candidate list
+        self.enqueue("9191", "hi", status="PROCESSING")
+        second = self.enqueue("9191", "buy")
+        self.assertEqual(jobs._claim(second.id, "9191", timezone.now()), 0)
+
+    def test_failed_job_backs_off_and_holds_later_messages(self):
+        self.enqueue("9191", "hi")
+        job = jobs.claim_jobs(1)[0]
+        self.enqueue("9191", "buy")
+        # close_old_connections would close the test case's transaction
+        with mock.patch("whatsapp.views.handle_message", side_effect=RuntimeError("boom")), \
+                mock.patch("whatsapp.jobs.close_old_connections"):
+            jobs.process_job(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ("PENDING", 1))
+        self.assertGreater(job.available_at, timezone.now())
+        self.assertEqual(jobs.claim_jobs(10), [])
+
+        InboundMessage.objects.filter(pk=job.pk).update(available_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual([j.id for j in jobs.claim_jobs(10)], [job.id])
+
+    def test_only_jobs_without_a_recent_heartbeat_are_requeued(self):
+        long_ago = timezone.now() - timedelta(seconds=jobs.STALE_AFTER_SECONDS + 60)
+        alive = self.enqueue("9191", "hi", status="PROCESSING", started_at=long_ago, heartbeat_at=long_ago)
+        dead = self.enqueue("9192", "hi", status="PROCESSING", started_at=long_ago, heartbeat_at=long_ago)
+        jobs.heartbeat([alive.id])
+        self.assertEqual(jobs.requeue_stale_jobs(), 1)
+        self.assertEqual(InboundMessage.objects.get(pk=alive.pk).status, "PROCESSING")
+        self.assertEqual(InboundMessage.objects.get(pk=dead.pk).status, "PENDING")
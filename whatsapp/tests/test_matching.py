@@ -0,0 +1,88 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from whatsapp import match_index
+from whatsapp.match_index import PropertyMatchIndex
+from whatsapp.matching import buyer_preferences, find_matching_properties, find_matching_properties_sql
+from whatsapp.models import Lead, Property
+
+
+def buyer(**answers):
+    data = {
+        "property_type_preference": "Apartment",
+        "location_preference": "Kondapur",
+        "bhk": "2BHK",
+        "area_preference": "1000-1500",
+        "budget": "70-90 lakhs",
+        "amenities": "Gym",
+    }
+    data.update(answers)
+    return Lead(phone="919000000100", lead_type="BUYER", data=data)
+
+
+class MatchingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = Lead.objects.create(phone="919000000200", lead_type="SELLER", data={"drive_link": "https://drive/x"})
+
+        def listing(**fields):
+            values = dict(property_type="Apartment", area_sqft="1200", bhk="2 BHK", location="Kondapur",
+                          price_range="80L", amenities="Gym, Lift")
+            values.update(fields)
+            return Property.objects.create(SELLER=cls.seller, **values)
+
+        cls.best = listing()
+        cls.no_gym = listing(amenities="Lift")
+        cls.unparsed_price = listing(price_range="80 lakhs negotiable")
+        cls.elsewhere = listing(location="Uppal")
+        cls.too_dear = listing(price_range="3 Cr")
+        cls.plot = listing(property_type="Plot")
+
+    def ids(self, matches):
+        return [m.id for m in matches]
+
+    def test_ranked_filtered_search(self):
+        matches = find_matching_properties_sql(buyer_preferences(buyer()))
+        self.assertEqual(self.ids(matches), [self.best.id, self.no_gym.id, self.unparsed_price.id])
+
+    def test_unparsed_listing_ranks_after_parsed_ones(self):
+        matches = find_matching_properties_sql(buyer_preferences(buyer()), limit=2)
+        self.assertNotIn(self.unparsed_price.id, self.ids(matches))
+
+    def test_city_level_location_does_not_narrow(self):
+        matches = find_matching_properties_sql(buyer_preferences(buyer(location_preference="Hyderabad")), limit=10)
+        self.assertIn(self.elsewhere.id, self.ids(matches))
+
+    def test_index_agrees_with_sql(self):
+        index = PropertyMatchIndex()
+        index.build()
+        for answers in ({}, {"location_preference": "Hyderabad"}, {"bhk": "3BHK"}, {"budget": "2-4 Cr"}):
+            prefs = buyer_preferences(buyer(**answers))
+            with self.subTest(answers=answers):
+                self.assertEqual(self.ids(index.query(prefs, limit=10)), self.ids(find_matching_properties_sql(prefs, limit=10)))
+
+    def test_index_follows_saves_and_deletes(self):
+        index = PropertyMatchIndex()
+        index.build()
+        prefs = buyer_preferences(buyer())
+        with mock.patch.object(match_index, "property_index", index):
+            with self.captureOnCommitCallbacks(execute=True):
+                new = Property.objects.create(SELLER=self.seller, property_type="Apartment", area_sqft="1100",
+                                              bhk="2 BHK", location="Kondapur", price_range="75L", amenities="Gym")
+            self.assertIn(new.id, self.ids(index.query(prefs, limit=10)))
+            self.assertEqual(index.get(new.id).drive_link, "https://drive/x")
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.best.is_active = False
+                self.best.save()
+                new.delete()
+            self.assertEqual(self.ids(index.query(prefs, limit=10)), self.ids(find_matching_properties_sql(prefs, limit=10)))
+            self.assertNotIn(self.best.id, self.ids(index.query(prefs, limit=10)))
+
+    @override_settings(PROPERTY_MATCH_BACKEND="sql", PROPERTY_MATCH_RADIUS_KM=5)
+    def test_neighbours_fill_without_repeats(self):
+        matches = find_matching_properties(buyer_preferences(buyer(location_preference="Hitech City")), limit=5)
+        self.assertEqual(len(self.ids(matches)), len(set(self.ids(matches))))
+        self.assertIn(self.best.id, self.ids(matches))
+        self.assertNotIn(self.elsewhere.id, self.ids(matches))
@@ -0,0 +1,47 @@
+from unittest import mock
+
+import requests
+from django.test import TestCase
+from urllib3.exceptions import MaxRetryError, NewConnectionError, ProtocolError
+
+from whatsapp.models import OutboundMessage
+from whatsapp.outbox import TokenBucket, dispatch_pending
+
+
+def http_response(status):
+    response = requests.Response()
+    response.status_code = status
+    response._content = b"{}"
+    return response
+
+
+class DeliveryRetryTests(TestCase):
+    def setUp(self):
+        self.message = OutboundMessage.objects.create(phone="9190", payload={"to": "9190"})
+
+    def dispatch(self, **outcome):
+        with mock.patch("whatsapp.utils.post_message", **outcome):
+            dispatch_pending(TokenBucket(1000, 1000))
+        self.message.refresh_from_db()
+        return self.message
+
+    def test_rate_limited_send_is_retried(self):
+        message = self.dispatch(return_value=http_response(429))
+        self.assertEqual((message.status, message.attempts), ("PENDING", 1))
+        self.assertIsNotNone(message.next_attempt_at)
+
+    def test_refused_connection_is_retried(self):
+        refused = requests.exceptions.ConnectionError(MaxRetryError(None, "/", NewConnectionError(None, "refused")))
+        self.assertEqual(self.dispatch(side_effect=refused).status, "PENDING")
+
+    def test_send_that_may_have_gone_out_is_not_resent(self):
+        dropped = requests.exceptions.ConnectionError(ProtocolError("Connection aborted."))
+        for outcome in (
+            {"return_value": http_response(500)},
+            {"side_effect": requests.exceptions.ReadTimeout("read timed out")},
+            {"side_effect": dropped},
+        ):
+            self.message.status, self.message.attempts = "PENDING", 0
+            self.message.save()
+            message = self.dispatch(**outcome)
+            self.assertEqual((message.status, message.attempts), ("FAILED", 1), outcome)
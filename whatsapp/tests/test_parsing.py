@@ -0,0 +1,57 @@
+from django.test import SimpleTestCase, TestCase
+
+from whatsapp.models import Lead
+from whatsapp.parsing import (
+    AMENITY_BITS,
+    amenity_mask,
+    format_price,
+    lead_data_fields,
+    parse_area_range,
+    parse_bhk,
+    parse_price_range,
+    parse_property_type,
+)
+
+
+class ParserTests(SimpleTestCase):
+    def test_bhk(self):
+        self.assertEqual(parse_bhk("2bhk"), 2)
+        self.assertEqual(parse_bhk("3 BHK"), 3)
+        self.assertEqual(parse_bhk("two bedrooms"), 2)
+        self.assertIsNone(parse_bhk("2.5 BHK"))
+        self.assertIsNone(parse_bhk(None))
+
+    def test_area(self):
+        self.assertEqual(parse_area_range("1200 sqft"), (1200, 1200))
+        self.assertEqual(parse_area_range("1000-1500 sq.ft"), (1000, 1500))
+        self.assertIsNone(parse_area_range("big"))
+
+    def test_price(self):
+        self.assertEqual(parse_price_range("50 lakhs"), (5_000_000, 5_000_000))
+        self.assertEqual(parse_price_range("50-60 lakhs"), (5_000_000, 6_000_000))
+        self.assertEqual(parse_price_range("80 lakh to 1.2 cr"), (8_000_000, 12_000_000))
+        self.assertIsNone(parse_price_range("negotiable"))
+        self.assertEqual(format_price((8_000_000, 12_000_000)), "80L-1.2Cr")
+
+    def test_property_type_and_amenities(self):
+        self.assertEqual(parse_property_type("Apartment"), "Apartment")
+        self.assertEqual(amenity_mask("Gym, Lift and bowling"), AMENITY_BITS["Gym"] | AMENITY_BITS["Lift"])
+
+    def test_lead_data_fields_read_buyer_and_seller_keys(self):
+        buyer = lead_data_fields({"location_preference": "Kondapur", "budget": "70-90 lakhs", "bhk": "2BHK"})
+        seller = lead_data_fields({"location": "Kondapur", "price_range": "80L", "bhk": "2BHK"})
+        self.assertEqual(buyer["location"], "Kondapur")
+        self.assertEqual((buyer["min_price"], buyer["max_price"]), (7_000_000, 9_000_000))
+        self.assertEqual(seller["budget"], "80L")
+        self.assertEqual(seller["locality"], buyer["locality"])
+        self.assertEqual(seller["bhk_count"], 2)
+
+
+class LeadDataColumnTests(TestCase):
+    def test_partial_save_of_data_writes_the_columns(self):
+        lead = Lead.objects.create(phone="919000000600", lead_type="BUYER")
+        lead.data["budget"] = "70-90 lakhs"
+        lead.save(update_fields=["data"])
+        row = Lead.objects.get(pk=lead.pk)
+        self.assertEqual(row.budget, "70-90 lakhs")
+        self.assertEqual((row.min_price, row.max_price), (7_000_000, 9_000_000))
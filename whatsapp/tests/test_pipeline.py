@@ -0,0 +1,74 @@
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from whatsapp.models import Lead, Property
+from whatsapp.pipeline import Pipeline, PipelineError
+from whatsapp.views import complete_seller_listing
+
+
+class PipelineTests(SimpleTestCase):
+    def build(self, calls):
+        def record(name, value):
+            calls.append(name)
+            return value
+
+        return (
+            Pipeline("test")
+            .stage("a", lambda: record("a", 1))
+            .stage("b", lambda: record("b", 2))
+            .stage("sum", lambda a, b: record("sum", a + b), after=["a", "b"])
+        )
+
+    def test_dependencies_get_results(self):
+        calls = []
+        result = self.build(calls).run()
+        self.assertEqual(result["sum"], 3)
+        self.assertEqual(calls, ["a", "b", "sum"])
+
+    @override_settings(PIPELINE_WORKERS=2)
+    def test_concurrent_run_matches_serial(self):
+        calls = []
+        result = self.build(calls).run()
+        self.assertEqual(result["sum"], 3)
+        self.assertEqual(calls[-1], "sum")
+
+    @override_settings(PIPELINE_WORKERS=2)
+    def test_independent_stages_overlap(self):
+        both_started = threading.Barrier(2, timeout=5)
+        pipeline = Pipeline("overlap").stage("a", both_started.wait).stage("b", both_started.wait)
+        self.assertEqual(pipeline.run().errors, {})
+
+    def test_failed_stage_skips_dependents(self):
+        def fail():
+            raise RuntimeError("boom")
+
+        result = Pipeline("test").stage("a", fail).stage("b", lambda a: a, after=["a"]).stage("c", lambda: 1).run()
+        self.assertEqual(result.skipped, ["b"])
+        self.assertEqual(result["c"], 1)
+        with self.assertRaises(PipelineError):
+            result.raise_for_errors()
+
+    def test_unknown_dependency(self):
+        with self.assertRaises(ValueError):
+            Pipeline("test").stage("b", lambda a: a, after=["a"])
+
+
+# Stages run serially here: worker threads would need their own connections to the test transaction
+@override_settings(PIPELINE_WORKERS=0, LEAD_SCORING_MODE="deferred", BUYER_ALERTS_ENABLED=False)
+class SellerCompletionTests(TestCase):
+    def test_drive_link_reaches_sheet_and_replies_keep_order(self):
+        lead = Lead.objects.create(phone="919000000400", lead_type="SELLER", data={"name": "Ravi", "location": "Kondapur"})
+        sent = []
+        with mock.patch("whatsapp.views.get_upload_link", return_value="https://drive/folder"), \
+                mock.patch("whatsapp.views.add_lead_to_sheet") as add_to_sheet, \
+                mock.patch("whatsapp.views.send_whatsapp_message", side_effect=lambda phone, text: sent.append(text)):
+            complete_seller_listing(lead, lead.phone)
+
+        self.assertEqual(Property.objects.get(SELLER=lead).location, "Kondapur")
+        self.assertEqual(add_to_sheet.call_args.args[0].data["drive_link"], "https://drive/folder")
+        self.assertEqual(Lead.objects.get(pk=lead.pk).drive_link, "https://drive/folder")
+        self.assertEqual(len(sent), 2)
+        self.assertIn("https://drive/folder", sent[0])
+        self.assertIn("Property saved", sent[1])
@@ -0,0 +1,74 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from whatsapp.models import Lead
+from whatsapp.scoring import score_pending_leads
+from whatsapp.views import score_lead_now
+
+
+@override_settings(SHEETS_SYNC_MODE="deferred")
+class ScorerFailureTests(TestCase):
+    def setUp(self):
+        self.scored = Lead.objects.create(phone="9191", lead_type="BUYER", score_pending=True)
+        self.skipped = Lead.objects.create(phone="9192", lead_type="BUYER", score_pending=True)
+
+    def test_lead_the_scorer_fails_on_stays_pending(self):
+        with mock.patch("whatsapp.ai.scorer.score_leads", return_value={self.scored.id: (85, "PREMIUM", "", "GPT")}), \
+                mock.patch("whatsapp.ai.scorer.score_lead", side_effect=RuntimeError("model down")):
+            self.assertEqual(score_pending_leads(), 1)
+        self.scored.refresh_from_db()
+        self.skipped.refresh_from_db()
+        self.assertEqual((self.scored.score, self.scored.score_pending, self.scored.scored_by), (85, False, "GPT"))
+        self.assertEqual((self.skipped.score, self.skipped.segment, self.skipped.score_pending), (None, "INACTIVE", True))
+
+    def test_lead_saved_during_scoring_keeps_its_changes(self):
+        def score_while_the_buyer_answers(leads):
+            # The buyer changes their budget after the batch was read
+            lead = Lead.objects.get(pk=self.skipped.pk)
+            lead.data["budget"] = "1-1.5 Cr"
+            lead.save(update_fields=["data"])
+            return {self.scored.id: (85, "PREMIUM", "", "GPT"), self.skipped.id: (40, "PROSPECT", "", "GPT")}
+
+        with mock.patch("whatsapp.ai.scorer.score_leads", side_effect=score_while_the_buyer_answers):
+            self.assertEqual(score_pending_leads(), 1)
+        self.skipped.refresh_from_db()
+        self.assertEqual((self.skipped.budget, self.skipped.score, self.skipped.score_pending), ("1-1.5 Cr", None, True))
+        self.assertEqual(Lead.objects.get(pk=self.scored.pk).score, 85)
+
+    def test_failed_batch_stays_pending(self):
+        with mock.patch("whatsapp.ai.scorer.score_leads", side_effect=RuntimeError("model down")):
+            self.assertEqual(score_pending_leads(), 0)
+        self.assertEqual(Lead.objects.filter(score_pending=True).count(), 2)
+
+    @override_settings(LEAD_SCORING_MODE="inline")
+    def test_inline_failure_is_queued_not_scored(self):
+        lead = Lead(phone="9193", lead_type="SELLER")
+        with mock.patch("whatsapp.views.score_lead", side_effect=RuntimeError("model down")):
+            self.assertIsNone(score_lead_now(lead))
+        self.assertTrue(lead.score_pending)
+        self.assertIsNone(lead.score)
+
+
+@override_settings(SHEETS_SYNC_MODE="deferred", LEAD_SCORER_BACKEND="hybrid", LEAD_SCORER_BORDERLINE_MARGIN=5)
+class ScoredByTests(TestCase):
+    def test_hybrid_records_which_backend_scored_each_lead(self):
+        clear = Lead.objects.create(phone="9194", lead_type="BUYER", score_pending=True)
+        borderline = Lead.objects.create(phone="9195", lead_type="BUYER", score_pending=True)
+        local = {clear.id: (90, "PREMIUM", ""), borderline.id: (51, "ACTIVE", "")}
+        with mock.patch("whatsapp.ai.scorer.score_lead_locally", side_effect=lambda lead: local[lead.id]), \
+                mock.patch("whatsapp.ai.scorer.ai_score_leads", return_value={borderline.id: (45, "PROSPECT", "")}):
+            self.assertEqual(score_pending_leads(), 2)
+        self.assertEqual(
+            dict(Lead.objects.values_list("phone", "scored_by")), {"9194": "LOCAL", "9195": "GPT"}
+        )
+
+    def test_calibration_compares_against_gpt_scores_only(self):
+        Lead.objects.create(phone="9196", lead_type="BUYER", score=80, segment="PREMIUM", scored_by="GPT")
+        Lead.objects.create(phone="9197", lead_type="BUYER", score=80, segment="PREMIUM", scored_by="LOCAL")
+        Lead.objects.create(phone="9198", lead_type="BUYER", score=80, segment="PREMIUM")
+        out = StringIO()
+        call_command("calibrate_lead_scorer", stdout=out)
+        self.assertIn("leads compared:        1 ", out.getvalue())
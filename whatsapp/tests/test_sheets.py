@@ -0,0 +1,82 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from whatsapp import sheets
+from whatsapp.models import Lead, SheetRow
+
+
+class FakeSheet:
+    """The few worksheet calls the bulk sync makes, over an in-memory grid."""
+
+    def __init__(self, updated_range=True):
+        self.rows = [["Lead Type", "Name", "Phone"]]
+        self.updated_range = updated_range
+
+    def col_values(self, col):
+        return [row[col - 1] if len(row) >= col else "" for row in self.rows]
+
+    def batch_get(self, ranges):
+        return [[[self.rows[int(cell[1:]) - 1][2]]] if int(cell[1:]) <= len(self.rows) else [] for cell in ranges]
+
+    def batch_update(self, updates):
+        for update in updates:
+            self.rows[int(update["range"].split(":")[0][1:]) - 1] = update["values"][0]
+
+    def append_rows(self, values):
+        first = len(self.rows) + 1
+        self.rows.extend(values)
+        if not self.updated_range:
+            return {"spreadsheetId": "sheet"}
+        return {"updates": {"updatedRange": f"Sheet1!A{first}:R{len(self.rows)}"}}
+
+    def phones(self):
+        return self.col_values(3)[1:]
+
+
+class SheetSyncTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(sheets, "_last_reconcile", None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def sync(self, sheet, leads):
+        with mock.patch.object(sheets, "get_worksheet", return_value=sheet):
+            return sheets.sync_leads_to_sheet(leads)
+
+    def test_appended_rows_are_indexed_and_updated_in_place(self):
+        sheet = FakeSheet()
+        lead = Lead.objects.create(phone="919000000700", lead_type="BUYER")
+        self.sync(sheet, [lead])
+        self.assertEqual(SheetRow.objects.get(phone=lead.phone).row, 2)
+        self.sync(sheet, [lead])
+        self.assertEqual(sheet.phones(), [lead.phone])
+
+    def test_append_without_a_range_reads_the_rows_back(self):
+        sheet = FakeSheet(updated_range=False)
+        first = Lead.objects.create(phone="919000000701", lead_type="BUYER")
+        second = Lead.objects.create(phone="919000000702", lead_type="SELLER")
+        self.assertTrue(self.sync(sheet, [first, second]))
+        self.assertEqual(dict(SheetRow.objects.values_list("phone", "row")), {first.phone: 2, second.phone: 3})
+        self.sync(sheet, [first, second])
+        self.assertEqual(sheet.phones(), [first.phone, second.phone])
+
+    def test_failed_read_back_re_reads_before_the_next_write(self):
+        sheet = FakeSheet(updated_range=False)
+        lead = Lead.objects.create(phone="919000000703", lead_type="BUYER")
+        # The first sync's own read works; the read after the append does not
+        real = sheets.reconcile_row_index
+        calls = []
+
+        def flaky(sheet=None):
+            calls.append(sheet)
+            if len(calls) == 2:
+                raise RuntimeError("quota")
+            return real(sheet)
+
+        with mock.patch.object(sheets, "reconcile_row_index", side_effect=flaky):
+            self.assertTrue(self.sync(sheet, [lead]))
+        self.assertFalse(SheetRow.objects.filter(phone=lead.phone).exists())
+        self.assertIsNone(sheets._last_reconcile)
+        self.sync(sheet, [lead])
+        self.assertEqual(sheet.phones(), [lead.phone])
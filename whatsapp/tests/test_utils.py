@@ -0,0 +1,44 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import TestCase, mock
+
+from whatsapp import utils
+
+
+class _Handler(BaseHTTPRequestHandler):
+    status = 500
+    hits = 0
+
+    def do_POST(self):
+        type(self).hits += 1
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self.send_response(self.status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class SendRetryTests(TestCase):
+    def setUp(self):
+        _Handler.hits = 0
+        self.server = HTTPServer(("127.0.0.1", 0), _Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        patcher = mock.patch.multiple(utils, _session=None, API_BASE_URL=f"http://127.0.0.1:{self.server.server_port}")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_server_error_is_not_resent(self):
+        # The message may have been accepted before the 5xx
+        response = utils.post_message({"to": "9190"})
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(_Handler.hits, 1)
+
+    def test_only_connect_errors_and_rate_limits_are_retried(self):
+        retry = utils.get_session().get_adapter("https://graph.facebook.com").max_retries
+        self.assertEqual(retry.read, 0)
+        self.assertEqual(retry.connect, utils.RETRY_TOTAL)
+        self.assertEqual(tuple(retry.status_forcelist), (429,))
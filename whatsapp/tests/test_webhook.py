@@ -0,0 +1,49 @@
+import json
+from unittest import TestCase, mock
+
+from django.test import TestCase as DjangoTestCase
+
+from whatsapp.models import OutboundMessage
+from whatsapp.outbox import record_statuses
+from whatsapp.webhook import group_by_phone, parse_webhook_payload
+
+
+def payload(*messages):
+    return {"entry": [{"changes": [{"value": {"messages": list(messages)}}]}]}
+
+
+def text_message(message_id, timestamp, body):
+    return {"id": message_id, "from": "9190", "type": "text", "timestamp": timestamp, "text": {"body": body}}
+
+
+class ParseWebhookTests(TestCase):
+    def test_malformed_timestamp_only_affects_its_message(self):
+        messages, _ = parse_webhook_payload(payload(
+            text_message("wamid.1", "1700000002", "second"),
+            text_message("wamid.2", "not-a-number", "bad"),
+            text_message("wamid.3", "1700000001", "first"),
+            text_message("wamid.4", None, "missing"),
+        ))
+        self.assertEqual([m["timestamp"] for m in messages], [1700000002, 0, 1700000001, 0])
+        ordered = group_by_phone(messages)["9190"]
+        self.assertEqual([m["text"] for m in ordered], ["bad", "missing", "first", "second"])
+
+
+class StatusCallbackTests(DjangoTestCase):
+    def setUp(self):
+        self.sent = OutboundMessage.objects.create(phone="9190", payload={}, status="SENT", wa_message_id="wamid.out")
+
+    def test_malformed_status_timestamp_falls_back_to_now(self):
+        self.assertEqual(record_statuses([{"id": "wamid.out", "status": "delivered", "timestamp": "bad"}]), 1)
+        self.sent.refresh_from_db()
+        self.assertEqual(self.sent.status, "DELIVERED")
+        self.assertIsNotNone(self.sent.delivered_at)
+
+    def test_failed_status_recording_does_not_drop_messages(self):
+        body = payload(text_message("wamid.5", "1700000001", "hi"))
+        body["entry"][0]["changes"][0]["value"]["statuses"] = [{"id": "wamid.out", "status": "read", "timestamp": "1"}]
+        with mock.patch("whatsapp.views.record_statuses", side_effect=ValueError("bad status")), \
+                mock.patch("whatsapp.views.dispatch_messages") as dispatch:
+            response = self.client.post("/whatsapp/webhook/", json.dumps(body), content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([m["id"] for m in dispatch.call_args.args[0]], ["wamid.5"])
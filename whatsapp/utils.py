@@ -19,36 +19,73 @@
 #     response = requests.post(url, headers=headers, json=payload)
 #     print("📤 Sent Message Response:", response.json())
 #     return response.json()
-import os, requests, json
+import asyncio
+import json
+import os
+import random
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError
+from urllib3.util.retry import Retry
+
+try:
+    import httpx
+except ImportError:  # async client is optional
+    httpx = None
 
 WHATSAPP_TOKEN = os.getenv("WHATSAPP_ACCESS_TOKEN")
 PHONE_NUMBER_ID = os.getenv("WHATSAPP_PHONE_NUMBER_ID")
+API_VERSION = os.getenv("WHATSAPP_API_VERSION", "v20.0")
+API_BASE_URL = os.getenv("WHATSAPP_API_BASE_URL", "https://graph.facebook.com")
 
-def send_whatsapp_message(phone, message):
-    url = f"https://graph.facebook.com/v20.0/{PHONE_NUMBER_ID}/messages"
-    
-    headers = {
+# (connect, read) seconds
+REQUEST_TIMEOUT = (
+    float(os.getenv("WHATSAPP_CONNECT_TIMEOUT", "3.05")),
+    float(os.getenv("WHATSAPP_READ_TIMEOUT", "10")),
+)
+POOL_SIZE = int(os.getenv("WHATSAPP_HTTP_POOL_SIZE", "20"))
+RETRY_TOTAL = int(os.getenv("WHATSAPP_HTTP_RETRIES", "3"))
+RETRY_BACKOFF = float(os.getenv("WHATSAPP_HTTP_BACKOFF", "0.5"))
+# Sends are POSTs and not idempotent: a read timeout or a 5xx may come after
+# WhatsApp accepted the message, so only failures where it certainly did not
+# (connection refused/reset before sending, 429 rate limit) are retried
+RETRY_STATUSES = (429,)
+
+
+def is_connect_error(exc):
+    """True if a send failed before the request went out (connect refused or timed out), so resending is safe."""
+    if isinstance(exc, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(exc.args[0], "reason", None) if isinstance(exc, requests.exceptions.ConnectionError) and exc.args else None
+    # urllib3's NewConnectionError (refused, DNS) is a ConnectTimeoutError
+    return isinstance(reason, ConnectTimeoutError)
+
+
+def messages_url():
+    return f"{API_BASE_URL}/{API_VERSION}/{PHONE_NUMBER_ID}/messages"
+
+
+def auth_headers():
+    return {
         "Authorization": f"Bearer {WHATSAPP_TOKEN}",
         "Content-Type": "application/json"
     }
-    data = {
+
+
+# ======== PAYLOADS ========
+def text_payload(phone, message):
+    return {
         "messaging_product": "whatsapp",
         "to": phone,
         "type": "text",
         "text": {"body": message}
     }
 
-    response = requests.post(url, headers=headers, data=json.dumps(data))
-    print("📤 WA Response:", response.text)
 
-def send_whatsapp_buttons(to, text, buttons):
-    url = f"https://graph.facebook.com/v20.0/{PHONE_NUMBER_ID}/messages"
-    headers = {
-        "Authorization": f"Bearer {WHATSAPP_TOKEN}",
-        "Content-Type": "application/json"
-    }
-
-    payload = {
+def buttons_payload(to, text, buttons):
+    return {
         "messaging_product": "whatsapp",
         "to": to,
         "type": "interactive",
@@ -64,14 +101,142 @@ def send_whatsapp_buttons(to, text, buttons):
         }
     }
 
+
+# ======== POOLED SYNC CLIENT ========
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Process-wide keep-alive session for graph.facebook.com.
+
+    Connections are pooled, so consecutive sends skip TCP/TLS setup. Connect
+    errors and 429 responses are retried with exponential backoff, honouring
+    Retry-After; read errors and 5xx are not, since the message may have gone out.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                retry = Retry(
+                    total=RETRY_TOTAL,
+                    connect=RETRY_TOTAL,
+                    read=0,
+                    other=0,
+                    backoff_factor=RETRY_BACKOFF,
+                    status_forcelist=RETRY_STATUSES,
+                    allowed_methods=frozenset(["POST"]),
+                    respect_retry_after_header=True,
+                    raise_on_status=False,
+                )
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE, max_retries=retry)
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update(auth_headers())
+                _session = session
+    return _session
+
+
+def post_message(payload):
+    return get_session().post(messages_url(), data=json.dumps(payload), timeout=REQUEST_TIMEOUT)
+
+
+def _enqueue_if_outbox(phone, payload):
+    """In outbox mode, store the message for the rate-limited dispatcher instead of sending."""
+    from .outbox import enqueue_outbound, outbound_mode
+
+    if outbound_mode() != "outbox":
+        return None
+    return enqueue_outbound(phone, payload)
+
+
+def send_whatsapp_message(phone, message):
+    if _enqueue_if_outbox(phone, text_payload(phone, message)):
+        return None
     try:
-        response = requests.post(url, headers=headers, data=json.dumps(payload))
+        response = post_message(text_payload(phone, message))
+        print("📤 WA Response:", response.text)
+        return response
+    except requests.RequestException as e:
+        print(f"❌ Error sending message to {phone}: {e}")
+        return None
+
+def send_whatsapp_buttons(to, text, buttons):
+    if _enqueue_if_outbox(to, buttons_payload(to, text, buttons)):
+        return None
+    try:
+        response = post_message(buttons_payload(to, text, buttons))
         print(f"📤 Buttons sent to {to}: Status={response.status_code}")
         if response.status_code != 200:
             print(f"❌ Button send error: {response.text}")
         else:
             print(f"✅ Buttons sent successfully: {response.json()}")
+        return response
     except Exception as e:
         print(f"❌ Error sending buttons: {e}")
         import traceback
-        traceback.print_exc()
\ No newline at end of file
+        traceback.print_exc()
+        return None
+
+
+# ======== ASYNC CLIENT ========
+class AsyncWhatsAppClient:
+    """
+    httpx-based async sender sharing one keep-alive connection pool.
+
+    Usage:
+        async with AsyncWhatsAppClient() as client:
+            await client.send_conversation(phone, [payload1, payload2])
+    """
+
+    def __init__(self, max_connections=POOL_SIZE, timeout=REQUEST_TIMEOUT, retries=RETRY_TOTAL, backoff=RETRY_BACKOFF):
+        if httpx is None:
+            raise ImportError("AsyncWhatsAppClient requires httpx (pip install httpx)")
+        connect_timeout, read_timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._client = httpx.AsyncClient(
+            headers=auth_headers(),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+
+    async def post(self, payload):
+        body = json.dumps(payload)
+        for attempt in range(self.retries + 1):
+            response = await self._client.post(messages_url(), content=body)
+            if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                return response
+            retry_after = response.headers.get("Retry-After")
+            delay = float(retry_after) if retry_after and retry_after.isdigit() else self.backoff * (2 ** attempt)
+            await asyncio.sleep(delay + random.uniform(0, self.backoff / 2))
+
+    async def send_text(self, phone, message):
+        return await self.post(text_payload(phone, message))
+
+    async def send_buttons(self, to, text, buttons):
+        return await self.post(buttons_payload(to, text, buttons))
+
+    async def send_conversation(self, phone, payloads):
+        """Send one recipient's messages in order over the pooled connection."""
+        return [await self.post(payload) for payload in payloads]
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+
+def send_conversation(phone, payloads):
+    """Sync helper: deliver several payloads to one phone through the async client."""
+    async def _run():
+        async with AsyncWhatsAppClient() as client:
+            return await client.send_conversation(phone, payloads)
+
+    return asyncio.run(_run())
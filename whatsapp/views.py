@@ -7,13 +7,27 @@ from datetime import datetime
 
 from .utils import send_whatsapp_message
 from .utils import send_whatsapp_buttons
-from .models import Lead, ConversationState, Property
+from .models import Property
+from .alerts import alerts_enabled, close_buyer_query, save_buyer_query
+from .gazetteer import locality_key
+from .locks import conversation_lock
+from .outbox import record_statuses
+from .conversation import ConversationEngine
+from .flows import COMPLETED_STEP, FLOWS, SELECTION_STEP
+from .pipeline import Pipeline
+from .matching import buyer_preferences, find_matching_properties, format_listing, get_listing, listing_details
+from .scoring import SCORE_FIELDS, apply_score, request_scoring, scoring_mode
+from .webhook import parse_webhook_payload, dispatch_messages
 
 # Sheets Sync   
 from whatsapp.sheets import add_lead_to_sheet, update_buyer_property_selection
 
 # Drive Upload Link
-from whatsapp.drive import create_drive_folder
+from whatsapp.drive import get_upload_link
+
+# AI helpers are cheap to import; clients and agents are built on first use
+from whatsapp.ai.normalizer import normalize_answer
+from whatsapp.ai.scorer import score_lead
 
 VERIFY_TOKEN = os.getenv('WHATSAPP_VERIFY_TOKEN', 'dheeraj-secret-token')
 
@@ -21,419 +35,244 @@ VERIFY_TOKEN = os.getenv('WHATSAPP_VERIFY_TOKEN', 'dheeraj-secret-token')
 # ==================== PROPERTY MATCHING ====================
 
 def send_matching_properties_to_buyer(buyer_lead, phone):
-    buyer_data = buyer_lead.data or {}
-    b_type = (buyer_data.get("property_type_preference") or "").lower()
-    b_loc = (buyer_data.get("location_preference") or "").lower()
-
-    qs = Property.objects.all()
-
-    if b_type:
-        qs = qs.filter(property_type__icontains=b_type)
+    prefs = buyer_preferences(buyer_lead)
+    props = find_matching_properties(prefs, limit=5)  # max 5 matches
 
-    if b_loc:
-        qs = qs.filter(location__icontains=b_loc)
-
-    props = list(qs[:5])  # max 5 matches
+    # Keep searching: listings added later are offered to the buyer (BUYER_ALERTS_ENABLED)
+    save_buyer_query(buyer_lead, prefs)
 
     if not props:
-        send_whatsapp_message(phone, "🔍 No exact matches found! Our team will assist you shortly.")
+        if alerts_enabled():
+            send_whatsapp_message(phone, "🔍 No exact matches yet! We'll message you as soon as a matching property is listed.")
+        else:
+            send_whatsapp_message(phone, "🔍 No exact matches found! Our team will assist you shortly.")
         return
 
     # Store property IDs and details in buyer's data for later reference
     property_ids = [p.id for p in props]
-    property_details = {}
-    for p in props:
-        property_details[str(p.id)] = {
-            "property_id": p.id,
-            "seller_id": p.SELLER.id,
-            "property_type": p.property_type,
-            "area_sqft": p.area_sqft,
-            "bhk": p.bhk,
-            "location": p.location,
-            "price_range": p.price_range,
-            "amenities": p.amenities
-        }
+    property_details = {str(p.id): listing_details(p) for p in props}
     
     buyer_lead.data["matching_property_ids"] = property_ids
     buyer_lead.data["matching_properties"] = property_details
-    buyer_lead.save()
+    buyer_lead.save(update_fields=["data", "updated_at"])
 
-    lines = ["🎉 I found these matching properties:\n"]
+    if prefs["locality"] and any(p.locality != prefs["locality"] for p in props):
+        lines = ["🎉 I found these matching properties (including nearby areas):\n"]
+    else:
+        lines = ["🎉 I found these matching properties:\n"]
     for idx, p in enumerate(props, start=1):
-        lines.append(
-            f"{idx}) {p.bhk or ''} {p.property_type or ''}\n"
-            f"📐 {p.area_sqft or 'N/A'} sq.ft\n"
-            f"📍 {p.location or 'N/A'}\n"
-            f"💰 {p.price_range or 'N/A'}\n"
-            f"🛠 Amenities: {p.amenities or 'N/A'}\n"
-        )
+        lines.append(format_listing(idx, p))
 
     lines.append("👉 Reply with the property number (1, 2, 3...) if interested.")
     send_whatsapp_message(phone, "\n".join(lines))
 
 
-# ==================== STATE MACHINE ====================
-
-def handle_message(phone, text):
-    from whatsapp.ai.normalizer import normalize_answer
-    from whatsapp.ai.scorer import ai_score_lead
-
-    lead, _ = Lead.objects.get_or_create(phone=phone)
-    state, _ = ConversationState.objects.get_or_create(phone=phone)
-
-    # Process text input (button responses are already extracted in webhook)
-    txt = text.strip().lower()
-    print(f"📥 Processing message: '{text}' -> '{txt}' | Current step: {state.current_step} | Lead type: {lead.lead_type}")
-
-    # ==================== GREETING + FRESH START ====================
-    greetings = ["hi", "hii", "hello", "hey", "start", "yo", "hola"]
-    if txt in greetings:
-        lead.lead_type = ""
-        lead.data = {}
-        lead.status = "NEW"
-        lead.save()
-
-        send_whatsapp_buttons(
-            phone,
-            "👋 Welcome to *Dheeraj Properties!*\nHow can we help you today?",
-            ["BUY", "SELL"]
-        )
-        state.current_step = "ASK_BUY_OR_SELL"
-        state.save()
-        return
-
-    # ==================== ALREADY COMPLETED ====================
-    if state.current_step == "COMPLETED":
-        send_whatsapp_message(phone, "🙏 Thank you! Type *Hi* to start a new inquiry.")
-        return
-
-    # ==================== ASK BUY OR SELL ====================
-    if state.current_step == "ASK_BUY_OR_SELL" or state.current_step == "INIT":
-        # BUY SELECTED
-        if "buy" in txt or txt == "buy":
-            print(f"✅ BUY selected, setting lead type to BUYER")
-            lead.lead_type = "BUYER"
-            lead.data = {}
-            lead.save()
-            print(f"📤 Sending property type buttons to {phone}...")
-            send_whatsapp_buttons(
-                phone,
-                "Great! 🏡 What type of property are you looking for?",
-                ["Apartment", "House", "Plot"]
-            )
-            state.current_step = "BUY_Q1"
-            state.save()
-            print(f"✅ State updated to BUY_Q1, buttons should be sent")
-            return
-
-        # SELL SELECTED
-        elif "sell" in txt or txt == "sell":
-            print(f"✅ SELL selected, setting lead type to SELLER")
-            lead.lead_type = "SELLER"
-            lead.data = {}
-            lead.save()
-            send_whatsapp_buttons(
-                phone,
-                "Awesome! 🏠 What type of property are you selling?",
-                ["Apartment", "House", "Plot"]
-            )
-            state.current_step = "SELL_Q1"
-            state.save()
-            print(f"✅ State updated to SELL_Q1")
-            return
-
-        # INVALID INPUT - resend buttons
-        print(f"❌ Invalid input in ASK_BUY_OR_SELL: '{txt}' (state: {state.current_step})")
-        send_whatsapp_buttons(
-            phone,
-            "❓ Please select one:",
-            ["BUY", "SELL"]
+# ==================== LEAD SCORING ====================
+
+def score_lead_now(lead):
+    """
+    Score a completed lead inline, or queue it for the batch scorer.
+
+    Returns the segment, or None when scoring was deferred. If the scorer
+    fails the lead is queued for the batch scorer instead of being given a
+    made-up score.
+    """
+    if scoring_mode() == "deferred":
+        request_scoring(lead)
+        return None
+
+    try:
+        score, segment, reason, scored_by = score_lead(lead)
+    except Exception as e:
+        print(f"❌ Inline scoring failed for {lead.phone}, queued for run_lead_scorer: {e}")
+        request_scoring(lead)
+        return None
+    apply_score(lead, score, segment, reason, scored_by)
+    return segment
+
+
+# ==================== SELLER COMPLETION ====================
+
+def complete_seller_listing(lead, phone):
+    """
+    Side effects of a finished seller conversation, run as a dependency graph
+    (concurrently with PIPELINE_WORKERS > 0). Only the Sheets row needs both
+    the score and the Drive link; the two replies keep their usual order.
+    """
+    def save_property():
+        return Property.objects.create(
+            SELLER=lead,
+            property_type=lead.data.get("property_type"),
+            area_sqft=lead.data.get("area_sqft"),
+            bhk=lead.data.get("bhk"),
+            location=lead.data.get("location"),
+            price_range=lead.data.get("price_range"),
+            amenities=lead.data.get("amenities"),
+            alerts_pending=alerts_enabled(),  # offered to waiting buyers by run_buyer_alerts
         )
-        # Ensure state is set correctly
-        if state.current_step != "ASK_BUY_OR_SELL":
-            state.current_step = "ASK_BUY_OR_SELL"
-            state.save()
-        return
 
+    def segment():
+        # Deferred mode leaves it to the batch scorer
+        segment = score_lead_now(lead)
+        lead.save(update_fields=SCORE_FIELDS)
+        return segment
+
+    def drive():
+        # With DRIVE_FOLDER_POOL_SIZE set this claims a pre-shared folder
+        folder_name = f"{lead.data.get('name', 'Seller')} - {lead.phone}"
+        return get_upload_link(lead, folder_name)
+
+    def sync_sheet(segment, drive):
+        if drive:
+            lead.data["drive_link"] = drive
+            lead.save(update_fields=["data", "updated_at"])
+            print(f"✅ Drive link stored for seller {lead.phone}: {drive}")
+        # Save to Sheets (now includes drive_link) - update existing row if it exists
+        add_lead_to_sheet(lead, update_existing=True)
+
+    def send_link(drive):
+        if drive:
+            send_whatsapp_message(phone, f"📁 Upload property media here:\n{drive}")
+
+    def send_saved(segment, send_link):
+        if segment:
+            send_whatsapp_message(phone, f"🎉 Property saved! Lead segment: *{segment}*.")
+        else:
+            send_whatsapp_message(phone, "🎉 Property saved! Our team will review your listing shortly.")
 
-    # ======================================================================
-    #  SELLER FLOW
-    # ======================================================================
-    if lead.lead_type == "SELLER":
+    result = (
+        Pipeline("Seller completion")
+        .stage("property", save_property)
+        .stage("segment", segment)
+        .stage("drive", drive)
+        .stage("sheets", sync_sheet, after=("segment", "drive"))
+        .stage("send_link", send_link, after=("drive",))
+        .stage("send_saved", send_saved, after=("segment", "send_link"))
+        .run()
+    )
+    result.raise_for_errors()
+    return result
 
-        if state.current_step == "SELL_Q1":
-            lead.data["property_type"] = normalize_answer("Property Type", txt)
-            lead.save()
-            send_whatsapp_message(phone, "📐 Enter the area in sq.ft:")
-            state.current_step = "SELL_Q2"
-            state.save()
-            return
 
-        if state.current_step == "SELL_Q2":
-            lead.data["area_sqft"] = normalize_answer("Area", txt)
-            lead.save()
-            send_whatsapp_buttons(phone, "🛏 Bedrooms?", ["1BHK", "2BHK", "3BHK"])
-            state.current_step = "SELL_Q3"
-            state.save()
-            return
+# ==================== FLOW ACTIONS ====================
 
-        if state.current_step == "SELL_Q3":
-            lead.data["bhk"] = normalize_answer("Bedrooms", txt)
-            lead.save()
-            send_whatsapp_message(phone, "🧾 May I have your name?")
-            state.current_step = "SELL_Q4"
-            state.save()
-            return
+def store_location_key(turn):
+    turn.set_data("location_key", locality_key(turn.lead.data["location_preference"]))
 
-        if state.current_step == "SELL_Q4":
-            lead.data["name"] = text.strip()
-            lead.save()
-            send_whatsapp_message(phone, "📍 Property location?")
-            state.current_step = "SELL_Q5"
-            state.save()
-            return
 
-        if state.current_step == "SELL_Q5":
-            lead.data["location"] = normalize_answer("Location", txt)
-            lead.save()
-            send_whatsapp_message(phone, "💰 Expected price range?")
-            state.current_step = "SELL_Q6"
-            state.save()
-            return
+def close_previous_search(turn):
+    # A new BUY/SELL inquiry replaces any buyer search still open
+    close_buyer_query(turn.lead)
 
-        if state.current_step == "SELL_Q6":
-            lead.data["price_range"] = normalize_answer("Price", txt)
-            lead.save()
-            send_whatsapp_buttons(phone, "🏷 Amenities?", ["Pool", "Gym", "Other"])
-            state.current_step = "SELL_Q7"
-            state.save()
-            return
 
-        if state.current_step == "SELL_Q7":
-            if txt == "other":
-                send_whatsapp_message(phone, "Type amenities (e.g., Power Backup, Garden, Lift):")
-                state.current_step = "SELL_Q7_OTHER"
-                state.save()
-                return
-
-            lead.data["amenities"] = normalize_answer("Amenities", txt)
-            lead.status = "NEW"
-            lead.save()
-
-            # Save Property
-            Property.objects.create(
-                SELLER=lead,
-                property_type=lead.data.get("property_type"),
-                area_sqft=lead.data.get("area_sqft"),
-                bhk=lead.data.get("bhk"),
-                location=lead.data.get("location"),
-                price_range=lead.data.get("price_range"),
-                amenities=lead.data.get("amenities"),
-            )
+def finish_seller_listing(turn):
+    complete_seller_listing(turn.lead, turn.phone)
+    return COMPLETED_STEP
 
-            # Score Lead
-            score, segment, reason = ai_score_lead(lead)
-            lead.score = score
-            lead.segment = segment
-            lead.rejection_reason = reason if segment == "INACTIVE" else ""
-            lead.status = "QUALIFIED" if segment in ["PREMIUM", "ACTIVE"] else "UNQUALIFIED"
-            lead.save()
 
-            # Create Google Drive Upload Link FIRST (before saving to sheets)
-            folder_name = f"{lead.data.get('name', 'Seller')} - {lead.phone}"
-            drive_link = create_drive_folder(folder_name)
+def complete_buyer_search(turn):
+    lead, phone = turn.lead, turn.phone
 
-            if drive_link:
-                lead.data["drive_link"] = drive_link
-                lead.save()
-                print(f"✅ Drive link stored for seller {lead.phone}: {drive_link}")
+    # Score Lead (deferred mode leaves it to the batch scorer)
+    segment = score_lead_now(lead)
+    lead.save(update_fields=SCORE_FIELDS)
 
-            # Save to Sheets (now includes drive_link) - update existing row if it exists
-            add_lead_to_sheet(lead, update_existing=True)
+    # Save To Sheets
+    add_lead_to_sheet(lead)
 
-            if drive_link:
-                send_whatsapp_message(phone, f"📁 Upload property media here:\n{drive_link}")
+    # Show matching properties
+    send_matching_properties_to_buyer(lead, phone)
+    if segment:
+        send_whatsapp_message(phone, f"🎉 Saved! Lead segment: *{segment}*.")
+    else:
+        send_whatsapp_message(phone, "🎉 Saved! Our team will review your requirements shortly.")
+    return SELECTION_STEP
 
-            send_whatsapp_message(phone, f"🎉 Property saved! Lead segment: *{segment}*.")
-            state.current_step = "COMPLETED"
-            state.save()
-            return
 
-        if state.current_step == "SELL_Q7_OTHER":
-            lead.data["amenities"] = normalize_answer("Amenities", txt)
-            state.current_step = "SELL_Q7"
-            state.save()
-            return handle_message(phone, txt)
+def select_property(turn):
+    lead, phone = turn.lead, turn.phone
+    # Parse user input to get property number
+    try:
+        property_number = int(turn.txt)
+    except ValueError:
+        send_whatsapp_message(phone, "❓ Please reply with a number (1, 2, 3...) to select a property.")
+        return
 
+    # Get stored matching properties
+    matching_ids = lead.data.get("matching_property_ids", [])
 
-    # ======================================================================
-    #  BUYER FLOW
-    # ======================================================================
-    if lead.lead_type == "BUYER":
+    if not matching_ids or property_number < 1 or property_number > len(matching_ids):
+        send_whatsapp_message(phone, f"❓ Invalid selection. Please choose a number between 1 and {len(matching_ids)}.")
+        return
 
-        if state.current_step == "BUY_Q1":
-            lead.data["property_type_preference"] = normalize_answer("Property Type", txt)
-            lead.save()
-            send_whatsapp_message(phone, "📏 Preferred area? (e.g., 1000–1500 sq.ft)")
-            state.current_step = "BUY_Q2"
-            state.save()
-            return
+    # Get the selected property ID (convert to 0-indexed)
+    selected_property_id = matching_ids[property_number - 1]
 
-        if state.current_step == "BUY_Q2":
-            lead.data["area_preference"] = normalize_answer("Area", txt)
-            lead.save()
-            send_whatsapp_buttons(phone, "🛏 Bedrooms needed?", ["1BHK", "2BHK", "3BHK"])
-            state.current_step = "BUY_Q3"
-            state.save()
+    try:
+        # Listing and the seller's drive link (from memory with the index backend)
+        selected_property, drive_link = get_listing(selected_property_id)
+        if selected_property is None:
+            send_whatsapp_message(phone, "❌ Selected property no longer exists. Please type 'Hi' to start over.")
             return
 
-        if state.current_step == "BUY_Q3":
-            lead.data["bhk"] = normalize_answer("Bedrooms", txt)
-            lead.save()
-            send_whatsapp_message(phone, "🧾 Your name?")
-            state.current_step = "BUY_Q4"
-            state.save()
-            return
+        # Store selection details in buyer's data; saved before the Sheets
+        # update, which may leave the write to run_sheet_sync
+        turn.set_data("selected_property_type", selected_property.property_type or "")
+        turn.set_data("selected_property_location", selected_property.location or "")
+        turn.set_data("selected_property_price", selected_property.price_range or "")
+        turn.set_data("selected_property_drive_link", drive_link)
+        turn.set_data("selection_timestamp", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        turn.save()
+
+        # Update buyer's row in sheets with selected property details
+        update_buyer_property_selection(lead, selected_property, drive_link)
+
+        details = (
+            f"✅ Great choice! Here's the property details:\n\n"
+            f"📐 Area: {selected_property.area_sqft or 'N/A'} sq.ft\n"
+            f"📍 Location: {selected_property.location or 'N/A'}\n"
+            f"💰 Price: {selected_property.price_range or 'N/A'}\n"
+            f"🛠 Amenities: {selected_property.amenities or 'N/A'}\n\n"
+        )
+        # Send drive link to buyer
+        if drive_link:
+            send_whatsapp_message(phone, details + f"📁 View property images/videos here:\n{drive_link}")
+        else:
+            send_whatsapp_message(
+                phone, details + "⚠️ Property images link not available yet. Our team will share it shortly."
+            )
 
-        if state.current_step == "BUY_Q4":
-            lead.data["name"] = text.strip()
-            lead.save()
-            send_whatsapp_message(phone, "📍 Preferred location?")
-            state.current_step = "BUY_Q5"
-            state.save()
-            return
+        send_whatsapp_message(phone, "🎉 Our team will contact you soon to proceed!")
+        close_buyer_query(lead)
+        turn.goto(COMPLETED_STEP)
 
-        if state.current_step == "BUY_Q5":
-            lead.data["location_preference"] = normalize_answer("Location", txt)
-            lead.save()
-            send_whatsapp_message(phone, "💰 Budget?")
-            state.current_step = "BUY_Q6"
-            state.save()
-            return
+    except Exception as e:
+        print(f"❌ Error handling property selection: {e}")
+        send_whatsapp_message(phone, "❌ An error occurred. Please try again or type 'Hi' to start over.")
 
-        if state.current_step == "BUY_Q6":
-            lead.data["budget"] = normalize_answer("Budget", txt)
-            lead.save()
-            send_whatsapp_buttons(phone, "🏷 Amenities needed?", ["Pool", "Gym", "Other"])
-            state.current_step = "BUY_Q7"
-            state.save()
-            return
 
-        if state.current_step == "BUY_Q7":
-            if txt == "other":
-                send_whatsapp_message(phone, "Type preferred amenities (e.g., Lift, Garden, Backup):")
-                state.current_step = "BUY_Q7_OTHER"
-                state.save()
-                return
-
-            lead.data["amenities"] = normalize_answer("Amenities", txt)
-            lead.status = "NEW"
-            lead.save()
-
-            # Score Lead
-            score, segment, reason = ai_score_lead(lead)
-            lead.score = score
-            lead.segment = segment
-            lead.rejection_reason = reason if segment == "INACTIVE" else ""
-            lead.status = "QUALIFIED" if segment in ["PREMIUM", "ACTIVE"] else "UNQUALIFIED"
-            lead.save()
-
-            # Save To Sheets
-            add_lead_to_sheet(lead)
-
-            # Show matching properties
-            send_matching_properties_to_buyer(lead, phone)
-            send_whatsapp_message(phone, f"🎉 Saved! Lead segment: *{segment}*.")
-            state.current_step = "BUY_PROPERTY_SELECTION"
-            state.save()
-            return
+# ==================== STATE MACHINE ====================
+# The buyer and seller questionnaires live in whatsapp.flows
+
+conversation_engine = ConversationEngine(
+    FLOWS,
+    actions={
+        "store_location_key": store_location_key,
+        "close_buyer_query": close_previous_search,
+        "complete_seller_listing": finish_seller_listing,
+        "complete_buyer_search": complete_buyer_search,
+        "select_property": select_property,
+    },
+    send_message=send_whatsapp_message,
+    send_buttons=send_whatsapp_buttons,
+    normalize=normalize_answer,
+)
 
-        if state.current_step == "BUY_Q7_OTHER":
-            lead.data["amenities"] = normalize_answer("Amenities", txt)
-            state.current_step = "BUY_Q7"
-            state.save()
-            return handle_message(phone, txt)
-
-        # Handle property selection
-        if state.current_step == "BUY_PROPERTY_SELECTION":
-            # Parse user input to get property number
-            try:
-                property_number = int(txt)
-            except ValueError:
-                send_whatsapp_message(phone, "❓ Please reply with a number (1, 2, 3...) to select a property.")
-                return
-            
-            # Get stored matching properties
-            matching_ids = lead.data.get("matching_property_ids", [])
-            matching_props = lead.data.get("matching_properties", {})
-            
-            if not matching_ids or property_number < 1 or property_number > len(matching_ids):
-                send_whatsapp_message(phone, f"❓ Invalid selection. Please choose a number between 1 and {len(matching_ids)}.")
-                return
-            
-            # Get the selected property ID (convert to 0-indexed)
-            selected_property_id = matching_ids[property_number - 1]
-            
-            try:
-                # Get the Property object
-                selected_property = Property.objects.get(id=selected_property_id)
-                
-                # Get the seller's lead to access drive_link
-                seller_lead = selected_property.SELLER
-                seller_data = seller_lead.data or {}
-                drive_link = seller_data.get("drive_link", "")
-                
-                # Store selection details in buyer's data
-                lead.data["selected_property_type"] = selected_property.property_type or ""
-                lead.data["selected_property_location"] = selected_property.location or ""
-                lead.data["selected_property_price"] = selected_property.price_range or ""
-                lead.data["selected_property_drive_link"] = drive_link
-                lead.data["selection_timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                lead.save()
-                
-                # Update buyer's row in sheets with selected property details
-                update_buyer_property_selection(lead, selected_property, seller_lead)
-                
-                # Send drive link to buyer
-                if drive_link:
-                    send_whatsapp_message(
-                        phone,
-                        f"✅ Great choice! Here's the property details:\n\n"
-                        f"📐 Area: {selected_property.area_sqft or 'N/A'} sq.ft\n"
-                        f"📍 Location: {selected_property.location or 'N/A'}\n"
-                        f"💰 Price: {selected_property.price_range or 'N/A'}\n"
-                        f"🛠 Amenities: {selected_property.amenities or 'N/A'}\n\n"
-                        f"📁 View property images/videos here:\n{drive_link}"
-                    )
-                else:
-                    send_whatsapp_message(
-                        phone,
-                        f"✅ Great choice! Here's the property details:\n\n"
-                        f"📐 Area: {selected_property.area_sqft or 'N/A'} sq.ft\n"
-                        f"📍 Location: {selected_property.location or 'N/A'}\n"
-                        f"💰 Price: {selected_property.price_range or 'N/A'}\n"
-                        f"🛠 Amenities: {selected_property.amenities or 'N/A'}\n\n"
-                        f"⚠️ Property images link not available yet. Our team will share it shortly."
-                    )
-                
-                send_whatsapp_message(phone, "🎉 Our team will contact you soon to proceed!")
-                state.current_step = "COMPLETED"
-                state.save()
-                return
-                
-            except Property.DoesNotExist:
-                send_whatsapp_message(phone, "❌ Selected property no longer exists. Please type 'Hi' to start over.")
-                return
-            except Exception as e:
-                print(f"❌ Error handling property selection: {e}")
-                send_whatsapp_message(phone, "❌ An error occurred. Please try again or type 'Hi' to start over.")
-                return
-
-    # ======================================================================
-    #  FALLBACK
-    # ======================================================================
-    send_whatsapp_message(phone, "❓ I didn't understand that. Type *Hi* to start over.")
 
+def handle_message(phone, text):
+    # Messages from one phone run strictly one at a time; different phones run in parallel
+    with conversation_lock(phone):
+        return conversation_engine.handle(phone, text)
 
 
 # ==================== WEBHOOK ENDPOINT ====================
@@ -454,38 +293,22 @@ def whatsapp_webhook(request):
         print("📩 Incoming:", json.dumps(data, indent=2))
 
         try:
-            value = data["entry"][0]["changes"][0]["value"]
-            
-            # Handle status updates (sent, delivered, read) - these don't have messages
-            if "statuses" in value:
-                # This is a status update, not a message - ignore it
-                print(f"📊 Status update received: {value['statuses'][0].get('status', 'unknown')}")
-                return JsonResponse({"status": "received"}, status=200)
-            
+            messages, statuses = parse_webhook_payload(data)
+
+            # Handle status updates (sent, delivered, read) - these don't have messages.
+            # A status that can't be recorded must not cost the messages in the same POST
+            if statuses:
+                try:
+                    updated = record_statuses(statuses)
+                    print(f"📊 {len(statuses)} status update(s) received, {updated} outbox message(s) updated")
+                except Exception as e:
+                    print(f"❌ Status update error: {e}")
+
             # Handle incoming messages
-            if "messages" in value:
-                message = value["messages"][0]
-                from_phone = message["from"]
-                
-                # Handle button responses (interactive messages)
-                if message.get("type") == "interactive" and message.get("interactive", {}).get("type") == "button_reply":
-                    button_reply = message["interactive"]["button_reply"]
-                    # Use button ID (more reliable) or fallback to title
-                    text = button_reply.get("id") or button_reply.get("title", "")
-                    print(f"🔘 Button clicked: ID='{button_reply.get('id')}', Title='{button_reply.get('title')}' -> Using: '{text}'")
-                # Handle regular text messages
-                elif message.get("type") == "text":
-                    text = message.get("text", {}).get("body", "")
-                    print(f"💬 Text message: '{text}'")
-                else:
-                    text = ""
-                    print(f"⚠️ Unknown message type: {message.get('type')}")
-                
-                if text:
-                    handle_message(from_phone, text)
-                else:
-                    print("⚠️ No text extracted from message")
-            else:
+            if messages:
+                print(f"💬 {len(messages)} message(s) from {len({m['phone'] for m in messages})} phone(s)")
+                dispatch_messages(messages)
+            elif not statuses:
                 print("⚠️ No messages or statuses in webhook payload")
         except Exception as e:
             print(f"❌ Webhook Error: {e}")
@@ -0,0 +1,122 @@
+from collections import OrderedDict
+
+from django.db import transaction
+
+from .dedup import message_dedup
+from .jobs import enqueue_messages, ingest_mode
+
+
+# ======== PARSING ========
+def extract_text(message):
+    """Return the text the state machine should see for one WhatsApp message."""
+    msg_type = message.get("type")
+
+    # Button responses (interactive messages): the ID is more reliable than the title
+    if msg_type == "interactive" and message.get("interactive", {}).get("type") == "button_reply":
+        button_reply = message["interactive"]["button_reply"]
+        return button_reply.get("id") or button_reply.get("title", "")
+
+    if msg_type == "text":
+        return message.get("text", {}).get("body", "")
+
+    return ""
+
+
+def _timestamp(message):
+    """WhatsApp's epoch-seconds string; a missing or malformed one sorts first rather than failing the batch."""
+    try:
+        return int(message.get("timestamp") or 0)
+    except (TypeError, ValueError):
+        print(f"⚠️ Bad timestamp {message.get('timestamp')!r} on message {message.get('id')}")
+        return 0
+
+
+def parse_webhook_payload(data):
+    """
+    Flatten a webhook POST into (messages, statuses).
+
+    Meta may batch several entries, each with several changes, each carrying
+    several messages and/or statuses. Every one of them is returned; nothing
+    past the first item is dropped.
+    """
+    messages = []
+    statuses = []
+
+    for entry in data.get("entry") or []:
+        for change in entry.get("changes") or []:
+            value = change.get("value") or {}
+
+            statuses.extend(value.get("statuses") or [])
+
+            for message in value.get("messages") or []:
+                from_phone = message.get("from")
+                if not from_phone:
+                    continue
+                messages.append({
+                    "id": message.get("id"),
+                    "phone": from_phone,
+                    "type": message.get("type"),
+                    "timestamp": _timestamp(message),
+                    "text": extract_text(message),
+                })
+
+    return messages, statuses
+
+
+def group_by_phone(messages):
+    """Group messages per sender, ordered by WhatsApp timestamp within each conversation."""
+    groups = OrderedDict()
+    for message in messages:
+        groups.setdefault(message["phone"], []).append(message)
+    for phone_messages in groups.values():
+        # sort() is stable, so same-second messages keep their payload order
+        phone_messages.sort(key=lambda m: m["timestamp"])
+    return groups
+
+
+# ======== DISPATCH ========
+def _drop_duplicates(messages):
+    """Claim the batch's message ids; returns the new messages with text, grouped per phone."""
+    received = len(messages)
+    messages = message_dedup.filter_new(messages)
+    if len(messages) < received:
+        print(f"♻️ Dropped {received - len(messages)} duplicate message(s) | dedup {message_dedup.stats()}")
+
+    skipped = sum(1 for m in messages if not m["text"])
+    if skipped:
+        print(f"⚠️ Skipped {skipped} message(s) without text")
+    return group_by_phone(m for m in messages if m["text"])
+
+
+def dispatch_messages(messages):
+    """
+    Hand every parsed message to the state machine, one conversation at a time.
+
+    In queue mode the whole batch is written with a single bulk insert; inline
+    mode runs each phone's messages sequentially in timestamp order.
+    Redelivered message ids are dropped first, before any LLM or API call.
+    An id only stays claimed once its message is stored or handled: the
+    queue insert shares a transaction with the claims, and inline a message
+    whose handling raises is released so Meta's retry runs it again.
+    """
+    message_dedup.maybe_purge()
+
+    if ingest_mode() == "queue":
+        with transaction.atomic():
+            groups = _drop_duplicates(messages)
+            enqueue_messages(
+                (phone, m["text"]) for phone, phone_messages in groups.items() for m in phone_messages
+            )
+        return
+
+    from .views import handle_message
+
+    groups = _drop_duplicates(messages)
+    for phone, phone_messages in groups.items():
+        for message in phone_messages:
+            try:
+                handle_message(phone, message["text"])
+            except Exception as e:
+                # One broken conversation must not drop the rest of the batch
+                message_dedup.release(message["id"])
+                print(f"❌ Error handling message {message['id']} from {phone}: {e}")